@@ -1,17 +1,26 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 import os
-import tempfile
 from pdf_compressor import PDFCompressor, format_size
 from image_compressor import ImageCompressor
 from secure_files import SecureFileHandler
 from password_protect import PasswordProtector
-from zip_utils import ZipHandler
+from zip_utils import ZipHandler, ZipLimitError
+from result_cache import ResultCache
+from upload_spool import SpoolingRequest, save_upload, upload_hash, upload_size
+from pipeline import Pipeline, Stage, format_server_timing
+from functools import partial
+from artifact_store import ArtifactStore
+from output_janitor import OutputJanitor
+from job_queue import JobQueue, InMemoryJobBackend, SQLiteJobBackend, JOB_DONE, JOB_EXPIRED
 import uuid
 import traceback
 import logging
 from flask_cors import CORS  # Add CORS support
 import shutil
 import zipfile
+import mimetypes
+import json
+import fitz  # PyMuPDF, for the single-open compress-protect stage
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG,
@@ -20,9 +29,33 @@ logging.basicConfig(level=logging.DEBUG,
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# Uploads are parsed into SpooledUpload streams (see upload_spool.py)
+app.request_class = SpoolingRequest
 CORS(app)  # Enable CORS for all routes
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload size
 
+# Number of processes PDFCompressor uses to re-encode images (1 = serial)
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '1'))
+
+# Number of threads SecureFileHandler uses to encrypt package members (1 = serial)
+SECURE_WORKERS = int(os.environ.get('SECURE_WORKERS', '1'))
+
+# Number of processes /api/compress-images compresses images on (1 = serial), and the most
+# decoded-pixel memory the images being compressed at once may take
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '1'))
+IMAGE_MEMORY_BUDGET = int(os.environ.get('IMAGE_MEMORY_BUDGET', 256 * 1024 * 1024))
+
+# Number of threads ZipHandler uses to deflate archive members (1 = serial)
+ZIP_WORKERS = int(os.environ.get('ZIP_WORKERS', '1'))
+
+# Limits applied when decompressing uploaded zip files (protection against zip bombs)
+UNZIP_LIMITS = {
+    'max_extracted_size': int(os.environ.get('UNZIP_MAX_EXTRACTED_SIZE', 1024 * 1024 * 1024)),
+    'max_members': int(os.environ.get('UNZIP_MAX_MEMBERS', 10000)),
+    'max_ratio': float(os.environ.get('UNZIP_MAX_RATIO', 200)),
+    'max_seconds': float(os.environ.get('UNZIP_MAX_SECONDS', 60))
+}
+
 # Create necessary directories if they don't exist
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 COMPRESSED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compressed')
@@ -30,15 +63,331 @@ ZIP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zips')
 EXTRACT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted')
 SECURE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'secured')
 PROTECTED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protected')
+JOB_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs')
 
 for folder in [UPLOAD_FOLDER, COMPRESSED_FOLDER, ZIP_FOLDER, EXTRACT_FOLDER, SECURE_FOLDER, PROTECTED_FOLDER]:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
+# Uploads larger than UPLOAD_MEMORY_LIMIT are spooled straight into UPLOAD_FOLDER and
+# renamed to their work path, so every upload is written to disk at most once
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['UPLOAD_MEMORY_LIMIT'] = int(os.environ.get('UPLOAD_MEMORY_LIMIT', 512 * 1024))
+
+# Cache of compressed outputs, keyed by input content, tool, level and tool version
+result_cache = ResultCache(
+    os.path.join(COMPRESSED_FOLDER, 'cache'),
+    max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 500 * 1024 * 1024)),
+    max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1000))
+)
+
+# Outputs of /api/compression-stats, kept so the follow-up download can reuse them
+compressed_artifacts = ArtifactStore(
+    os.path.join(COMPRESSED_FOLDER, 'tokens'),
+    ttl_seconds=int(os.environ.get('ARTIFACT_TTL_SECONDS', 600))
+)
+
+# Stats of archives streamed by /api/zip-files, fetched afterwards from /api/zip-stats/<token>
+zip_stream_stats = ArtifactStore(
+    os.path.join(ZIP_FOLDER, 'tokens'),
+    ttl_seconds=int(os.environ.get('ARTIFACT_TTL_SECONDS', 600))
+)
+
+# Outputs of /api/compress-images, downloaded one by one from /api/compressed-images/<token>
+compressed_images = ArtifactStore(
+    os.path.join(COMPRESSED_FOLDER, 'images'),
+    ttl_seconds=int(os.environ.get('ARTIFACT_TTL_SECONDS', 600))
+)
+
+# Outputs of background jobs, kept while /api/jobs/<job_id>/result serves them: finished jobs
+# expire after JOB_RETENTION_SECONDS, checked every JOB_MAINTENANCE_SECONDS, so their files
+# are removed one maintenance interval later, once the job is already reported as expired
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 24 * 3600))
+JOB_MAINTENANCE_SECONDS = 60
+job_outputs = ArtifactStore(JOB_FOLDER, ttl_seconds=JOB_RETENTION_SECONDS + JOB_MAINTENANCE_SECONDS)
+
+# Outputs in the tool folders expire after OUTPUT_TTL_SECONDS without a download, and the
+# least recently used go first once they exceed OUTPUT_MAX_BYTES; the token stores are
+# purged on every sweep, which also removes their files from previous runs and other workers
+output_janitor = OutputJanitor(
+    [COMPRESSED_FOLDER, ZIP_FOLDER, PROTECTED_FOLDER, SECURE_FOLDER],
+    ttl_seconds=int(os.environ.get('OUTPUT_TTL_SECONDS', 3600)),
+    max_bytes=int(os.environ.get('OUTPUT_MAX_BYTES', 2 * 1024 * 1024 * 1024)),
+    interval_seconds=int(os.environ.get('OUTPUT_SWEEP_SECONDS', 60)),
+    stores=[compressed_artifacts, zip_stream_stats, compressed_images, job_outputs]
+)
+output_janitor.start()
+
+def send_output(path, **kwargs):
+    """send_file for a tool output, which is kept from eviction until the response is closed"""
+    return output_janitor.lease_response(send_file(path, **kwargs), path)
+
+# Single-file tools as pipeline stages, so routes share ingestion, pooled processors,
+# timing and cleanup, and /api/pipeline can chain them in one request
+COMPRESSION_LEVELS = ['low', 'medium', 'high', 'extreme']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+
+def parse_compression_level(form):
+    """Compression level option of the compress stages"""
+    compression_level = form.get('compression_level', 'medium')
+    if compression_level not in COMPRESSION_LEVELS:
+        compression_level = 'medium'
+    return {'compression_level': compression_level}
+
+def parse_target_options(form):
+    """Compression level and optional target size in bytes of the compress stages"""
+    options = parse_compression_level(form)
+    target_size = form.get('target_size')
+    try:
+        options['target_size'] = int(target_size) if target_size else None
+    except ValueError:
+        raise ValueError('target_size must be a number of bytes')
+    if options['target_size'] is not None and options['target_size'] <= 0:
+        raise ValueError('target_size must be positive')
+    return options
+
+def parse_password(form):
+    """Password option of the secure-file and decrypt-file stages"""
+    password = form.get('password')
+    if not password:
+        raise ValueError('Password is required')
+    return {'password': password}
+
+def parse_protect_options(form):
+    """Passwords and permissions of the protect-pdf stage"""
+    user_password = form.get('user_password')
+    owner_password = form.get('owner_password')
+    if not user_password and not owner_password:
+        raise ValueError('At least one password (user or owner) is required')
+    
+    # Get permission settings
+    permissions = {
+        'print': form.get('print', 'false').lower() == 'true',
+        'modify': form.get('modify', 'false').lower() == 'true',
+        'copy': form.get('copy', 'false').lower() == 'true',
+        'annotate': form.get('annotate', 'false').lower() == 'true',
+        'form': form.get('form', 'false').lower() == 'true',
+        'accessibility': form.get('accessibility', 'true').lower() == 'true',
+        'assemble': form.get('assemble', 'false').lower() == 'true'
+    }
+    return {'user_password': user_password, 'owner_password': owner_password, 'permissions': permissions}
+
+pipeline = Pipeline(UPLOAD_FOLDER)
+pipeline.register(Stage(
+    'compress-pdf',
+    factory=lambda options: PDFCompressor(compression_level=options['compression_level'], max_workers=PDF_WORKERS),
+    run=lambda compressor, input_path, output_path, options: compressor.compress_pdf(
+        input_path, output_path, target_size=options.get('target_size')),
+    output_dir=COMPRESSED_FOLDER,
+    parse_options=parse_target_options,
+    extensions=['.pdf'],
+    pool_key=lambda options: options['compression_level']
+))
+pipeline.register(Stage(
+    'compress-image',
+    factory=lambda options: ImageCompressor(compression_level=options['compression_level']),
+    run=lambda compressor, input_path, output_path, options: (
+        compressor.compress_to_size(input_path, options['target_size'], output_path)
+        if options['target_size'] else compressor.compress_image(input_path, output_path)),
+    output_dir=COMPRESSED_FOLDER,
+    parse_options=parse_target_options,
+    extensions=IMAGE_EXTENSIONS,
+    pool_key=lambda options: options['compression_level']
+))
+pipeline.register(Stage(
+    'protect-pdf',
+    factory=lambda options: PasswordProtector(),
+    run=lambda protector, input_path, output_path, options: protector.password_protect_pdf(
+        input_path, output_path, **options),
+    output_dir=PROTECTED_FOLDER,
+    parse_options=parse_protect_options,
+    extensions=['.pdf']
+))
+pipeline.register(Stage(
+    'unlock-pdf',
+    factory=lambda options: PasswordProtector(),
+    run=lambda protector, input_path, output_path, options: protector.remove_pdf_password(
+        input_path, output_path, options['password']),
+    output_dir=PROTECTED_FOLDER,
+    parse_options=lambda form: {'password': form.get('password', '')},
+    extensions=['.pdf'],
+    errors={'Incorrect password': ('Incorrect password for this PDF', 403)}
+))
+pipeline.register(Stage(
+    'secure-file',
+    factory=lambda options: SecureFileHandler(),
+    run=lambda handler, input_path, output_path, options: handler.encrypt_file(
+        input_path, options['password'], output_path),
+    output_dir=SECURE_FOLDER,
+    parse_options=parse_password
+))
+pipeline.register(Stage(
+    'decrypt-file',
+    factory=lambda options: SecureFileHandler(),
+    run=lambda handler, input_path, output_path, options: handler.decrypt_file(
+        input_path, options['password'], output_path),
+    output_dir=SECURE_FOLDER,
+    parse_options=parse_password,
+    errors={'Invalid password': ('Incorrect password or corrupted file', 403)}
+))
+
+def compress_and_protect(processors, input_path, output_path, options):
+    """Recompress a PDF's images and encrypt it with a single open and a single save"""
+    compressor, protector = processors
+    original_size = os.path.getsize(input_path)
+    target_size = options.get('target_size')
+    doc = fitz.open(input_path)
+    try:
+        if target_size:
+            image_stats = compressor.compress_document_to_size(doc, target_size, original_size,
+                                                               source_path=input_path)
+        else:
+            image_stats = compressor.compress_document(doc, source_path=input_path)
+        stats = protector.protect_document(
+            doc, output_path, options['user_password'], options['owner_password'], options['permissions'],
+            save_options=compressor.save_options)
+    finally:
+        doc.close()
+    
+    saved_bytes = original_size - stats['protected_size']
+    stats.update({
+        'original_size': original_size,
+        'compressed_size': stats['protected_size'],
+        'saved_bytes': saved_bytes,
+        'saved_percent': (saved_bytes / original_size) * 100 if original_size > 0 else 0,
+        'compression_level': compressor.compression_level,
+        **image_stats
+    })
+    if target_size:
+        stats['target_size'] = target_size
+        stats['met_target'] = stats['protected_size'] <= target_size
+    return output_path, stats
+
+# compress-pdf followed by protect-pdf, without writing and reopening the intermediate PDF
+pipeline.register(Stage(
+    'compress-protect-pdf',
+    factory=lambda options: (PDFCompressor(compression_level=options['compression_level'], max_workers=PDF_WORKERS),
+                             PasswordProtector()),
+    run=compress_and_protect,
+    output_dir=PROTECTED_FOLDER,
+    parse_options=lambda form: {**parse_target_options(form), **parse_protect_options(form)},
+    extensions=['.pdf'],
+    pool_key=lambda options: options['compression_level']
+))
+pipeline.fuse(['compress-pdf', 'protect-pdf'], 'compress-protect-pdf')
+
+def run_pipeline_request(file, stage_names, download_name, mimetype, stats_headers, cache_key=None):
+    """
+    Shared body of the single-file tool routes: run stages on an upload and send the output
+    
+    Args:
+        file: Uploaded file, already validated by the route
+        stage_names: Stages to run, in order
+        download_name: Filename for the download, or callable(stats) returning it
+        mimetype: Mimetype of the download
+        stats_headers: Callable(stats) returning the X- headers of the route
+        cache_key: Result cache key; when given, a cached output is sent without running
+            the stages and new outputs are cached (the response carries X-Cache)
+    """
+    try:
+        pipeline.validate(stage_names, file.filename)
+        options = {name: pipeline.get(name).parse_options(request.form) for name in stage_names}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    timings = {}
+    cached = result_cache.get(cache_key) if cache_key else None
+    input_path = None
+    try:
+        if cached:
+            output_path, stats = cached
+            logger.info(f"Serving cached result: {output_path}")
+        else:
+            try:
+                input_path = pipeline.ingest(partial(save_upload, file), file.filename, timings)
+            except Exception as e:
+                logger.error(f"Error saving file: {str(e)}")
+                logger.error(traceback.format_exc())
+                return jsonify({'error': 'Failed to save uploaded file'}), 500
+            
+            logger.info(f"Running {' -> '.join(stage_names)} on {file.filename}")
+            result = pipeline.run(stage_names, input_path, options, timings)
+            output_path, stats = result.output_path, result.stats
+            if cache_key:
+                output_path = result_cache.put(cache_key, output_path, stats)
+        
+        response = send_output(
+            output_path,
+            as_attachment=True,
+            download_name=download_name(stats) if callable(download_name) else download_name,
+            mimetype=mimetype
+        )
+        
+        # Add stats as headers
+        for header, value in stats_headers(stats).items():
+            response.headers[header] = value
+        if cache_key:
+            response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+        if timings:
+            response.headers['Server-Timing'] = format_server_timing(timings)
+        
+        return response
+        
+    except Exception as e:
+        expected = pipeline.error_response(stage_names, e)
+        if expected:
+            return jsonify({'error': expected[0]}), expected[1]
+        logger.error(f"Error during {' -> '.join(stage_names)}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+    finally:
+        # Clean up the uploaded file
+        pipeline.remove(input_path)
+
+def compression_headers(stats):
+    """Headers of the compress routes"""
+    original_size = stats['original_size']
+    compressed_size = stats['compressed_size']
+    # Positive value means reduction (smaller file)
+    saved_percent = ((original_size - compressed_size) / original_size) * 100 if original_size > 0 else 0
+    return {
+        'X-Original-Size': str(original_size),
+        'X-Compressed-Size': str(compressed_size),
+        'X-Compression-Ratio': str(saved_percent)
+    }
+
+# Background jobs: 'memory' keeps them in this process, 'sqlite' shares status between workers
+if os.environ.get('JOB_BACKEND', 'memory') == 'sqlite':
+    job_backend = SQLiteJobBackend(os.environ.get(
+        'JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db')))
+else:
+    job_backend = InMemoryJobBackend()
+# Finished jobs keep their result for JOB_RETENTION_SECONDS, after which /result answers 410
+job_queue = JobQueue(job_backend, retention_seconds=JOB_RETENTION_SECONDS,
+                     maintenance_interval=JOB_MAINTENANCE_SECONDS)
+
+# Maximum number of jobs of each tool running at once
+JOB_CONCURRENCY = {
+    'compress-pdf': int(os.environ.get('JOB_CONCURRENCY_COMPRESS_PDF', 2)),
+    'zip-files': int(os.environ.get('JOB_CONCURRENCY_ZIP_FILES', 2)),
+    'secure-multiple': int(os.environ.get('JOB_CONCURRENCY_SECURE_MULTIPLE', 2)),
+    'extract-secure': int(os.environ.get('JOB_CONCURRENCY_EXTRACT_SECURE', 2)),
+}
+
 @app.route('/api/compress-pdf', methods=['POST'])
 def compress_pdf():
     """API endpoint to compress a PDF file"""
     
+    # A token from /api/compression-stats returns that run's output without recompressing
+    token = request.form.get('token')
+    if token:
+        artifact = compressed_artifacts.get(token)
+        if artifact is not None:
+            return send_compressed_artifact(*artifact)
+        if 'file' not in request.files:
+            return jsonify({'error': 'Unknown or expired token'}), 404
+        logger.info(f"Token {token} expired, compressing the uploaded file again")
+    
     # Check if PDF file was included in the request
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
@@ -50,9 +399,7 @@ def compress_pdf():
         return jsonify({'error': 'Only PDF files are supported'}), 400
     
     # Get compression level from request
-    compression_level = request.form.get('compression_level', 'medium')
-    if compression_level not in ['low', 'medium', 'high', 'extreme']:
-        compression_level = 'medium'
+    compression_level = parse_compression_level(request.form)['compression_level']
     
     # Get output filename if provided
     output_filename = request.form.get('output_filename', '')
@@ -62,76 +409,57 @@ def compress_pdf():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_input.pdf")
-    output_filename_internal = os.path.join(COMPRESSED_FOLDER, f"{unique_id}_compressed.pdf")
-    
     logger.info(f"Processing file: {file.filename} with compression level: {compression_level}")
     logger.info(f"Output filename requested: {output_filename}")
-    logger.info(f"Saving to: {input_filename}")
     
-    # Save uploaded file
-    try:
-        file.save(input_filename)
-        logger.info(f"File saved successfully. Size: {os.path.getsize(input_filename)} bytes")
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
+    # A target size replaces the level's settings, so it is part of the key
+    target_size = request.form.get('target_size', '')
+    cache_key = ResultCache.make_key(upload_hash(file), 'compress-pdf',
+                                     f"{compression_level}:{target_size}" if target_size else compression_level,
+                                     PDFCompressor.version)
+    return run_pipeline_request(file, ['compress-pdf'], output_filename, 'application/pdf',
+                                pdf_headers, cache_key=cache_key)
+
+def pdf_headers(stats):
+    """Headers of the compress-pdf route, with image counts and the outcome in target-size mode"""
+    headers = compression_headers(stats)
+    headers['X-Recompressed-Images'] = str(stats['recompressed_images'])
+    if 'skipped_images' in stats:
+        headers['X-Skipped-Images'] = str(stats['skipped_images'])
+    headers.update(target_headers(stats))
+    return headers
+
+def target_headers(stats):
+    """X-Target-* headers of a target-size run (none for other runs)"""
+    if 'target_size' not in stats:
+        return {}
+    return {
+        'X-Target-Size': str(stats['target_size']),
+        'X-Target-Met': str(stats['met_target']).lower()
+    }
+
+def send_compressed_artifact(output_path, stats):
+    """Send a PDF kept by /api/compression-stats"""
+    output_filename = request.form.get('output_filename', '')
+    if not output_filename or not output_filename.lower().endswith('.pdf'):
+        output_filename = f"compressed_{stats.get('original_filename', 'file.pdf')}"
+    output_filename = os.path.basename(output_filename)
     
-    try:
-        # Create compressor and compress PDF
-        logger.info("Starting PDF compression")
-        compressor = PDFCompressor(compression_level=compression_level)
-        output_path, stats = compressor.compress_pdf(input_filename, output_filename_internal)
-        logger.info(f"Compression complete. Original: {stats['original_size']}, Compressed: {stats['compressed_size']} bytes")
-        
-        # Calculate compression ratio - positive value means reduction (smaller file)
-        original_size = stats['original_size']
-        compressed_size = stats['compressed_size']
-        saved_bytes = original_size - compressed_size
-        saved_percent = (saved_bytes / original_size) * 100 if original_size > 0 else 0
-        
-        # Format stats for response
-        formatted_stats = {
-            'original_size': original_size,
-            'original_size_formatted': format_size(original_size),
-            'compressed_size': compressed_size,
-            'compressed_size_formatted': format_size(compressed_size),
-            'saved_bytes': saved_bytes,
-            'saved_bytes_formatted': format_size(saved_bytes),
-            'saved_percent': saved_percent,
-            'compression_level': stats['compression_level']
-        }
-        
-        # Set headers for the response to include original file size
-        response = send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype='application/pdf'
-        )
-        
-        # Add stats as headers
-        response.headers['X-Original-Size'] = str(original_size)
-        response.headers['X-Compressed-Size'] = str(compressed_size)
-        response.headers['X-Compression-Ratio'] = str(saved_percent)
-        
-        return response
-        
-    except Exception as e:
-        logger.error(f"Error during compression: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+    logger.info(f"Serving stored compression result: {output_path}")
+    response = send_output(
+        output_path,
+        as_attachment=True,
+        download_name=output_filename,
+        mimetype='application/pdf'
+    )
+    
+    # Add stats as headers
+    response.headers['X-Original-Size'] = str(stats['original_size'])
+    response.headers['X-Compressed-Size'] = str(stats['compressed_size'])
+    response.headers['X-Compression-Ratio'] = str(stats['saved_percent'])
+    response.headers['X-Cache'] = 'TOKEN'
+    
+    return response
 
 @app.route('/api/compression-stats', methods=['POST'])
 def get_compression_stats():
@@ -148,24 +476,29 @@ def get_compression_stats():
         return jsonify({'error': 'Only PDF files are supported'}), 400
     
     # Get compression level from request
-    compression_level = request.form.get('compression_level', 'medium')
-    if compression_level not in ['low', 'medium', 'high', 'extreme']:
-        compression_level = 'medium'
+    compression_level = parse_compression_level(request.form)['compression_level']
     
     unique_id = str(uuid.uuid4())
-    
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as input_file:
-        input_filename = input_file.name
-        file.save(input_filename)
-        
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as output_file:
-        output_filename = output_file.name
+    input_filename = None
     
     try:
-        # Create compressor and compress PDF
-        compressor = PDFCompressor(compression_level=compression_level)
-        output_path, stats = compressor.compress_pdf(input_filename, output_filename)
+        cache_key = ResultCache.make_key(upload_hash(file), 'compress-pdf',
+                                         compression_level, PDFCompressor.version)
+        cached = result_cache.get(cache_key)
+        if cached:
+            output_path, stats = cached
+            uncached_output = None
+        else:
+            input_filename = pipeline.ingest(partial(save_upload, file), file.filename)
+            result = pipeline.run(['compress-pdf'], input_filename,
+                                  {'compress-pdf': {'compression_level': compression_level}})
+            uncached_output, stats = result.output_path, result.stats
+            output_path = result_cache.put(cache_key, uncached_output, stats)
+        
+        # Keep the output so /api/compress-pdf can send it for this token
+        # (moved when it is only a work file that wasn't cached)
+        compressed_artifacts.register(output_path, dict(stats, original_filename=file.filename),
+                                      token=unique_id, move=(output_path == uncached_output))
         
         # Format stats for response
         formatted_stats = {
@@ -177,6 +510,11 @@ def get_compression_stats():
             'saved_bytes_formatted': format_size(stats['saved_bytes']),
             'saved_percent': round(stats['saved_percent'], 2),
             'compression_level': stats['compression_level'],
+            'image_count': stats['image_count'],
+            'duplicate_image_refs': stats['duplicate_image_refs'],
+            'recompressed_images': stats['recompressed_images'],
+            'skipped_images': stats['skipped_images'],
+            'kept_original_images': stats['kept_original_images'],
             'token': unique_id
         }
         
@@ -186,19 +524,24 @@ def get_compression_stats():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
     finally:
-        # Clean up temporary files
-        for filename in [input_filename, output_filename]:
-            try:
-                if os.path.exists(filename):
-                    os.remove(filename)
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file {filename}: {str(e)}")
+        # Clean up the uploaded file
+        pipeline.remove(input_filename)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint to verify the API is working"""
     return jsonify({"status": "ok", "message": "PDF compression service is running"}), 200
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report hit/miss counters and usage of the compression result cache"""
+    return jsonify(result_cache.get_stats()), 200
+
+@app.route('/api/storage-stats', methods=['GET'])
+def storage_stats():
+    """Report disk usage of the tool outputs and how many were evicted"""
+    return jsonify(output_janitor.get_stats()), 200
+
 @app.route('/api/compress-image', methods=['POST'])
 def compress_image():
     """API endpoint to compress image files"""
@@ -210,14 +553,11 @@ def compress_image():
     file = request.files['file']
     
     # Check if the file is a valid image
-    image_extensions = ['.jpg', '.jpeg', '.png', '.webp']
-    if not file.filename or not any(file.filename.lower().endswith(ext) for ext in image_extensions):
+    if not file.filename or not any(file.filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
         return jsonify({'error': 'Only image files are supported (JPG, JPEG, PNG, WebP)'}), 400
     
     # Get compression level from request
-    compression_level = request.form.get('compression_level', 'medium')
-    if compression_level not in ['low', 'medium', 'high', 'extreme']:
-        compression_level = 'medium'
+    compression_level = parse_compression_level(request.form)['compression_level']
     
     # Get output filename if provided
     output_filename = request.form.get('output_filename', '')
@@ -227,77 +567,131 @@ def compress_image():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_input{os.path.splitext(file.filename)[1]}")
-    output_filename_internal = os.path.join(COMPRESSED_FOLDER, f"{unique_id}_compressed{os.path.splitext(file.filename)[1]}")
-    
     logger.info(f"Processing image file: {file.filename} with compression level: {compression_level}")
+    if request.form.get('target_size'):
+        logger.info(f"Target size: {request.form.get('target_size')} bytes")
     logger.info(f"Output filename requested: {output_filename}")
-    logger.info(f"Saving to: {input_filename}")
     
-    # Save uploaded file
+    # The output format depends on the extension, so it is part of the key
+    target_size = request.form.get('target_size', '')
+    cache_key = ResultCache.make_key(upload_hash(file),
+                                     f"compress-image{os.path.splitext(file.filename)[1].lower()}",
+                                     f"{compression_level}:{target_size}", ImageCompressor.version)
+    return run_pipeline_request(file, ['compress-image'], output_filename, file.mimetype,
+                                image_headers, cache_key=cache_key)
+
+def image_headers(stats):
+    """Headers of the compress-image route, with the search results in target-size mode"""
+    headers = compression_headers(stats)
+    if 'target_size' in stats:
+        headers.update({
+            'X-Target-Size': str(stats['target_size']),
+            'X-Target-Met': str(stats['met_target']).lower(),
+            'X-Scale': f"{stats['scale']:.3f}",
+            'X-Encode-Count': str(stats['iterations']),
+            'X-Search-Time': f"{stats['search_seconds']:.3f}"
+        })
+        # Lossless formats (e.g. PNG) are only scaled, so they have no quality
+        if stats['quality'] is not None:
+            headers['X-Quality'] = str(stats['quality'])
+    return headers
+
+@app.route('/api/compress-images', methods=['POST'])
+def compress_images():
+    """API endpoint to compress several images in one request
+    
+    Responds with newline-delimited JSON: one line per image as soon as it is
+    compressed (with its index in files[] and a token for
+    /api/compressed-images/<token>), then a summary line with the tokens in
+    upload order.
+    """
+    
+    # Check if files were included in the request
+    if 'files[]' not in request.files:
+        return jsonify({'error': 'No files provided'}), 400
+        
+    files = [file for file in request.files.getlist('files[]') if file.filename]
+    if not files:
+        return jsonify({'error': 'No files selected'}), 400
+    
+    # Check that every file is a valid image
+    for file in files:
+        if not any(file.filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+            return jsonify({'error': f'Only image files are supported (JPG, JPEG, PNG, WebP): {file.filename}'}), 400
+    
+    # Get compression level from request
+    compression_level = parse_compression_level(request.form)['compression_level']
+    
+    # Save the uploaded files
+    input_paths = []
     try:
-        file.save(input_filename)
-        logger.info(f"File saved successfully. Size: {os.path.getsize(input_filename)} bytes")
+        for file in files:
+            file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{os.path.basename(file.filename)}")
+            save_upload(file, file_path)
+            input_paths.append(file_path)
     except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
+        logger.error(f"Error saving files: {str(e)}")
+        remove_files(input_paths)
+        return jsonify({'error': 'Failed to save uploaded files'}), 500
     
-    try:
-        # Create compressor and compress image
-        logger.info("Starting image compression")
-        compressor = ImageCompressor(compression_level=compression_level)
-        output_path, stats = compressor.compress_image(input_filename, output_filename_internal)
-        logger.info(f"Compression complete. Original: {stats['original_size']}, Compressed: {stats['compressed_size']} bytes")
-        
-        # Calculate compression ratio - positive value means reduction (smaller file)
-        original_size = stats['original_size']
-        compressed_size = stats['compressed_size']
-        saved_bytes = original_size - compressed_size
-        saved_percent = (saved_bytes / original_size) * 100 if original_size > 0 else 0
-        
-        # Format stats for response
-        formatted_stats = {
+    logger.info(f"Compressing {len(input_paths)} images with compression level {compression_level}")
+    compressor = ImageCompressor(compression_level=compression_level)
+    
+    def generate():
+        tokens = [None] * len(files)
+        original_size = compressed_size = 0
+        try:
+            for index, result in compressor.iter_compress_images(
+                    input_paths, output_dir=UPLOAD_FOLDER,
+                    max_workers=IMAGE_WORKERS, memory_budget=IMAGE_MEMORY_BUDGET):
+                item = {'index': index, 'filename': files[index].filename}
+                if 'error' in result:
+                    # Don't reveal the work path
+                    item['error'] = result['error'].replace(input_paths[index], files[index].filename)
+                else:
+                    tokens[index] = compressed_images.register(
+                        result['output_path'], dict(result, filename=files[index].filename), move=True)
+                    original_size += result['original_size']
+                    compressed_size += result['compressed_size']
+                    item.update({key: result[key] for key in
+                                 ('original_size', 'compressed_size', 'saved_percent', 'format')})
+                    item['token'] = tokens[index]
+                yield json.dumps(item) + '\n'
+        finally:
+            remove_files(input_paths)
+        
+        saved_percent = ((original_size - compressed_size) / original_size) * 100 if original_size > 0 else 0
+        yield json.dumps({
+            'done': True,
+            'file_count': sum(token is not None for token in tokens),
+            'failed_count': sum(token is None for token in tokens),
             'original_size': original_size,
-            'original_size_formatted': format_size(original_size),
             'compressed_size': compressed_size,
-            'compressed_size_formatted': format_size(compressed_size),
-            'saved_bytes': saved_bytes,
-            'saved_bytes_formatted': format_size(saved_bytes),
             'saved_percent': saved_percent,
-            'compression_level': stats['compression_level'],
-            'format': stats.get('format', 'unknown')
-        }
-        
-        # Set headers for the response to include original file size
-        response = send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype=file.mimetype
-        )
-        
-        # Add stats as headers
-        response.headers['X-Original-Size'] = str(original_size)
-        response.headers['X-Compressed-Size'] = str(compressed_size)
-        response.headers['X-Compression-Ratio'] = str(saved_percent)
-        
-        return response
-        
-    except Exception as e:
-        logger.error(f"Error during image compression: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+            'tokens': tokens
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/compressed-images/<token>', methods=['GET'])
+def compressed_image(token):
+    """API endpoint to download one image compressed by /api/compress-images"""
+    artifact = compressed_images.get(token)
+    if artifact is None:
+        return jsonify({'error': 'Unknown or expired token'}), 404
+    
+    output_path, stats = artifact
+    download_name = f"compressed_{os.path.basename(stats['filename'])}"
+    response = send_output(
+        output_path,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    )
+    response.headers['X-Original-Size'] = str(stats['original_size'])
+    response.headers['X-Compressed-Size'] = str(stats['compressed_size'])
+    response.headers['X-Compression-Ratio'] = str(stats['saved_percent'])
+    return response
 
 @app.route('/api/zip-files', methods=['POST'])
 def zip_files():
@@ -330,16 +724,15 @@ def zip_files():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
+    # Stream the archive while it is being built instead of writing it to ZIP_FOLDER first
+    if request.form.get('stream', 'false').lower() == 'true':
+        return stream_zip_response(files, compression_level, output_filename)
+    
     # Generate unique identifier
     unique_id = str(uuid.uuid4())
     
     # Calculate the total file size before saving
-    total_size = 0
-    for file in files:
-        if hasattr(file, 'seek') and hasattr(file, 'tell'):
-            file.seek(0, os.SEEK_END)
-            total_size += file.tell()
-            file.seek(0)
+    total_size = sum(upload_size(file) for file in files)
     
     # Save uploaded files
     saved_file_paths = []
@@ -348,7 +741,7 @@ def zip_files():
         for file in files:
             if file.filename:
                 file_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_{file.filename}")
-                file.save(file_path)
+                save_upload(file, file_path)
                 if os.path.getsize(file_path) > 0:
                     valid_files = True
                 saved_file_paths.append(file_path)
@@ -367,7 +760,7 @@ def zip_files():
     try:
         # Create zip handler and zip the files
         logger.info(f"Starting zip operation with compression level {compression_level}")
-        zip_handler = ZipHandler(compression_level=compression_level)
+        zip_handler = ZipHandler(compression_level=compression_level, max_workers=ZIP_WORKERS)
         output_path, stats = zip_handler.zip_files(saved_file_paths, output_zip_path)
         logger.info(f"Zip complete. Original total: {stats['original_size']}, "
                    f"Compressed: {stats['compressed_size']} bytes")
@@ -378,7 +771,7 @@ def zip_files():
             logger.info(f"Using pre-calculated file size: {total_size}")
         
         # Send the zip file as response
-        response = send_file(
+        response = send_output(
             output_path,
             as_attachment=True,
             download_name=output_filename,
@@ -400,6 +793,9 @@ def zip_files():
             
         response.headers['X-Compression-Ratio'] = str(ratio)
         response.headers['X-File-Count'] = str(len(files))
+        response.headers['X-Stored-Count'] = str(stats['stored_count'])
+        response.headers['X-Deflated-Count'] = str(stats['deflated_count'])
+        response.headers['X-CPU-Seconds-Saved'] = f"{stats['cpu_seconds_saved']:.3f}"
         
         return response
         
@@ -417,9 +813,52 @@ def zip_files():
             except Exception as e:
                 logger.warning(f"Failed to clean up file {file_path}: {str(e)}")
 
+def stream_zip_response(files, compression_level, output_filename):
+    """
+    Build the zip archive as a streamed response, reading members straight from the uploads
+    
+    Stats are only known once the last byte has been sent, so the response carries
+    an X-Stats-Token header to fetch them from /api/zip-stats/<token>.
+    """
+    token = str(uuid.uuid4())
+    members = [(file.filename, file.stream) for file in files if file.filename]
+    zip_handler = ZipHandler(compression_level=compression_level)
+    
+    def generate():
+        stats = {}
+        logger.info(f"Streaming zip of {len(members)} files with compression level {compression_level}")
+        try:
+            yield from zip_handler.stream_zip(members, stats)
+        except Exception as e:
+            logger.error(f"Error during streamed zip operation: {str(e)}")
+            logger.error(traceback.format_exc())
+            raise
+        logger.info(f"Streamed zip complete. Original total: {stats['original_size']}, "
+                   f"Compressed: {stats['compressed_size']} bytes")
+        zip_stream_stats.register(None, stats, token=token)
+    
+    response = Response(stream_with_context(generate()), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=output_filename)
+    response.headers['X-Stats-Token'] = token
+    response.headers['X-File-Count'] = str(len(members))
+    return response
+
+@app.route('/api/zip-stats/<token>', methods=['GET'])
+def zip_stats(token):
+    """Stats of an archive streamed by /api/zip-files, available once the download has finished"""
+    artifact = zip_stream_stats.get(token)
+    if artifact is None:
+        return jsonify({'error': 'Unknown token, expired, or the archive is still being streamed'}), 404
+    return jsonify(artifact[1])
+
 @app.route('/api/unzip-file', methods=['POST'])
 def unzip_file():
-    """API endpoint to unzip a file"""
+    """API endpoint to unzip a file
+    
+    Nothing is extracted to disk: a single-file archive is decompressed
+    straight into the response, and a multi-file archive is repacked by
+    copying the compressed members as they are.
+    """
     
     # Check if zip file was included in the request
     if 'file' not in request.files:
@@ -431,69 +870,51 @@ def unzip_file():
     if not file.filename or not file.filename.lower().endswith('.zip'):
         return jsonify({'error': 'Only ZIP files are supported'}), 400
     
-    # Generate unique identifier
-    unique_id = str(uuid.uuid4())
-    
-    # Save uploaded zip file
-    zip_file_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_{file.filename}")
     try:
-        file.save(zip_file_path)
-        logger.info(f"Saved uploaded zip file: {zip_file_path}")
-    except Exception as e:
-        logger.error(f"Error saving zip file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded zip file'}), 500
-    
-    # Create extract directory
-    extract_dir = os.path.join(EXTRACT_FOLDER, f"{unique_id}")
-    if not os.path.exists(extract_dir):
-        os.makedirs(extract_dir)
-    
-    try:
-        # Extract the zip file
-        logger.info(f"Starting unzip operation for file: {zip_file_path}")
-        zip_handler = ZipHandler()
-        extract_path, stats = zip_handler.unzip_file(zip_file_path, extract_dir)
-        logger.info(f"Unzip complete. Zip size: {stats['zip_size']}, "
-                   f"Extracted: {stats['total_extracted_size']} bytes")
+        # Read the archive directory straight from the upload
+        logger.info(f"Starting unzip operation for file: {file.filename}")
+        zip_handler = ZipHandler(**UNZIP_LIMITS)
+        try:
+            members = zip_handler.list_members(file.stream)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        zip_size = max(1, upload_size(file))
+        total_extracted_size = sum(member.file_size for member in members)
+        logger.info(f"Unzip: zip size: {zip_size}, contents: {total_extracted_size} bytes, "
+                   f"{len(members)} files")
         
         # Check the number of files
-        file_count = stats['file_count']
+        file_count = len(members)
         
         if file_count == 0:
             return jsonify({'error': 'The zip file is empty'}), 400
         
-        # If only one file, send it directly
+        # If only one file, stream it directly
         if file_count == 1:
-            file_info = stats['extracted_files'][0]
-            file_path = file_info['path']
-            
-            response = send_file(
-                file_path,
-                as_attachment=True,
-                download_name=file_info['name'],
-            )
+            member = members[0]
+            try:
+                zip_handler.check_members(members)
+            except ZipLimitError as e:
+                logger.warning(f"Refusing to unzip {file.filename}: {str(e)}")
+                return jsonify({'error': str(e)}), 413
+            download_name = os.path.basename(member.filename)
+            mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+            response = Response(stream_with_context(zip_handler.stream_member(file.stream, member.filename)),
+                                mimetype=mimetype)
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+            response.headers['Content-Length'] = str(member.file_size)
             
-        # If multiple files, create a zip with them
+        # If multiple files, copy their compressed data into a new zip
         else:
-            # Create a temp zip of all extracted files
-            response_zip_path = os.path.join(ZIP_FOLDER, f"{unique_id}_extracted.zip")
-            
-            # Create a basic zip file with the extracted contents
-            with zipfile.ZipFile(response_zip_path, 'w') as zipf:
-                for file_info in stats['extracted_files']:
-                    zipf.write(file_info['path'], arcname=file_info['name'])
-            
-            response = send_file(
-                response_zip_path,
-                as_attachment=True,
-                download_name=f"extracted_{os.path.basename(file.filename)}",
-                mimetype='application/zip'
-            )
+            response = Response(stream_with_context(zip_handler.repack_raw(file.stream, members)),
+                                mimetype='application/zip')
+            response.headers.set('Content-Disposition', 'attachment',
+                                 filename=f"extracted_{os.path.basename(file.filename)}")
         
         # Add stats as headers
-        response.headers['X-Zip-Size'] = str(stats['zip_size'])
-        response.headers['X-Extracted-Size'] = str(stats['total_extracted_size'])
+        response.headers['X-Zip-Size'] = str(zip_size)
+        response.headers['X-Extracted-Size'] = str(total_extracted_size)
         response.headers['X-File-Count'] = str(file_count)
         
         return response
@@ -502,22 +923,6 @@ def unzip_file():
         logger.error(f"Error during unzip operation: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded zip file
-        try:
-            if os.path.exists(zip_file_path):
-                os.remove(zip_file_path)
-                logger.info(f"Cleaned up zip file: {zip_file_path}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up zip file {zip_file_path}: {str(e)}")
-        
-        # Clean up the extracted directory
-        try:
-            if os.path.exists(extract_dir):
-                shutil.rmtree(extract_dir)
-                logger.info(f"Cleaned up extract directory: {extract_dir}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up extract directory {extract_dir}: {str(e)}")
 
 @app.route('/api/secure-file', methods=['POST'])
 def secure_file():
@@ -533,11 +938,6 @@ def secure_file():
     if not file.filename:
         return jsonify({'error': 'No file selected'}), 400
     
-    # Get password from request
-    password = request.form.get('password')
-    if not password:
-        return jsonify({'error': 'Password is required'}), 400
-    
     # Get output filename if provided
     output_filename = request.form.get('output_filename', '')
     if not output_filename:
@@ -546,56 +946,14 @@ def secure_file():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_input{os.path.splitext(file.filename)[1]}")
-    output_filename_internal = os.path.join(SECURE_FOLDER, f"{unique_id}_secured{os.path.splitext(file.filename)[1]}")
-    
     logger.info(f"Processing file for encryption: {file.filename}")
     logger.info(f"Output filename requested: {output_filename}")
     
-    # Save uploaded file
-    try:
-        file.save(input_filename)
-        logger.info(f"File saved successfully. Size: {os.path.getsize(input_filename)} bytes")
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
-    
-    try:
-        # Create secure file handler and encrypt the file
-        logger.info("Starting file encryption")
-        secure_handler = SecureFileHandler()
-        output_path, stats = secure_handler.encrypt_file(input_filename, password, output_filename_internal)
-        logger.info(f"Encryption complete. Original: {stats['original_size']}, Encrypted: {stats['encrypted_size']} bytes")
-        
-        # Send the encrypted file as response
-        response = send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype='application/octet-stream'
-        )
-        
-        # Add stats as headers
-        response.headers['X-Original-Size'] = str(stats['original_size'])
-        response.headers['X-Encrypted-Size'] = str(stats['encrypted_size'])
-        
-        return response
-        
-    except Exception as e:
-        logger.error(f"Error during file encryption: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+    return run_pipeline_request(file, ['secure-file'], output_filename, 'application/octet-stream',
+                                lambda stats: {
+                                    'X-Original-Size': str(stats['original_size']),
+                                    'X-Encrypted-Size': str(stats['encrypted_size'])
+                                })
 
 @app.route('/api/decrypt-file', methods=['POST'])
 def decrypt_file():
@@ -611,68 +969,14 @@ def decrypt_file():
     if not file.filename:
         return jsonify({'error': 'No file selected'}), 400
     
-    # Get password from request
-    password = request.form.get('password')
-    if not password:
-        return jsonify({'error': 'Password is required'}), 400
-    
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_encrypted{os.path.splitext(file.filename)[1]}")
-    
     logger.info(f"Processing file for decryption: {file.filename}")
     
-    # Save uploaded file
-    try:
-        file.save(input_filename)
-        logger.info(f"Encrypted file saved successfully. Size: {os.path.getsize(input_filename)} bytes")
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
-    
-    try:
-        # Create secure file handler and decrypt the file
-        logger.info("Starting file decryption")
-        secure_handler = SecureFileHandler()
-        
-        try:
-            output_path, stats = secure_handler.decrypt_file(input_filename, password)
-            logger.info(f"Decryption complete. Encrypted: {stats['encrypted_size']}, Decrypted: {stats['decrypted_size']} bytes")
-            
-            # Send the decrypted file as response
-            response = send_file(
-                output_path,
-                as_attachment=True,
-                download_name=stats['original_filename'],
-                mimetype='application/octet-stream'
-            )
-            
-            # Add stats as headers
-            response.headers['X-Encrypted-Size'] = str(stats['encrypted_size'])
-            response.headers['X-Decrypted-Size'] = str(stats['decrypted_size'])
-            
-            return response
-            
-        except ValueError as ve:
-            # Handle incorrect password specifically
-            if "Invalid password" in str(ve):
-                return jsonify({'error': 'Incorrect password or corrupted file'}), 403
-            else:
-                raise
-        
-    except Exception as e:
-        logger.error(f"Error during file decryption: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+    return run_pipeline_request(file, ['decrypt-file'], lambda stats: stats['original_filename'],
+                                'application/octet-stream',
+                                lambda stats: {
+                                    'X-Encrypted-Size': str(stats['encrypted_size']),
+                                    'X-Decrypted-Size': str(stats['decrypted_size'])
+                                })
 
 @app.route('/api/secure-multiple', methods=['POST'])
 def secure_multiple():
@@ -707,12 +1011,7 @@ def secure_multiple():
     unique_id = str(uuid.uuid4())
     
     # Calculate the total size of all files
-    total_size = 0
-    for file in files:
-        if hasattr(file, 'seek') and hasattr(file, 'tell'):
-            file.seek(0, os.SEEK_END)
-            total_size += file.tell()
-            file.seek(0)
+    total_size = sum(upload_size(file) for file in files)
     
     # Save uploaded files
     saved_file_paths = []
@@ -720,7 +1019,7 @@ def secure_multiple():
         for file in files:
             if file.filename:
                 file_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_{file.filename}")
-                file.save(file_path)
+                save_upload(file, file_path)
                 saved_file_paths.append(file_path)
                 logger.info(f"Saved file for encryption: {file_path}, size: {os.path.getsize(file_path)}")
         
@@ -743,14 +1042,15 @@ def secure_multiple():
             saved_file_paths,
             password, 
             output_dir=SECURE_FOLDER,
-            output_filename=f"{unique_id}_{output_filename}"
+            output_filename=f"{unique_id}_{output_filename}",
+            max_workers=SECURE_WORKERS
         )
         
         logger.info(f"Secure package created. Original total: {stats['original_size']}, "
                   f"Secured: {stats['secured_size']} bytes, Files: {stats['file_count']}")
         
         # Send the secure package file as response
-        response = send_file(
+        response = send_output(
             output_path,
             as_attachment=True,
             download_name=output_filename,
@@ -796,9 +1096,14 @@ def extract_secure():
     if not file.filename.lower().endswith('.sfp'):
         return jsonify({'error': 'Invalid secure file package. Must have .sfp extension.'}), 400
     
-    # Get password from request
+    # 'list' returns the package contents; otherwise extract everything, or
+    # only the file named by 'member'
+    action = request.form.get('action', 'extract')
+    member_name = request.form.get('member')
+    
+    # Get password from request (listing doesn't decrypt anything)
     password = request.form.get('password')
-    if not password:
+    if not password and action != 'list':
         return jsonify({'error': 'Password is required'}), 400
     
     # Generate unique identifier
@@ -807,7 +1112,7 @@ def extract_secure():
     # Save uploaded secure package
     package_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_{file.filename}")
     try:
-        file.save(package_path)
+        save_upload(file, package_path)
         logger.info(f"Saved secure package: {package_path}")
     except Exception as e:
         logger.error(f"Error saving secure package: {str(e)}")
@@ -825,7 +1130,14 @@ def extract_secure():
         secure_handler = SecureFileHandler()
         
         try:
-            extract_dir, stats = secure_handler.extract_secure_package(package_path, password, extract_dir)
+            if action == 'list':
+                members = secure_handler.list_secure_package(package_path)
+                return jsonify({'files': members, 'file_count': len(members)}), 200
+            
+            if member_name:
+                _, stats = secure_handler.extract_secure_member(package_path, password, member_name, extract_dir)
+            else:
+                extract_dir, stats = secure_handler.extract_secure_package(package_path, password, extract_dir)
             logger.info(f"Extraction complete. Package size: {stats['package_size']}, "
                       f"Extracted: {stats['total_extracted_size']} bytes, Files: {stats['file_count']}")
             
@@ -856,7 +1168,7 @@ def extract_secure():
                     for file_info in stats['extracted_files']:
                         zipf.write(file_info['path'], arcname=file_info['name'])
                 
-                response = send_file(
+                response = send_output(
                     response_zip_path,
                     as_attachment=True,
                     download_name=f"extracted_{os.path.basename(file.filename).replace('.sfp', '.zip')}",
@@ -870,6 +1182,9 @@ def extract_secure():
             
             return response
             
+        except FileNotFoundError as fe:
+            # Requested member isn't in the package
+            return jsonify({'error': str(fe)}), 404
         except ValueError as ve:
             # Handle incorrect password specifically
             if "Invalid password" in str(ve):
@@ -912,24 +1227,6 @@ def protect_pdf():
     if not file.filename or not file.filename.lower().endswith('.pdf'):
         return jsonify({'error': 'Only PDF files are supported'}), 400
     
-    # Get passwords from request
-    user_password = request.form.get('user_password')
-    owner_password = request.form.get('owner_password')
-    
-    if not user_password and not owner_password:
-        return jsonify({'error': 'At least one password (user or owner) is required'}), 400
-    
-    # Get permission settings
-    permissions = {
-        'print': request.form.get('print', 'false').lower() == 'true',
-        'modify': request.form.get('modify', 'false').lower() == 'true',
-        'copy': request.form.get('copy', 'false').lower() == 'true',
-        'annotate': request.form.get('annotate', 'false').lower() == 'true',
-        'form': request.form.get('form', 'false').lower() == 'true',
-        'accessibility': request.form.get('accessibility', 'true').lower() == 'true',
-        'assemble': request.form.get('assemble', 'false').lower() == 'true'
-    }
-    
     # Get output filename if provided
     output_filename = request.form.get('output_filename', '')
     if not output_filename or not output_filename.lower().endswith('.pdf'):
@@ -938,64 +1235,47 @@ def protect_pdf():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_input.pdf")
-    output_filename_internal = os.path.join(PROTECTED_FOLDER, f"{unique_id}_protected.pdf")
-    
     logger.info(f"Processing PDF file for password protection: {file.filename}")
     logger.info(f"Output filename requested: {output_filename}")
     
-    # Save uploaded file
-    try:
-        file.save(input_filename)
-        logger.info(f"File saved successfully. Size: {os.path.getsize(input_filename)} bytes")
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
+    return run_pipeline_request(file, ['protect-pdf'], output_filename, 'application/pdf', protect_headers)
+
+def protect_headers(stats):
+    """Headers of the protect-pdf route"""
+    return {
+        'X-Original-Size': str(stats['original_size']),
+        'X-Protected-Size': str(stats['protected_size']),
+        'X-Has-User-Password': str(stats['has_user_password']).lower(),
+        'X-Has-Owner-Password': str(stats['has_owner_password']).lower()
+    }
+
+@app.route('/api/compress-protect-pdf', methods=['POST'])
+def compress_protect_pdf():
+    """API endpoint to compress a PDF file and add password protection in one pass"""
     
-    try:
-        # Create protector and protect PDF
-        logger.info("Starting PDF password protection")
-        protector = PasswordProtector()
-        output_path, stats = protector.password_protect_pdf(
-            input_filename,
-            output_filename_internal,
-            user_password=user_password,
-            owner_password=owner_password,
-            permissions=permissions
-        )
-        logger.info(f"Protection complete. Original: {stats['original_size']}, Protected: {stats['protected_size']} bytes")
-        
-        # Send the protected file as response
-        response = send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype='application/pdf'
-        )
-        
-        # Add stats as headers
-        response.headers['X-Original-Size'] = str(stats['original_size'])
-        response.headers['X-Protected-Size'] = str(stats['protected_size'])
-        response.headers['X-Has-User-Password'] = str(stats['has_user_password']).lower()
-        response.headers['X-Has-Owner-Password'] = str(stats['has_owner_password']).lower()
+    # Check if PDF file was included in the request
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
         
-        return response
+    file = request.files['file']
+    
+    # Check if the file is a PDF
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Only PDF files are supported'}), 400
+    
+    # Get output filename if provided
+    output_filename = request.form.get('output_filename', '')
+    if not output_filename or not output_filename.lower().endswith('.pdf'):
+        output_filename = f"protected_{file.filename}"
         
-    except Exception as e:
-        logger.error(f"Error during PDF protection: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+    # Make sure output filename is safe
+    output_filename = os.path.basename(output_filename)
+    
+    logger.info(f"Processing PDF file for compression and password protection: {file.filename}")
+    logger.info(f"Output filename requested: {output_filename}")
+    
+    return run_pipeline_request(file, ['compress-protect-pdf'], output_filename, 'application/pdf',
+                                lambda stats: {**pdf_headers(stats), **protect_headers(stats)})
 
 @app.route('/api/unlock-pdf', methods=['POST'])
 def unlock_pdf():
@@ -1011,9 +1291,6 @@ def unlock_pdf():
     if not file.filename or not file.filename.lower().endswith('.pdf'):
         return jsonify({'error': 'Only PDF files are supported'}), 400
     
-    # Get password from request
-    password = request.form.get('password', '')
-    
     # Get output filename if provided
     output_filename = request.form.get('output_filename', '')
     if not output_filename or not output_filename.lower().endswith('.pdf'):
@@ -1022,74 +1299,279 @@ def unlock_pdf():
     # Make sure output filename is safe
     output_filename = os.path.basename(output_filename)
     
-    # Generate unique filenames for internal use
-    unique_id = str(uuid.uuid4())
-    input_filename = os.path.join(UPLOAD_FOLDER, f"{unique_id}_input.pdf")
-    output_filename_internal = os.path.join(PROTECTED_FOLDER, f"{unique_id}_unlocked.pdf")
-    
     logger.info(f"Processing PDF file for password removal: {file.filename}")
     logger.info(f"Output filename requested: {output_filename}")
     
-    # Save uploaded file
-    try:
-        file.save(input_filename)
-        logger.info(f"File saved successfully. Size: {os.path.getsize(input_filename)} bytes")
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': 'Failed to save uploaded file'}), 500
+    return run_pipeline_request(file, ['unlock-pdf'], output_filename, 'application/pdf',
+                                lambda stats: {
+                                    'X-Original-Size': str(stats['original_size']),
+                                    'X-Unlocked-Size': str(stats['unprotected_size']),
+                                    'X-Was-Encrypted': str(stats['was_encrypted']).lower()
+                                })
+
+@app.route('/api/pipeline', methods=['POST'])
+def run_pipeline():
+    """API endpoint to run several tools on one file in a single request
     
-    try:
-        # Create protector and unlock PDF
-        logger.info("Starting PDF password removal")
-        protector = PasswordProtector()
+    Form fields: stages (comma-separated, e.g. "compress-pdf,protect-pdf"),
+    plus the fields each stage's route takes.
+    """
+    
+    # Check if file was included in the request
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
         
+    file = request.files['file']
+    
+    # Check if a file was selected
+    if not file.filename:
+        return jsonify({'error': 'No file selected'}), 400
+    
+    stage_names = [name.strip() for name in request.form.get('stages', '').split(',') if name.strip()]
+    
+    download_name = f"processed_{os.path.basename(file.filename)}"
+    mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    original_size = upload_size(file)
+    
+    return run_pipeline_request(file, stage_names, download_name, mimetype,
+                                lambda stats: {
+                                    'X-Stages': ','.join(stage_names),
+                                    'X-Original-Size': str(original_size),
+                                    **target_headers(stats)
+                                })
+
+def remove_files(paths):
+    """Remove job input files, ignoring ones that are already gone"""
+    for path in paths:
         try:
-            output_path, stats = protector.remove_pdf_password(input_filename, output_filename_internal, password)
-            logger.info(f"Unlocking complete. Original: {stats['original_size']}, Unlocked: {stats['unprotected_size']} bytes")
-            
-            # Send the unlocked file as response
-            response = send_file(
-                output_path,
-                as_attachment=True,
-                download_name=output_filename,
-                mimetype='application/pdf'
-            )
-            
-            # Add stats as headers
-            response.headers['X-Original-Size'] = str(stats['original_size'])
-            response.headers['X-Unlocked-Size'] = str(stats['unprotected_size'])
-            response.headers['X-Was-Encrypted'] = str(stats['was_encrypted']).lower()
-            
-            return response
-            
-        except ValueError as ve:
-            # Handle incorrect password specifically
-            if "Incorrect password" in str(ve):
-                return jsonify({'error': 'Incorrect password for this PDF'}), 403
-            else:
-                raise
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info(f"Cleaned up file: {path}")
+        except Exception as e:
+            logger.warning(f"Failed to clean up file {path}: {str(e)}")
+
+def run_compress_pdf_job(params, secrets, progress):
+    """Job handler for compress-pdf"""
+    try:
+        compressor = PDFCompressor(compression_level=params['compression_level'], max_workers=PDF_WORKERS)
+        output_path, stats = compressor.compress_pdf(params['input_path'], params['output_path'],
+                                                     progress_callback=progress)
+        return {'output_path': output_path, 'download_name': params['download_name'],
+                'mimetype': 'application/pdf', 'stats': stats}
+    finally:
+        remove_files([params['input_path']])
+
+def run_zip_files_job(params, secrets, progress):
+    """Job handler for zip-files"""
+    try:
+        zip_handler = ZipHandler(compression_level=params['compression_level'], max_workers=ZIP_WORKERS)
+        output_path, stats = zip_handler.zip_files(params['input_paths'], params['output_path'],
+                                                   progress_callback=progress)
+        return {'output_path': output_path, 'download_name': params['download_name'],
+                'mimetype': 'application/zip', 'stats': stats}
+    finally:
+        remove_files(params['input_paths'])
+
+def job_password(secrets):
+    """Password of a job; it isn't stored, so a job taken over from a stopped server process has none"""
+    if 'password' not in secrets:
+        raise ValueError('The password was lost when the server restarted; submit the job again')
+    return secrets['password']
+
+def run_secure_multiple_job(params, secrets, progress):
+    """Job handler for secure-multiple"""
+    try:
+        secure_handler = SecureFileHandler()
+        output_path, stats = secure_handler.secure_multiple_files(
+            params['input_paths'],
+            job_password(secrets),
+            output_dir=JOB_FOLDER,
+            output_filename=os.path.basename(params['output_path']),
+            progress_callback=progress,
+            max_workers=SECURE_WORKERS
+        )
+        return {'output_path': output_path, 'download_name': params['download_name'],
+                'mimetype': 'application/octet-stream', 'stats': stats}
+    finally:
+        remove_files(params['input_paths'])
+
+def run_extract_secure_job(params, secrets, progress):
+    """Job handler for extract-secure"""
+    extract_dir = os.path.join(EXTRACT_FOLDER, params['job_key'])
+    try:
+        secure_handler = SecureFileHandler()
+        extract_dir, stats = secure_handler.extract_secure_package(
+            params['input_path'], job_password(secrets), extract_dir, progress_callback=progress)
+        
+        if stats['file_count'] == 0:
+            raise ValueError('The secure package is empty')
+        
+        # Keep a single file as is, otherwise zip the extracted files
+        if stats['file_count'] == 1:
+            file_info = stats['extracted_files'][0]
+            output_path = os.path.join(JOB_FOLDER, f"{params['job_key']}_{file_info['name']}")
+            shutil.move(file_info['path'], output_path)
+            download_name = file_info['name']
+            mimetype = 'application/octet-stream'
+        else:
+            output_path = os.path.join(JOB_FOLDER, f"{params['job_key']}_extracted.zip")
+            with zipfile.ZipFile(output_path, 'w') as zipf:
+                for file_info in stats['extracted_files']:
+                    zipf.write(file_info['path'], arcname=file_info['name'])
+            download_name = params['download_name']
+            mimetype = 'application/zip'
+        
+        # Paths inside the extract directory are gone once the job finishes
+        for file_info in stats['extracted_files']:
+            file_info.pop('path', None)
         
+        return {'output_path': output_path, 'download_name': download_name,
+                'mimetype': mimetype, 'stats': stats}
+    finally:
+        remove_files([params['input_path']])
+        if os.path.exists(extract_dir):
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+job_queue.register('compress-pdf', run_compress_pdf_job, JOB_CONCURRENCY['compress-pdf'])
+job_queue.register('zip-files', run_zip_files_job, JOB_CONCURRENCY['zip-files'])
+job_queue.register('secure-multiple', run_secure_multiple_job, JOB_CONCURRENCY['secure-multiple'])
+job_queue.register('extract-secure', run_extract_secure_job, JOB_CONCURRENCY['extract-secure'])
+
+@app.route('/api/jobs/<tool>', methods=['POST'])
+def submit_job(tool):
+    """API endpoint to run a long operation in the background; returns a job id"""
+    
+    if tool not in JOB_CONCURRENCY:
+        return jsonify({'error': f'Unsupported job type: {tool}'}), 404
+    
+    unique_id = str(uuid.uuid4())
+    secrets = {}
+    
+    # Validate the request the same way as the synchronous routes
+    if tool in ('compress-pdf', 'extract-secure'):
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        files = [request.files['file']]
+        extension = '.pdf' if tool == 'compress-pdf' else '.sfp'
+        if not files[0].filename or not files[0].filename.lower().endswith(extension):
+            return jsonify({'error': f'Only {extension} files are supported'}), 400
+    else:
+        files = [f for f in request.files.getlist('files[]') if f.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+    
+    if tool in ('secure-multiple', 'extract-secure'):
+        password = request.form.get('password')
+        if not password:
+            return jsonify({'error': 'Password is required'}), 400
+        secrets['password'] = password
+    
+    # Save uploaded files
+    saved_file_paths = []
+    try:
+        for file in files:
+            file_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_{os.path.basename(file.filename)}")
+            save_upload(file, file_path)
+            saved_file_paths.append(file_path)
+            logger.info(f"Saved file for {tool} job: {file_path}, size: {os.path.getsize(file_path)}")
     except Exception as e:
-        logger.error(f"Error during PDF unlocking: {str(e)}")
+        logger.error(f"Error saving files: {str(e)}")
         logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up the uploaded file
+        remove_files(saved_file_paths)
+        return jsonify({'error': 'Failed to save uploaded files'}), 500
+    
+    if tool == 'compress-pdf':
+        compression_level = request.form.get('compression_level', 'medium')
+        if compression_level not in ['low', 'medium', 'high', 'extreme']:
+            compression_level = 'medium'
+        output_filename = request.form.get('output_filename', '')
+        if not output_filename or not output_filename.lower().endswith('.pdf'):
+            output_filename = f"compressed_{files[0].filename}"
+        params = {
+            'input_path': saved_file_paths[0],
+            'output_path': os.path.join(JOB_FOLDER, f"{unique_id}_compressed.pdf"),
+            'compression_level': compression_level,
+            'download_name': os.path.basename(output_filename)
+        }
+    elif tool == 'zip-files':
         try:
-            if os.path.exists(input_filename):
-                os.remove(input_filename)
-                logger.info(f"Cleaned up input file: {input_filename}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up file {input_filename}: {str(e)}")
+            compression_level = int(request.form.get('compression_level', '6'))
+            if compression_level < 0 or compression_level > 9:
+                compression_level = 6
+        except ValueError:
+            compression_level = 6
+        output_filename = request.form.get('output_filename', '')
+        if not output_filename or not output_filename.lower().endswith('.zip'):
+            output_filename = "archive.zip"
+        output_filename = os.path.basename(output_filename)
+        params = {
+            'input_paths': saved_file_paths,
+            'output_path': os.path.join(JOB_FOLDER, f"{unique_id}_{output_filename}"),
+            'compression_level': compression_level,
+            'download_name': output_filename
+        }
+    elif tool == 'secure-multiple':
+        output_filename = os.path.basename(request.form.get('output_filename', '') or "secured_files.sfp")
+        if not output_filename.lower().endswith('.sfp'):
+            output_filename = f"{output_filename}.sfp"
+        params = {
+            'input_paths': saved_file_paths,
+            'output_path': os.path.join(JOB_FOLDER, f"{unique_id}_{output_filename}"),
+            'download_name': output_filename
+        }
+    else:
+        params = {
+            'input_path': saved_file_paths[0],
+            'job_key': unique_id,
+            'download_name': f"extracted_{os.path.basename(files[0].filename).replace('.sfp', '.zip')}"
+        }
+    
+    job_id = job_queue.submit(tool, params, secrets)
+    logger.info(f"Queued {tool} job {job_id}")
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """API endpoint reporting the status and progress of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    result = job['result'] or {}
+    return jsonify({
+        'job_id': job['id'],
+        'tool': job['tool'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'stats': result.get('stats'),
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }), 200
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """API endpoint to download the output of a finished background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == JOB_EXPIRED:
+        return jsonify({'error': 'Job output is no longer available'}), 410
+    if job['status'] != JOB_DONE:
+        return jsonify({'error': job['error'] or 'Job has not finished yet', 'status': job['status']}), 409
+    
+    result = job['result']
+    if not os.path.exists(result['output_path']):
+        return jsonify({'error': 'Job output is no longer available'}), 410
+    
+    return send_output(
+        result['output_path'],
+        as_attachment=True,
+        download_name=result['download_name'],
+        mimetype=result['mimetype']
+    )
 
 if __name__ == '__main__':
-    try:
-        # Verify PyMuPDF is installed correctly
-        import fitz
-        logger.info(f"PyMuPDF (fitz) version: {fitz.__version__}")
-    except ImportError:
-        logger.critical("PyMuPDF (fitz) is not installed. Please install it with: pip install pymupdf==1.23.6")
-        exit(1)
-        
+    logger.info(f"PyMuPDF (fitz) version: {fitz.__version__}")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Dict, Any, Tuple, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """Short-lived store of processed outputs handed out by token
+
+    Lets a preview request (e.g. /api/compression-stats) keep its output so the
+    follow-up download can be served without processing the file again.
+    Each artifact gets its own file in the store directory (a hard link where
+    possible, so registering a cached output costs no copy) and is deleted once
+    its TTL has passed. An artifact may also be stats only (no file), for
+    outputs that were streamed to the client as they were produced.
+
+    The token index lives in memory, so files left in the directory by a
+    previous run, or registered by another process sharing it (e.g. another
+    gunicorn worker), are only found by a purge with scan=True: at startup,
+    and on every OutputJanitor pass for stores handed to the janitor.
+    """
+
+    def __init__(self, store_dir: str, ttl_seconds: int = 600):
+        """
+        Initialize the store
+
+        Args:
+            store_dir: Directory to keep artifacts in
+            ttl_seconds: How long an artifact stays available after registration
+        """
+        self.store_dir = store_dir
+        self.ttl_seconds = ttl_seconds
+        # token -> (path, stats, expires_at)
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        self.purge_expired(scan=True)
+
+    def register(self, path: str, stats: Dict[str, Any], token: str = None, move: bool = False) -> str:
+        """
+        Keep an output available under a token
+
+        Args:
+            path: Output file to keep, or None to keep only the stats
+            stats: Stats to return alongside the file
+            token: Token to use, generated if not provided
+            move: Move the file into the store instead of linking/copying it
+
+        Returns:
+            The token
+        """
+        token = token or str(uuid.uuid4())
+        artifact_path = None
+        if path is not None:
+            ext = os.path.splitext(path)[1]
+            artifact_path = os.path.join(self.store_dir, f"{token}_artifact{ext}")
+            if move:
+                shutil.move(path, artifact_path)
+            else:
+                try:
+                    os.link(path, artifact_path)
+                except OSError:
+                    shutil.copyfile(path, artifact_path)
+
+        with self._lock:
+            self._artifacts[token] = (artifact_path, dict(stats), time.time() + self.ttl_seconds)
+        self.purge_expired()
+        return token
+
+    def get(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up an artifact by token
+
+        Returns:
+            Tuple of (path, stats), or None if the token is unknown or expired;
+            path is None for stats-only artifacts
+        """
+        self.purge_expired()
+        with self._lock:
+            artifact = self._artifacts.get(token)
+        if artifact is None or (artifact[0] is not None and not os.path.exists(artifact[0])):
+            return None
+        return artifact[0], dict(artifact[1])
+
+    def purge_expired(self, scan: bool = False, in_use: Callable[[str], bool] = None):
+        """
+        Delete artifacts whose TTL has passed
+
+        Args:
+            scan: Also delete expired files in the store directory that are not
+                in this store's index (see the class docstring)
+            in_use: Callable(path) telling whether a file is still being sent;
+                such files are left for a later purge
+        """
+        now = time.time()
+        with self._lock:
+            expired = [token for token, (path, _, expires_at) in self._artifacts.items()
+                       if expires_at <= now and not (in_use and path is not None and in_use(path))]
+            paths = [self._artifacts.pop(token)[0] for token in expired]
+            indexed = {path for path, _, _ in self._artifacts.values()}
+
+        if scan:
+            with os.scandir(self.store_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False) or entry.path in indexed:
+                        continue
+                    # Linking, moving and copying a file into the store all set
+                    # its ctime, so that is when it was registered
+                    if entry.stat(follow_symlinks=False).st_ctime + self.ttl_seconds > now:
+                        continue
+                    if in_use and in_use(entry.path):
+                        continue
+                    paths.append(entry.path)
+
+        for path in paths:
+            try:
+                if path is not None and os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Removed expired artifact: {path}")
+            except OSError as e:
+                logger.warning(f"Failed to remove expired artifact {path}: {e}")
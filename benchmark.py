@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from pdf_compressor import PDFCompressor, format_size
+from password_protect import PasswordProtector
+from image_compressor import ImageCompressor
+from secure_files import SecureFileHandler
+from zip_utils import ZipHandler
+
+
+def make_files(directory, count, size, compressible=False):
+    """Create count files of the given size (random data, or text-like data if compressible)"""
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"member_{index:03d}.bin")
+        with open(path, 'wb') as f:
+            if compressible:
+                # Random words from a small vocabulary, roughly 3:1 with deflate
+                words = [os.urandom(6).hex().encode() for _ in range(256)]
+                data = b" ".join(words[byte] for byte in os.urandom(size // 8))
+                f.write(data[:size].ljust(size, b" "))
+            else:
+                f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def make_pdf(path, pages, image_size):
+    """Create a PDF with one noisy RGB image of image_size x image_size pixels per page"""
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        # A flat colour with every 8th byte random, so the images do not compress to nothing
+        samples = bytearray(bytes((200, 120, 40)) * (image_size * image_size))
+        samples[::8] = os.urandom(len(samples[::8]))
+        pixmap = fitz.Pixmap(fitz.csRGB, image_size, image_size, bytes(samples), False)
+        page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_photo(path, width, height):
+    """Create a camera-sized JPEG: gradients with sensor-like noise"""
+    from PIL import Image
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    photo = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    photo.save(path, format='JPEG', quality=92)
+    return path
+
+
+def memory_status(field):
+    """A memory figure (e.g. VmRSS, VmHWM) of this process in bytes, from /proc (Linux only)"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def compress_image_in_child(compressor, input_path, output_path, repeat):
+    """Run in a fresh process: best time of compress_image and how far it raised the peak RSS"""
+    try:
+        # Reset the peak RSS, which a spawned process inherits from its parent on Linux
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        baseline = memory_status("VmRSS")
+        peak_rss = lambda: memory_status("VmHWM")
+    except OSError:
+        # ru_maxrss is in KB on Linux and BSD, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        baseline = peak_rss()
+
+    elapsed = time_best(lambda: compressor.compress_image(input_path, output_path), repeat)
+    _, stats = compressor.compress_image(input_path, output_path)
+    return elapsed, peak_rss() - baseline, stats
+
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to max_workers (always including max_workers)"""
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def time_best(func, repeat):
+    """Best wall time of repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_secure_multiple(args):
+    """Throughput of SecureFileHandler.secure_multiple_files per worker count"""
+    work_dir = tempfile.mkdtemp(prefix="bench_secure_")
+    try:
+        paths = make_files(work_dir, args.files, args.size)
+        total = args.files * args.size
+        handler = SecureFileHandler()
+
+        print(f"secure_multiple_files: {args.files} files x {format_size(args.size)}, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in worker_counts(args.workers):
+            elapsed = time_best(lambda: handler.secure_multiple_files(
+                paths, "benchmark", output_dir=work_dir, output_filename="bench.sfp",
+                max_workers=workers), args.repeat)
+            baseline = baseline or elapsed
+            print(f"  workers={workers:<3} {elapsed:7.3f} s  {total / elapsed / 1024 / 1024:8.1f} MB/s"
+                  f"  speedup x{baseline / elapsed:.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_zip_files(args):
+    """Throughput of ZipHandler.zip_files per worker count"""
+    work_dir = tempfile.mkdtemp(prefix="bench_zip_")
+    try:
+        paths = make_files(work_dir, args.files, args.size, compressible=True)
+        total = args.files * args.size
+        output_path = os.path.join(work_dir, "bench.zip")
+
+        print(f"zip_files: {args.files} files x {format_size(args.size)}, level {args.level}, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in worker_counts(args.workers):
+            handler = ZipHandler(compression_level=args.level, max_workers=workers)
+            elapsed = time_best(lambda: handler.zip_files(paths, output_path), args.repeat)
+            baseline = baseline or elapsed
+            print(f"  workers={workers:<3} {elapsed:7.3f} s  {total / elapsed / 1024 / 1024:8.1f} MB/s"
+                  f"  speedup x{baseline / elapsed:.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_compress_protect(args):
+    """Latency of compress then protect as two tools against one open and one save"""
+    work_dir = tempfile.mkdtemp(prefix="bench_compress_protect_")
+    try:
+        input_path = make_pdf(os.path.join(work_dir, "input.pdf"), args.pages, args.image_size)
+        compressed_path = os.path.join(work_dir, "compressed.pdf")
+        output_path = os.path.join(work_dir, "protected.pdf")
+        compressor = PDFCompressor(compression_level=args.level)
+        protector = PasswordProtector()
+
+        def chained():
+            compressor.compress_pdf(input_path, compressed_path)
+            protector.password_protect_pdf(compressed_path, output_path, user_password="benchmark")
+
+        def single_open():
+            doc = fitz.open(input_path)
+            compressor.compress_document(doc, source_path=input_path)
+            protector.protect_document(doc, output_path, user_password="benchmark",
+                                       save_options=compressor.save_options)
+            doc.close()
+
+        print(f"compress + protect: {args.pages} pages, {format_size(os.path.getsize(input_path))}, level {args.level}")
+        chained_time = time_best(chained, args.repeat)
+        chained_size = os.path.getsize(output_path)
+        single_time = time_best(single_open, args.repeat)
+        single_size = os.path.getsize(output_path)
+        print(f"  two tools   {chained_time:7.3f} s  {format_size(chained_size)}")
+        print(f"  single open {single_time:7.3f} s  {format_size(single_size)}"
+              f"  saved {(chained_time - single_time) * 1000:.0f} ms ({(1 - single_time / chained_time) * 100:.1f}%)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_compress_image(args):
+    """Latency and peak memory of ImageCompressor.compress_image on a large photo"""
+    work_dir = tempfile.mkdtemp(prefix="bench_image_")
+    try:
+        input_path = make_photo(os.path.join(work_dir, "photo.jpg"), args.width, args.height)
+        output_path = os.path.join(work_dir, "compressed.jpg")
+        variants = [
+            ("original size", ImageCompressor(args.level, max_dimension=0)),
+            ("resized, full decode", ImageCompressor(args.level, draft=False)),
+            ("resized, draft decode", ImageCompressor(args.level)),
+        ]
+
+        print(f"compress_image: {args.width}x{args.height} JPEG, {format_size(os.path.getsize(input_path))}, "
+              f"level {args.level}")
+        # Each variant runs in a fresh process so the peak RSS is its own
+        context = multiprocessing.get_context("spawn")
+        for name, compressor in variants:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                elapsed, rss, stats = executor.submit(
+                    compress_image_in_child, compressor, input_path, output_path, args.repeat).result()
+            width, height = stats['dimensions']
+            print(f"  {name:<22} {elapsed:7.3f} s  peak RSS +{format_size(rss):>10}  "
+                  f"{width}x{height}  {format_size(stats['compressed_size'])}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FileEase operations")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    secure_parser = subparsers.add_parser("secure-multiple", help="Parallel SECPACK encryption")
+    secure_parser.add_argument("--files", type=int, default=32, help="Number of files")
+    secure_parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="Size of each file in bytes")
+    secure_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                               help="Highest worker count to measure")
+    secure_parser.set_defaults(func=bench_secure_multiple)
+
+    zip_parser = subparsers.add_parser("zip-files", help="Parallel ZIP creation")
+    zip_parser.add_argument("--files", type=int, default=32, help="Number of files")
+    zip_parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="Size of each file in bytes")
+    zip_parser.add_argument("--level", type=int, default=6, help="Deflate level (0-9)")
+    zip_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                            help="Highest worker count to measure")
+    zip_parser.set_defaults(func=bench_zip_files)
+
+    pdf_parser = subparsers.add_parser("compress-protect", help="Compress then password-protect a PDF")
+    pdf_parser.add_argument("--pages", type=int, default=20, help="Number of pages (one image each)")
+    pdf_parser.add_argument("--image-size", type=int, default=1200, help="Image width and height in pixels")
+    pdf_parser.add_argument("--level", default="medium", choices=["low", "medium", "high", "extreme"],
+                            help="Compression level")
+    pdf_parser.set_defaults(func=bench_compress_protect)
+
+    image_parser = subparsers.add_parser("compress-image", help="Draft-mode JPEG decoding")
+    image_parser.add_argument("--width", type=int, default=6000, help="Photo width in pixels")
+    image_parser.add_argument("--height", type=int, default=4000, help="Photo height in pixels")
+    image_parser.add_argument("--level", default="medium", choices=["low", "medium", "high", "extreme"],
+                              help="Compression level")
+    image_parser.set_defaults(func=bench_compress_image)
+
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    args.func(args)
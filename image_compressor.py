@@ -1,6 +1,11 @@
 import os
+import io
+import math
+import time
 import logging
 import uuid
+import PIL
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 
 # Configure logging
@@ -16,12 +21,29 @@ def format_size(size, decimal_places=2):
         size /= 1024.0
     return f"{size:.{decimal_places}f} {unit}"
 
+def _compress_worker(compressor, input_path, output_path):
+    """Pool entry point: compress one image in a worker process"""
+    return compressor.compress_image(input_path, output_path)
+
 class ImageCompressor:
     """Class to handle image compression with different quality levels"""
     
-    def __init__(self, compression_level='medium'):
-        """Initialize with compression level"""
+    # Bump whenever the output for a given input and level changes
+    version = f"2-pillow{PIL.__version__}"
+    
+    def __init__(self, compression_level='medium', max_dimension=None, draft=True):
+        """
+        Initialize with compression level
+        
+        Args:
+            compression_level (str): low, medium, high, or extreme
+            max_dimension (int, optional): Longest side of the output in pixels; None uses the
+                level's default, 0 keeps the original size
+            draft (bool): Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+                images that are going to be shrunk
+        """
         self.compression_level = compression_level
+        self.draft = draft
         
         # Define quality levels for different compression levels
         self.quality_levels = {
@@ -31,6 +53,16 @@ class ImageCompressor:
             'extreme': 25     # Maximum compression, lowest quality
         }
         
+        # Longest side of the output for each level; larger images are scaled down
+        self.max_dimensions = {
+            'low': 4096,
+            'medium': 2560,
+            'high': 1920,
+            'extreme': 1280
+        }
+        self.max_dimension = (self.max_dimensions.get(compression_level, 2560)
+                              if max_dimension is None else max_dimension)
+        
         # Define formats and their specific settings
         self.format_settings = {
             'JPEG': {
@@ -77,25 +109,15 @@ class ImageCompressor:
             with Image.open(input_path) as img:
                 # Determine the output format
                 input_format = img.format
+                original_dimensions = img.size
+                
+                # Scale down images larger than the level allows
+                if self.max_dimension and max(img.size) > self.max_dimension:
+                    img = self._downscale(img, self.max_dimension)
+                
                 # Convert if needed and compress
-                if input_format == 'JPEG' or input_format == 'JPG':
-                    if input_path.lower().endswith('.jpg'):
-                        output_format = 'JPEG'
-                    else:
-                        output_format = input_format
-                    img.save(output_path, format=output_format, **self.format_settings['JPEG'])
-                elif input_format == 'PNG':
-                    img.save(output_path, format=input_format, **self.format_settings['PNG'])
-                elif input_format == 'WebP':
-                    img.save(output_path, format=input_format, **self.format_settings['WebP'])
-                else:
-                    # Default to JPEG for unsupported formats
-                    logger.warning(f"Converting unsupported format {input_format} to JPEG")
-                    # If it has alpha channel, convert to PNG
-                    if img.mode == 'RGBA':
-                        img.save(output_path, format='PNG', **self.format_settings['PNG'])
-                    else:
-                        img.save(output_path, format='JPEG', **self.format_settings['JPEG'])
+                output_format, settings = self._output_format(img, input_format, input_path)
+                img.save(output_path, format=output_format, **settings)
                 
                 # Get compressed size
                 compressed_size = os.path.getsize(output_path)
@@ -111,7 +133,9 @@ class ImageCompressor:
                     'saved_bytes': saved_bytes,
                     'saved_percent': saved_percent,
                     'compression_level': self.compression_level,
-                    'format': input_format
+                    'format': input_format,
+                    'original_dimensions': original_dimensions,
+                    'dimensions': img.size
                 }
                 
                 return output_path, stats
@@ -120,16 +144,248 @@ class ImageCompressor:
             logger.error(f"Error compressing image: {str(e)}")
             raise
     
-    def batch_compress_images(self, input_paths, output_dir=None):
+    def compress_to_size(self, input_path, target_size, output_path=None, allow_resize=True,
+                         min_quality=10, max_quality=95, max_scale_steps=5):
         """
-        Compress multiple images
+        Compress an image to at most target_size bytes, keeping as much quality as possible
+        
+        The image is decoded once (scaled down to the level's max_dimension
+        like compress_image) and encoded into memory buffers: a binary search
+        on quality, starting from the level's quality, finds the highest one
+        that fits. If even min_quality does not fit and allow_resize is set,
+        the image is scaled down by the factor the size overshoot suggests and
+        searched again. PNG has no quality setting, so only scaling applies.
+        Only the chosen encode is written to output_path.
+        
+        Args:
+            input_path (str): Path to the input image
+            target_size (int): Largest acceptable output size in bytes
+            output_path (str, optional): Path to save the compressed image
+            allow_resize (bool): Scale the image down when quality alone cannot reach the target
+            min_quality (int): Lowest quality tried
+            max_quality (int): Highest quality tried
+            max_scale_steps (int): Most times the image is scaled down
+            
+        Returns:
+            tuple: (output_path, stats_dict); stats include whether the target was met
+            (the smallest encode found is written otherwise), the quality and scale
+            chosen, the number of encodes and the time spent searching
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+        if target_size <= 0:
+            raise ValueError("Target size must be positive")
+            
+        # Generate output path if not provided
+        if not output_path:
+            filename = os.path.basename(input_path)
+            dirname = os.path.dirname(input_path)
+            output_path = os.path.join(dirname, f"compressed_{filename}")
+        
+        original_size = os.path.getsize(input_path)
+        start = time.perf_counter()
+        
+        with Image.open(input_path) as img:
+            input_format = img.format
+            original_dimensions = img.size
+            
+            # Decode once; every attempt encodes from these pixels
+            if self.max_dimension and max(img.size) > self.max_dimension:
+                img = self._downscale(img, self.max_dimension)
+            else:
+                img.load()
+            output_format, settings = self._output_format(img, input_format, input_path)
+            lossy = 'quality' in settings
+            
+            encodes = 0
+            smallest = None  # (buffer, quality, scale) of the smallest encode so far
+            
+            def encode(image, quality, scale):
+                nonlocal encodes, smallest
+                encodes += 1
+                buffer = io.BytesIO()
+                image.save(buffer, format=output_format,
+                           **(dict(settings, quality=quality) if lossy else settings))
+                if smallest is None or buffer.tell() < smallest[0].tell():
+                    smallest = (buffer, quality, scale)
+                return buffer
+            
+            def search_quality(image, scale):
+                """Best fitting (buffer, quality) at this scale, or None"""
+                if not lossy:
+                    buffer = encode(image, None, scale)
+                    return (buffer, None) if buffer.tell() <= target_size else None
+                
+                fit = None
+                over = None  # (quality, size) of the lowest quality that was too large
+                low, high = min_quality, max_quality
+                quality = min(max(settings['quality'], low), high)
+                while low <= high:
+                    buffer = encode(image, quality, scale)
+                    size = buffer.tell()
+                    if size <= target_size:
+                        fit = (buffer, quality)
+                        # Within 5% of the target is as good as it gets
+                        if size >= target_size * 0.95:
+                            break
+                        low = quality + 1
+                    else:
+                        over = (quality, size)
+                        high = quality - 1
+                    if low > high:
+                        break
+                    if fit is not None and over is not None:
+                        # Bracketed: interpolate on log size, which is close to linear in quality
+                        fit_size = fit[0].tell()
+                        position = math.log(target_size / fit_size) / math.log(over[1] / fit_size)
+                        quality = round(fit[1] + (over[0] - fit[1]) * position)
+                        quality = min(max(quality, low), high)
+                    else:
+                        # One-sided so far: guess from a typical slope of log size against quality
+                        quality = round(quality + math.log(target_size / size) / 0.03)
+                        quality = min(max(quality, low), high)
+                return fit
+            
+            scale = 1.0
+            scaled = img
+            fit = search_quality(scaled, scale)
+            steps = 0
+            while fit is None and allow_resize and steps < max_scale_steps and min(scaled.size) > 16:
+                # Encoded size grows roughly with the pixel count
+                factor = min(0.9, 0.95 * (target_size / smallest[0].tell()) ** 0.5)
+                scale *= factor
+                size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                scaled = img.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+                fit = search_quality(scaled, scale)
+                steps += 1
+            
+            if fit is not None:
+                buffer, quality = fit
+            else:
+                buffer, quality, scale = smallest
+                logger.warning(f"Could not reach {target_size} bytes, smallest encode is {buffer.tell()} bytes")
+            dimensions = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        
+        with open(output_path, 'wb') as f:
+            f.write(buffer.getbuffer())
+        search_seconds = time.perf_counter() - start
+        
+        compressed_size = len(buffer.getbuffer())
+        saved_bytes = original_size - compressed_size
+        saved_percent = (saved_bytes / original_size) * 100 if original_size > 0 else 0
+        logger.info(f"Target {target_size} bytes: {compressed_size} bytes at quality {quality}, "
+                    f"scale {scale:.2f} after {encodes} encodes in {search_seconds:.3f} s")
+        
+        stats = {
+            'original_size': original_size,
+            'compressed_size': compressed_size,
+            'saved_bytes': saved_bytes,
+            'saved_percent': saved_percent,
+            'compression_level': self.compression_level,
+            'format': input_format,
+            'original_dimensions': original_dimensions,
+            'dimensions': dimensions,
+            'target_size': target_size,
+            'met_target': fit is not None,
+            'quality': quality,
+            'scale': scale,
+            'iterations': encodes,
+            'search_seconds': search_seconds
+        }
+        return output_path, stats
+    
+    def _output_format(self, img, input_format, input_path):
+        """
+        Choose the format and save options of the compressed image
+        
+        Returns:
+            tuple: (format name for Image.save, settings from format_settings)
+        """
+        if input_format == 'JPEG' or input_format == 'JPG':
+            if input_path.lower().endswith('.jpg'):
+                return 'JPEG', self.format_settings['JPEG']
+            return input_format, self.format_settings['JPEG']
+        elif input_format == 'PNG':
+            return input_format, self.format_settings['PNG']
+        elif input_format == 'WebP':
+            return input_format, self.format_settings['WebP']
+        
+        # Default to JPEG for unsupported formats
+        logger.warning(f"Converting unsupported format {input_format} to JPEG")
+        # If it has alpha channel, convert to PNG
+        if img.mode == 'RGBA':
+            return 'PNG', self.format_settings['PNG']
+        return 'JPEG', self.format_settings['JPEG']
+    
+    def _downscale(self, img, max_dimension):
+        """
+        Scale an opened (not yet loaded) image so its longest side is max_dimension
+        
+        With draft enabled, JPEGs are decoded at the smallest 1/2, 1/4 or 1/8
+        scale that is still at least the target size, so the full-resolution
+        pixels are never held in memory. The rest of the way is an integer
+        box reduction followed by a bicubic resample.
+        
+        Args:
+            img (PIL.Image.Image): Image from Image.open
+            max_dimension (int): Longest side of the result
+            
+        Returns:
+            PIL.Image.Image: The scaled image
+        """
+        scale = max_dimension / max(img.size)
+        target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        if self.draft:
+            # No effect on formats other than JPEG
+            img.draft(None, target)
+        else:
+            img.load()
+        logger.info(f"Scaling {img.format} image to {target[0]}x{target[1]} (decoded at {img.size[0]}x{img.size[1]})")
+        return img.resize(target, Image.Resampling.BICUBIC, reducing_gap=2.0)
+    
+    def decoded_size(self, input_path):
+        """
+        Estimate the memory an image takes once decoded, from its header only
+        
+        Pillow keeps 1 byte per pixel for single-band modes and 4 for the
+        others (RGB included). JPEGs that draft decoding shrinks are counted
+        at their reduced size.
+        
+        Args:
+            input_path (str): Path to the image
+            
+        Returns:
+            int: Estimated size in bytes (0 if the header cannot be read)
+        """
+        try:
+            with Image.open(input_path) as img:
+                bytes_per_pixel = 1 if img.mode in ('1', 'L', 'P') else 4
+                scale = 1
+                if self.draft and img.format == 'JPEG' and self.max_dimension:
+                    # Same choice as the JPEG decoder's draft mode
+                    scale = next((s for s in (8, 4, 2) if max(img.size) // s >= self.max_dimension), 1)
+                return -(-img.width // scale) * -(-img.height // scale) * bytes_per_pixel
+        except Exception:
+            return 0
+    
+    def iter_compress_images(self, input_paths, output_dir=None, max_workers=1, memory_budget=256 * 1024 * 1024):
+        """
+        Compress multiple images across a process pool, yielding each result as it finishes
+        
+        Images are started in input order, and only while the decoded size of
+        the images in flight stays within memory_budget (an image larger than
+        the budget runs on its own), so a batch of large PNGs cannot exhaust
+        memory however many workers there are.
         
         Args:
             input_paths (list): List of paths to input images
             output_dir (str, optional): Directory to save compressed images
+            max_workers (int): Number of worker processes (1 = compress in this process)
+            memory_budget (int): Most decoded-pixel bytes being compressed at once
             
-        Returns:
-            tuple: (output_paths, stats_dict)
+        Yields:
+            tuple: (index in input_paths, result dict); the result holds either the
+            output path and stats of the image, or an 'error' message
         """
         if not input_paths:
             raise ValueError("No input paths provided")
@@ -142,43 +398,89 @@ class ImageCompressor:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        output_paths = []
-        total_original_size = 0
-        total_compressed_size = 0
-        results = []
+        def output_path_for(input_path):
+            # Generate unique filename for the output
+            name, ext = os.path.splitext(os.path.basename(input_path))
+            unique_id = str(uuid.uuid4())[:8]  # Use first 8 chars of UUID
+            return os.path.join(output_dir, f"{name}_compressed_{unique_id}{ext}")
+        
+        def result_for(input_path, compressed_path, stats):
+            return {
+                'input_path': input_path,
+                'output_path': compressed_path,
+                'original_size': stats['original_size'],
+                'compressed_size': stats['compressed_size'],
+                'saved_bytes': stats['saved_bytes'],
+                'saved_percent': stats['saved_percent'],
+                'format': stats['format']
+            }
+        
+        if max_workers <= 1 or len(input_paths) == 1:
+            for index, input_path in enumerate(input_paths):
+                try:
+                    yield index, result_for(input_path, *self.compress_image(input_path, output_path_for(input_path)))
+                except Exception as e:
+                    logger.error(f"Error processing {input_path}: {str(e)}")
+                    yield index, {'input_path': input_path, 'error': str(e)}
+            return
         
-        for input_path in input_paths:
+        sizes = [self.decoded_size(input_path) for input_path in input_paths]
+        in_flight = {}  # future -> (index, decoded size, output path)
+        in_flight_bytes = 0
+        next_index = 0
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(input_paths))) as executor:
             try:
-                # Generate unique filename for the output
-                filename = os.path.basename(input_path)
-                name, ext = os.path.splitext(filename)
-                unique_id = str(uuid.uuid4())[:8]  # Use first 8 chars of UUID
-                output_filename = f"{name}_compressed_{unique_id}{ext}"
-                output_path = os.path.join(output_dir, output_filename)
-                
-                # Compress the image
-                compressed_path, stats = self.compress_image(input_path, output_path)
-                
-                # Update totals
-                total_original_size += stats['original_size']
-                total_compressed_size += stats['compressed_size']
-                
-                # Add to results
-                output_paths.append(compressed_path)
-                results.append({
-                    'input_path': input_path,
-                    'output_path': compressed_path,
-                    'original_size': stats['original_size'],
-                    'compressed_size': stats['compressed_size'],
-                    'saved_bytes': stats['saved_bytes'],
-                    'saved_percent': stats['saved_percent'],
-                    'format': stats['format']
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing {input_path}: {str(e)}")
-                # Continue processing other images even if one fails
-                continue
+                while next_index < len(input_paths) or in_flight:
+                    # Start images in order while they fit in the budget
+                    while (next_index < len(input_paths) and len(in_flight) < max_workers and
+                           (not in_flight or in_flight_bytes + sizes[next_index] <= memory_budget)):
+                        input_path = input_paths[next_index]
+                        output_path = output_path_for(input_path)
+                        future = executor.submit(_compress_worker, self, input_path, output_path)
+                        in_flight[future] = (next_index, sizes[next_index], output_path)
+                        in_flight_bytes += sizes[next_index]
+                        next_index += 1
+                    
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, size, _ = in_flight.pop(future)
+                        in_flight_bytes -= size
+                        input_path = input_paths[index]
+                        try:
+                            yield index, result_for(input_path, *future.result())
+                        except Exception as e:
+                            logger.error(f"Error processing {input_path}: {str(e)}")
+                            yield index, {'input_path': input_path, 'error': str(e)}
+            finally:
+                # Stopped early (e.g. the client went away): drop outputs nobody will collect
+                for future, (_, _, output_path) in in_flight.items():
+                    if not future.cancel():
+                        wait([future])
+                        if os.path.exists(output_path):
+                            os.remove(output_path)
+    
+    def batch_compress_images(self, input_paths, output_dir=None, max_workers=1, memory_budget=256 * 1024 * 1024):
+        """
+        Compress multiple images
+        
+        Args:
+            input_paths (list): List of paths to input images
+            output_dir (str, optional): Directory to save compressed images
+            max_workers (int): Number of worker processes (1 = compress in this process)
+            memory_budget (int): Most decoded-pixel bytes being compressed at once
+            
+        Returns:
+            tuple: (output_paths, stats_dict), in the order of input_paths
+        """
+        results = [None] * len(input_paths)
+        for index, result in self.iter_compress_images(input_paths, output_dir, max_workers, memory_budget):
+            results[index] = result
+        
+        # Continue processing other images even if one fails
+        results = [result for result in results if 'error' not in result]
+        output_paths = [result['output_path'] for result in results]
+        total_original_size = sum(result['original_size'] for result in results)
+        total_compressed_size = sum(result['compressed_size'] for result in results)
         
         # Calculate overall stats
         total_saved_bytes = total_original_size - total_compressed_size
@@ -194,4 +496,4 @@ class ImageCompressor:
             'details': results
         }
         
-        return output_paths, stats 
\ No newline at end of file
+        return output_paths, stats
@@ -0,0 +1,385 @@
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+# Finished job whose record was kept past the retention period; params and result are dropped
+JOB_EXPIRED = 'expired'
+
+
+class InMemoryJobBackend:
+    """Job records kept in a dict; only visible to the current process"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]):
+        """Store a new job record"""
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a job record, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        """Update fields of a job record"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def claim(self, tool: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job of a tool as running and return it"""
+        with self._lock:
+            queued = [job for job in self._jobs.values()
+                      if job['tool'] == tool and job['owner'] == owner and job['status'] == JOB_QUEUED]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j['created_at'])
+            job.update(status=JOB_RUNNING, started_at=time.time())
+            return dict(job)
+
+    def purge(self, finished_before: float, forget_before: float) -> int:
+        """
+        Expire jobs that finished before finished_before, and delete expired
+        jobs that finished before forget_before
+
+        Returns:
+            Number of jobs expired or deleted
+        """
+        with self._lock:
+            forgotten = [job_id for job_id, job in self._jobs.items()
+                         if job['status'] == JOB_EXPIRED and job['finished_at'] < forget_before]
+            for job_id in forgotten:
+                del self._jobs[job_id]
+            expired = 0
+            for job in self._jobs.values():
+                if job['status'] in (JOB_DONE, JOB_FAILED) and job['finished_at'] < finished_before:
+                    job.update(status=JOB_EXPIRED, params=None, result=None)
+                    expired += 1
+            return expired + len(forgotten)
+
+    def heartbeat(self, owner: str):
+        """Record that an owner is alive (every owner of this backend is this process)"""
+
+    def requeue_abandoned(self, owner: str, stale_before: float) -> int:
+        """Jobs are only visible to this process, so no other owner can have abandoned any"""
+        return 0
+
+
+class SQLiteJobBackend:
+    """Job records in a local SQLite database
+
+    Status and results are visible to every process using the same database
+    (e.g. all gunicorn workers), without running anything external.
+    """
+
+    _JSON_FIELDS = ('params', 'result')
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the backend
+
+        Args:
+            db_path: Path to the SQLite database file, created if needed
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (tool, owner, status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at)")
+            # Last heartbeat of each JobQueue, to find jobs of processes that have died
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS owners (
+                    owner TEXT PRIMARY KEY,
+                    seen_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        """Open an autocommit connection, closed when the block exits"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _to_job(self, row) -> Dict[str, Any]:
+        job = dict(row)
+        for field in self._JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def create(self, job: Dict[str, Any]):
+        """Store a new job record"""
+        row = dict(job)
+        for field in self._JSON_FIELDS:
+            row[field] = json.dumps(row.get(field))
+        columns = ', '.join(row)
+        placeholders = ', '.join(f":{name}" for name in row)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", row)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if unknown"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        """Update fields of a job record"""
+        for field in self._JSON_FIELDS:
+            if field in fields:
+                fields[field] = json.dumps(fields[field])
+        assignments = ', '.join(f"{name} = :{name}" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = :job_id", dict(fields, job_id=job_id))
+
+    def claim(self, tool: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job of a tool as running and return it"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE tool = ? AND owner = ? AND status = ? ORDER BY created_at LIMIT 1",
+                    (tool, owner, JOB_QUEUED)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                started_at = time.time()
+                conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                             (JOB_RUNNING, started_at, row['id']))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._to_job(row)
+        job.update(status=JOB_RUNNING, started_at=started_at)
+        return job
+
+    def purge(self, finished_before: float, forget_before: float) -> int:
+        """
+        Expire jobs that finished before finished_before, and delete expired
+        jobs that finished before forget_before
+
+        Returns:
+            Number of jobs expired or deleted
+        """
+        with self._lock, self._connect() as conn:
+            deleted = conn.execute("DELETE FROM jobs WHERE status = ? AND finished_at < ?",
+                                   (JOB_EXPIRED, forget_before)).rowcount
+            expired = conn.execute(
+                "UPDATE jobs SET status = ?, params = NULL, result = NULL "
+                "WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_EXPIRED, JOB_DONE, JOB_FAILED, finished_before)).rowcount
+        return deleted + expired
+
+    def heartbeat(self, owner: str):
+        """Record that an owner is alive"""
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO owners (owner, seen_at) VALUES (?, ?)", (owner, time.time()))
+
+    def requeue_abandoned(self, owner: str, stale_before: float) -> int:
+        """
+        Hand queued and running jobs of owners not seen since stale_before to owner
+
+        Running jobs start over from the beginning.
+
+        Returns:
+            Number of jobs requeued
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                requeued = conn.execute(
+                    "UPDATE jobs SET owner = ?, status = ?, progress = 0, started_at = NULL "
+                    "WHERE status IN (?, ?) AND owner != ? "
+                    "AND owner NOT IN (SELECT owner FROM owners WHERE seen_at >= ?)",
+                    (owner, JOB_QUEUED, JOB_QUEUED, JOB_RUNNING, owner, stale_before)).rowcount
+                conn.execute("DELETE FROM owners WHERE seen_at < ?", (stale_before,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return requeued
+
+
+class JobQueue:
+    """Runs long operations in background worker threads
+
+    Each registered tool gets its own pool of worker threads, which bounds how
+    many jobs of that tool run at once. Jobs are executed by the queue that
+    accepted them; secrets such as passwords are only held in memory and are
+    never written to the backend.
+
+    A maintenance thread records a heartbeat for the queue every
+    maintenance_interval. It takes over the queued and running jobs of queues
+    that have stopped sending heartbeats (e.g. a server process that died),
+    and does the same once at startup. Their secrets are lost, so handlers
+    must fail such jobs when they need them. Finished jobs expire after
+    retention_seconds (status 'expired', without params and result), and
+    their records are deleted after another retention period.
+    """
+
+    def __init__(self, backend=None, poll_interval: float = 1.0, retention_seconds: float = 24 * 3600,
+                 maintenance_interval: float = 60.0):
+        """
+        Initialize the queue
+
+        Args:
+            backend: InMemoryJobBackend (default) or SQLiteJobBackend
+            poll_interval: Seconds between checks for new jobs when idle
+            retention_seconds: How long finished jobs keep their result
+            maintenance_interval: Seconds between heartbeats and purges; a queue
+                silent for three intervals is considered dead
+        """
+        self.backend = backend or InMemoryJobBackend()
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.maintenance_interval = maintenance_interval
+        self.owner = uuid.uuid4().hex
+        self._handlers = {}
+        self._secrets = {}
+        self._secrets_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+
+        self.maintain()
+        threading.Thread(target=self._maintenance_loop, name="job-maintenance", daemon=True).start()
+
+    def maintain(self):
+        """Send a heartbeat, take over abandoned jobs and purge old finished ones"""
+        now = time.time()
+        self.backend.heartbeat(self.owner)
+        requeued = self.backend.requeue_abandoned(self.owner, now - 3 * self.maintenance_interval)
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs abandoned by stopped workers")
+            with self._wakeup:
+                self._wakeup.notify_all()
+        purged = self.backend.purge(now - self.retention_seconds, now - 2 * self.retention_seconds)
+        if purged:
+            logger.info(f"Expired or deleted {purged} finished jobs")
+
+    def _maintenance_loop(self):
+        while True:
+            time.sleep(self.maintenance_interval)
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Job maintenance failed: {e}")
+
+    def register(self, tool: str, handler: Callable, max_concurrency: int = 1):
+        """
+        Register a tool and start its workers
+
+        Args:
+            tool: Name used when submitting jobs
+            handler: Callable(params, secrets, progress) returning a JSON-serializable result dict;
+                progress is a callable taking a fraction between 0 and 1
+            max_concurrency: Number of jobs of this tool that may run at once
+        """
+        self._handlers[tool] = handler
+        for index in range(max(1, max_concurrency)):
+            worker = threading.Thread(target=self._worker, args=(tool,),
+                                      name=f"job-{tool}-{index}", daemon=True)
+            worker.start()
+
+    def submit(self, tool: str, params: Dict[str, Any], secrets: Dict[str, Any] = None) -> str:
+        """
+        Queue a job
+
+        Args:
+            tool: Registered tool name
+            params: JSON-serializable job parameters
+            secrets: Values the handler needs that must not be persisted
+
+        Returns:
+            The job id
+        """
+        if tool not in self._handlers:
+            raise ValueError(f"Unknown tool: {tool}")
+
+        job_id = str(uuid.uuid4())
+        if secrets:
+            with self._secrets_lock:
+                self._secrets[job_id] = secrets
+
+        self.backend.create({
+            'id': job_id,
+            'tool': tool,
+            'owner': self.owner,
+            'status': JOB_QUEUED,
+            'progress': 0.0,
+            'params': params,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        })
+
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if unknown"""
+        return self.backend.get(job_id)
+
+    def _worker(self, tool: str):
+        """Worker loop: claim and run queued jobs of one tool"""
+        handler = self._handlers[tool]
+        while True:
+            job = self.backend.claim(tool, self.owner)
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id = job['id']
+            with self._secrets_lock:
+                secrets = self._secrets.pop(job_id, {})
+
+            def progress(fraction, job_id=job_id):
+                self.backend.update(job_id, progress=round(min(1.0, max(0.0, fraction)), 4))
+
+            logger.info(f"Running {tool} job {job_id}")
+            try:
+                result = handler(job['params'], secrets, progress)
+                self.backend.update(job_id, status=JOB_DONE, progress=1.0,
+                                    result=result, finished_at=time.time())
+                logger.info(f"Finished {tool} job {job_id}")
+            except Exception as e:
+                logger.error(f"Job {job_id} ({tool}) failed: {str(e)}")
+                logger.error(traceback.format_exc())
+                self.backend.update(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
@@ -0,0 +1,248 @@
+import os
+import time
+import logging
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+
+class OutputJanitor:
+    """Deletes tool outputs once they expire or the output folders grow too large
+
+    Keeps an index of the files in the output folders (built once from a scan
+    at startup, then kept up to date by track), so sweeps never list the
+    folders again. Files are evicted when they have not been written or
+    downloaded for ttl_seconds, and least recently used files first while the
+    folders hold more than max_bytes. Subdirectories are left alone: the
+    result cache evicts its own files, and token stores (ArtifactStore) passed
+    as stores expire theirs, with the janitor purging them on every pass, so
+    files from a previous run or another process are removed as well.
+
+    Files being downloaded are leased and never evicted until the response
+    is closed.
+    """
+
+    def __init__(self, folders: List[str], ttl_seconds: int = 3600, max_bytes: int = 2 * 1024 * 1024 * 1024,
+                 interval_seconds: int = 60, stores: List[Any] = None):
+        """
+        Initialize the janitor
+
+        Args:
+            folders: Output folders to manage (only files directly inside them)
+            ttl_seconds: How long an output is kept after it was written or last downloaded
+            max_bytes: Maximum total size of the outputs
+            interval_seconds: Time between sweeps of the background thread
+            stores: ArtifactStores purged (with a scan of their directory) on every sweep
+                of the background thread
+        """
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.stores = list(stores or [])
+        self.total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+        self.freed_bytes = 0
+        self.sweeps = 0
+        # path -> (size, last_used), least recently used first
+        self._files = OrderedDict()
+        # path -> number of responses still sending it
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._load_index()
+
+    def _load_index(self):
+        """Index the files already in the output folders, e.g. left over from a previous run"""
+        found = []
+        for folder in self.folders:
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        found.append((stat.st_mtime, entry.path, stat.st_size))
+
+        # Oldest first
+        for mtime, path, size in sorted(found):
+            self._files[path] = (size, mtime)
+            self.total_bytes += size
+        logger.info(f"Indexed {len(found)} existing outputs ({self.total_bytes} bytes)")
+
+    def _folder_of(self, path: str) -> Optional[str]:
+        """Managed folder path is directly inside, or None"""
+        folder = os.path.dirname(os.path.abspath(path))
+        return folder if folder in self.folders else None
+
+    def track(self, path: str):
+        """
+        Add a new (or rewritten) output to the index
+
+        Paths outside the managed folders are ignored, so callers can pass any output.
+        """
+        if not path or self._folder_of(path) is None:
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            previous = self._files.pop(path, None)
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self._files[path] = (size, time.time())
+            self.total_bytes += size
+            over_quota = self.total_bytes > self.max_bytes
+        if over_quota:
+            self.sweep()
+
+    def lease(self, path: str):
+        """Protect an output from eviction (e.g. while it is downloaded) and mark it used"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._leases[path] = self._leases.get(path, 0) + 1
+            entry = self._files.get(path)
+            if entry is not None:
+                self._files[path] = (entry[0], time.time())
+                self._files.move_to_end(path)
+
+    def release(self, path: str):
+        """End a lease taken with lease"""
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._leases.get(path, 0) - 1
+            if count > 0:
+                self._leases[path] = count
+            else:
+                self._leases.pop(path, None)
+
+    def is_leased(self, path: str) -> bool:
+        """Whether a response is still sending the file at path"""
+        with self._lock:
+            return os.path.abspath(path) in self._leases
+
+    def lease_response(self, response, path: str):
+        """
+        Lease an output until a response sending it has been closed
+
+        Tracks the output first if it is not indexed yet. send_file responses
+        skip the response's close callbacks (they pass the file wrapper
+        straight to the server), so the release is hooked to closing the
+        response body instead.
+
+        Args:
+            response: Response returned by send_file
+            path: Output the response sends
+
+        Returns:
+            The response
+        """
+        if self._folder_of(path) is not None and os.path.abspath(path) not in self._files:
+            self.track(path)
+        self.lease(path)
+        response.response = ClosingIterator(response.response, lambda: self.release(path))
+        return response
+
+    def sweep(self) -> int:
+        """
+        Delete expired outputs, then least recently used ones while over max_bytes
+
+        Returns:
+            Number of files deleted
+        """
+        now = time.time()
+        doomed = []
+        with self._lock:
+            total = self.total_bytes
+            for path, (size, last_used) in list(self._files.items()):
+                if path in self._leases:
+                    continue
+                expired = now - last_used >= self.ttl_seconds
+                if not expired and total <= self.max_bytes:
+                    # Entries are in last-use order, so the rest are newer and within quota
+                    break
+                del self._files[path]
+                total -= size
+                doomed.append((path, size, expired))
+            self.total_bytes = total
+            self.sweeps += 1
+
+        for path, size, expired in doomed:
+            try:
+                os.remove(path)
+                logger.info(f"Removed {'expired' if expired else 'over-quota'} output: {path} ({size} bytes)")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove output {path}: {e}")
+                continue
+            with self._lock:
+                if expired:
+                    self.expired += 1
+                else:
+                    self.evicted += 1
+                self.freed_bytes += size
+        return len(doomed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Output sweep failed: {e}")
+            for store in self.stores:
+                try:
+                    store.purge_expired(scan=True, in_use=self.is_leased)
+                except Exception as e:
+                    logger.error(f"Purge of {store.store_dir} failed: {e}")
+
+    def start(self):
+        """Sweep every interval_seconds on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="output-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return disk usage of the outputs and eviction counters"""
+        with self._lock:
+            folders = {folder: {"files": 0, "bytes": 0} for folder in self.folders}
+            for path, (size, _) in self._files.items():
+                usage = folders[os.path.dirname(path)]
+                usage["files"] += 1
+                usage["bytes"] += size
+            oldest = next(iter(self._files.values()))[1] if self._files else None
+            stats = {
+                "files": len(self._files),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "leased": len(self._leases),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "freed_bytes": self.freed_bytes,
+                "sweeps": self.sweeps,
+                "oldest_age_seconds": time.time() - oldest if oldest is not None else None,
+                "folders": {os.path.basename(folder): usage for folder, usage in folders.items()}
+            }
+        if self.folders:
+            disk = shutil.disk_usage(self.folders[0])
+            stats["disk_total_bytes"] = disk.total
+            stats["disk_free_bytes"] = disk.free
+        return stats
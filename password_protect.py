@@ -1,8 +1,10 @@
 import os
 import logging
 import fitz  # PyMuPDF
+import io
 import uuid
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional
+from pdf_compressor import open_pdf, save_pdf
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG,
@@ -53,6 +55,71 @@ class PasswordProtector:
             name, ext = os.path.splitext(file_name)
             output_path = os.path.join(file_dir, f"{name}_protected{ext}")
         
+        try:
+            # Open the original PDF
+            doc = fitz.open(input_path)
+            original_size = os.path.getsize(input_path)
+            logger.info(f"Original PDF size: {original_size} bytes")
+            
+            stats = self.protect_document(doc, output_path, user_password, owner_password, permissions)
+            doc.close()
+            
+            stats["original_size"] = original_size
+            stats["original_filename"] = os.path.basename(input_path)
+            return output_path, stats
+            
+        except Exception as e:
+            logger.error(f"Error protecting PDF: {str(e)}")
+            raise
+    
+    def protect_pdf_data(self,
+                         source,
+                         output=None,
+                         user_password: str = None,
+                         owner_password: str = None,
+                         permissions: Dict[str, bool] = None) -> Tuple[Optional[bytes], Dict[str, Any]]:
+        """
+        Add password protection to a PDF held in memory (or at a path), without temporary files
+        
+        Args:
+            source: PDF as a path, bytes-like object (bytes, bytearray, memoryview, mmap) or binary file object
+            output: Seekable binary file object (or path) to write to; if None the PDF is returned as bytes
+            user_password: Password required to open the document (can be None)
+            owner_password: Password required for full access (defaults to user_password if None)
+            permissions: Dictionary of permission settings
+            
+        Returns:
+            tuple: (protected PDF bytes, or None when written to output, stats)
+        """
+        buffer = io.BytesIO() if output is None else None
+        try:
+            doc, _, original_size = open_pdf(source)
+            try:
+                stats = self.protect_document(doc, output if buffer is None else buffer, user_password, owner_password, permissions)
+            finally:
+                doc.close()
+        except Exception as e:
+            logger.error(f"Error protecting PDF: {str(e)}")
+            raise
+        
+        stats["original_size"] = original_size
+        return (buffer.getvalue() if buffer is not None else None), stats
+    
+    def encryption_options(self,
+                           user_password: str = None,
+                           owner_password: str = None,
+                           permissions: Dict[str, bool] = None) -> Dict[str, Any]:
+        """
+        Build the doc.save keyword arguments that apply AES-256 encryption
+        
+        Args:
+            user_password: Password required to open the document (can be None)
+            owner_password: Password required for full access (defaults to user_password if None)
+            permissions: Dictionary of permission settings
+            
+        Returns:
+            dict: encryption, user_pw, owner_pw and permissions for doc.save
+        """
         # Use provided permissions or defaults
         pdf_permissions = permissions or self.permissions
         
@@ -77,43 +144,45 @@ class PasswordProtector:
         if pdf_permissions.get('assemble', False):
             permission_bits |= fitz.PDF_PERM_ASSEMBLE
         
-        try:
-            # Open the original PDF
-            doc = fitz.open(input_path)
-            original_size = os.path.getsize(input_path)
-            logger.info(f"Original PDF size: {original_size} bytes")
-            
-            # Set document permissions and passwords
-            encryption_method = fitz.PDF_ENCRYPT_AES_256
-            
-            doc.save(
-                output_path,
-                encryption=encryption_method,
-                user_pw=user_password,
-                owner_pw=owner_password,
-                permissions=permission_bits
-            )
-            
-            doc.close()
-            
-            protected_size = os.path.getsize(output_path)
-            logger.info(f"Protected PDF size: {protected_size} bytes")
-            
-            # Return statistics
-            stats = {
-                "original_size": original_size,
-                "protected_size": protected_size,
-                "original_filename": os.path.basename(input_path),
-                "has_user_password": user_password is not None,
-                "has_owner_password": owner_password is not None,
-                "permissions": pdf_permissions
-            }
-            
-            return output_path, stats
+        return {
+            "encryption": fitz.PDF_ENCRYPT_AES_256,
+            "user_pw": user_password,
+            "owner_pw": owner_password,
+            "permissions": permission_bits
+        }
+    
+    def protect_document(self,
+                         doc,
+                         output,
+                         user_password: str = None,
+                         owner_password: str = None,
+                         permissions: Dict[str, bool] = None,
+                         save_options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Save an already open document with password protection
+        
+        Args:
+            doc: Open fitz.Document, e.g. one whose images PDFCompressor.compress_document re-encoded
+            output: Path, or seekable binary file object, for the protected output
+            user_password: Password required to open the document (can be None)
+            owner_password: Password required for full access (defaults to user_password if None)
+            permissions: Dictionary of permission settings
+            save_options: Extra doc.save options (e.g. PDFCompressor.save_options), applied in the same save
             
-        except Exception as e:
-            logger.error(f"Error protecting PDF: {str(e)}")
-            raise
+        Returns:
+            dict: stats (protected_size, password flags and permissions)
+        """
+        options = self.encryption_options(user_password, owner_password, permissions)
+        protected_size = save_pdf(doc, output, **(save_options or {}), **options)
+        logger.info(f"Protected PDF size: {protected_size} bytes")
+        
+        # Return statistics
+        return {
+            "protected_size": protected_size,
+            "has_user_password": options["user_pw"] is not None,
+            "has_owner_password": options["owner_pw"] is not None,
+            "permissions": permissions or self.permissions
+        }
 
     def remove_pdf_password(self, input_path: str, output_path: str = None, password: str = None) -> Tuple[str, Dict[str, Any]]:
         """
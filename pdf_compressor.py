@@ -1,34 +1,680 @@
 import fitz  # PyMuPDF
 import os
+import io
+import re
+import math
+import mmap
+import zlib
+import heapq
 import argparse
-from typing import Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Tuple, List, Optional, Callable
+
+
+# Document opened once per worker process by _init_worker
+_worker_doc = None
+
+
+def _init_worker(input_path: str):
+    """Open the input PDF in a pool worker process"""
+    global _worker_doc
+    _worker_doc = fitz.open(input_path)
+
+
+def _apply_images(doc, func: Callable, items: List[tuple],
+                  progress_callback: Callable[[int], None] = None) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Call func(doc, *item) for each item, catching failures per item
+    
+    Args:
+        doc: Open fitz document to read the images from
+        func: Module-level image function (e.g. _recompress_image), so pool workers can run it
+        items: Arguments after doc for each call, starting with the image xref
+        progress_callback: Called with the number of items done after each item
+        
+    Returns:
+        List of (result, error message or None) in the same order as items
+    """
+    results = []
+    for item in items:
+        try:
+            results.append((func(doc, *item), None))
+        except Exception as e:
+            results.append((None, str(e)))
+        if progress_callback:
+            progress_callback(len(results))
+    return results
+
+
+def _apply_worker(func: Callable, items: List[tuple]) -> List[Tuple[Any, Optional[str]]]:
+    """Pool entry point: _apply_images on a chunk of items with the worker's document"""
+    return _apply_images(_worker_doc, func, items)
+
+
+def _prepare_pixmap(doc, xref: int) -> Optional[fitz.Pixmap]:
+    """
+    Decode an image into an RGB pixmap ready for JPEG encoding
+    
+    Returns:
+        The pixmap, or None if the image doesn't need compression
+    """
+    # Get the image pixmap
+    pix = fitz.Pixmap(doc, xref)
+    
+    # Only process images that need compression
+    if pix.n - pix.alpha < 3:  # Not RGB or CMYK
+        return None
+    
+    # JPEG doesn't support alpha; transparency in PDFs normally lives
+    # in a separate /SMask image, which is kept when the image is replaced
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    
+    # Convert CMYK to RGB if needed
+    if pix.colorspace.n > 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+
+def _downsample_factor(width: int, height: int, dpi: int) -> int:
+    """Integer factor a level with this dpi shrinks an image by (1 if it is small enough)"""
+    if width > dpi * 10 or height > dpi * 10:
+        return max(1, min(width, height) // (dpi * 5))
+    return 1
+
+
+def _recompress_image(doc, xref: int, settings: Dict[str, int]) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Downsample and JPEG-encode a single image
+    
+    Returns:
+        Tuple of (jpeg_data, width, height), or None if the image doesn't need compression
+    """
+    pix = _prepare_pixmap(doc, xref)
+    if pix is None:
+        return None
+    
+    # Downsample the image if it's large
+    factor = _downsample_factor(pix.w, pix.h, settings["dpi"])
+    if factor > 1:
+        pix = fitz.Pixmap(pix, pix.w // factor, pix.h // factor, None)
+    
+    # Set DPI for the image
+    pix.set_dpi(settings["dpi"], settings["dpi"])
+    return pix.tobytes("jpeg", settings["quality"]), pix.w, pix.h
+
+
+# Candidate settings per image in target-size mode: JPEG qualities, at the
+# 'low' level's resolution and at 1/2 and 1/4 of it
+TARGET_QUALITIES = (85, 65, 45, 25)
+TARGET_SCALE_STEPS = (1, 2, 4)
+# Quality encoded at every scale; the other qualities are only encoded at the smallest scale
+TARGET_ANCHOR_QUALITY = 65
+
+
+def _sample_image(doc, xref: int) -> List[Tuple[int, int, int]]:
+    """
+    Estimate an image's encoded size for each target-size candidate
+    
+    The quality curve is measured at the smallest scale, where encodes are
+    cheap, and carried over to the larger scales through one encode at
+    TARGET_ANCHOR_QUALITY each, so sampling costs about one and a half
+    full-size encodes.
+    
+    Returns:
+        List of (downsample factor, quality, estimated encoded size), empty if
+        the image can't or needn't be re-encoded
+    """
+    pix = _prepare_pixmap(doc, xref)
+    if pix is None:
+        return []
+    
+    base = _downsample_factor(pix.w, pix.h, 150)
+    factors = [base * step for step in TARGET_SCALE_STEPS
+               if pix.w // (base * step) >= 16 and pix.h // (base * step) >= 16] or [base]
+    scaled = {factor: pix if factor == 1 else fitz.Pixmap(pix, pix.w // factor, pix.h // factor, None)
+              for factor in factors}
+    
+    # Size at each quality relative to the anchor, measured on the smallest version
+    smallest = scaled[factors[-1]]
+    curve = {quality: len(smallest.tobytes("jpeg", quality)) for quality in TARGET_QUALITIES}
+    anchor = curve[TARGET_ANCHOR_QUALITY]
+    
+    candidates = []
+    for factor in factors:
+        anchor_size = anchor if factor == factors[-1] else len(scaled[factor].tobytes("jpeg", TARGET_ANCHOR_QUALITY))
+        for quality in TARGET_QUALITIES:
+            candidates.append((factor, quality, round(anchor_size * curve[quality] / anchor)))
+    return candidates
+
+
+def _encode_image(doc, xref: int, factor: int, quality: int) -> Tuple[bytes, int, int]:
+    """JPEG-encode an image at a downsample factor and quality chosen in target-size mode"""
+    pix = _prepare_pixmap(doc, xref)
+    if factor > 1:
+        pix = fitz.Pixmap(pix, pix.w // factor, pix.h // factor, None)
+    return pix.tobytes("jpeg", quality), pix.w, pix.h
+
+
+def _stream_length(doc, xref: int) -> int:
+    """Length of an xref's stream as stored in the file (still encoded)"""
+    length = doc.xref_get_key(xref, "Length")
+    if length[0] == "int":
+        return int(length[1])
+    return len(doc.xref_stream_raw(xref))
+
+
+def _saved_stream_length(doc, xref: int) -> int:
+    """Approximate length of an xref's stream once saved with deflate (unencoded streams get deflated)"""
+    if doc.xref_get_key(xref, "Filter")[0] != "null":
+        return _stream_length(doc, xref)
+    return len(zlib.compress(doc.xref_stream_raw(xref)))
+
+
+# Stored images up to this size are left as they are: a JPEG's headers alone take a few hundred bytes
+MIN_RECOMPRESS_BYTES = 1024
+
+# Colour components per colour space name
+_COLORSPACE_COMPONENTS = {"/DeviceGray": 1, "/CalGray": 1, "/DeviceRGB": 3, "/CalRGB": 3, "/Lab": 3, "/DeviceCMYK": 4}
+
+
+def _color_components(doc, xref: int) -> Optional[int]:
+    """Colour components of an image according to its dictionary, or None if that takes decoding it"""
+    if doc.xref_get_key(xref, "ImageMask") == ("bool", "true"):
+        return 1
+    kind, value = doc.xref_get_key(xref, "ColorSpace")
+    if kind == "name":
+        return _COLORSPACE_COMPONENTS.get(value)
+    if kind == "array":
+        icc = re.fullmatch(r"\[\s*/ICCBased\s+(\d+)\s+0\s+R\s*\]", value)
+        if icc:
+            components = doc.xref_get_key(int(icc.group(1)), "N")
+            if components[0] == "int":
+                return int(components[1])
+    return None
+
+
+def _has_mask(doc, xref: int) -> bool:
+    """Whether an image has a /Mask (colour key or stencil), which a JPEG replacement would lose"""
+    return doc.xref_get_key(xref, "Mask")[0] != "null"
+
+
+def _analyze_image(doc, xref: int, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read an image's filter, dimensions and stored size from its dictionary, without decoding it
+    
+    Args:
+        doc: Open fitz document
+        xref: Image xref
+        settings: Entry of PDFCompressor.compression_levels
+    
+    Returns:
+        Dict with width, height, stored_size, bits_per_pixel and skip: why
+        the image is left as is ('masked', 'not-color', 'tiny' or
+        'already-optimal'), or None. 'already-optimal' (a JPEG at no more
+        bits per pixel than the level's quality produces, which the level
+        wouldn't downsample) is still subject to the image's effective DPI.
+    """
+    width = doc.xref_get_key(xref, "Width")
+    height = doc.xref_get_key(xref, "Height")
+    width = int(width[1]) if width[0] == "int" else 0
+    height = int(height[1]) if height[0] == "int" else 0
+    stored_size = _stream_length(doc, xref)
+    bits_per_pixel = stored_size * 8 / (width * height) if width and height else None
+    
+    components = _color_components(doc, xref)
+    kind, value = doc.xref_get_key(xref, "Filter")
+    is_jpeg = value in ("/DCTDecode", "[/DCTDecode]") and kind in ("name", "array")
+    if _has_mask(doc, xref):
+        # A colour key can't survive lossy encoding, and _replace_image only keeps /SMask
+        skip = "masked"
+    elif components is not None and components < 3:
+        skip = "not-color"
+    elif stored_size <= MIN_RECOMPRESS_BYTES:
+        skip = "tiny"
+    elif (is_jpeg and bits_per_pixel is not None and bits_per_pixel <= settings["jpeg_bpp"]
+          and _downsample_factor(width, height, settings["dpi"]) == 1):
+        skip = "already-optimal"
+    else:
+        skip = None
+    
+    return {
+        "width": width,
+        "height": height,
+        "stored_size": stored_size,
+        "bits_per_pixel": bits_per_pixel,
+        "skip": skip
+    }
+
+
+def _placement_dpis(page) -> Dict[Tuple[int, int], float]:
+    """
+    Highest effective DPI images of each pixel size are displayed at on a page
+    
+    Placements only name their image xref when every image is decoded to hash
+    it, so they are matched to the page's images by pixel size instead. Sizes
+    shared by several images of the page are left out.
+    """
+    xrefs_by_size = {}
+    for item in page.get_images(full=True):
+        xrefs_by_size.setdefault((item[2], item[3]), set()).add(item[0])
+    
+    dpis = {}
+    for info in page.get_image_info():
+        size = (info["width"], info["height"])
+        if len(xrefs_by_size.get(size, ())) != 1:
+            continue
+        a, b, c, d = info["transform"][:4]
+        shown_width, shown_height = math.hypot(a, b), math.hypot(c, d)
+        if not shown_width or not shown_height:
+            continue
+        dpi = max(size[0] * 72 / shown_width, size[1] * 72 / shown_height)
+        dpis[size] = max(dpi, dpis.get(size, 0))
+    return dpis
+
+
+def _replace_image(doc, xref: int, data: bytes, width: int, height: int):
+    """Replace an image xref with JPEG data, keeping its soft mask"""
+    smask = doc.xref_get_key(xref, "SMask")
+    obj = f"<</Type/XObject/Subtype/Image/Width {width}/Height {height}/ColorSpace/DeviceRGB/BitsPerComponent 8"
+    if smask[0] == "xref":
+        obj += f"/SMask {smask[1]}"
+    doc.update_object(xref, obj + ">>")
+    # update_stream drops /Filter when storing raw data, so set it afterwards
+    doc.update_stream(xref, data, compress=0)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+
+
+def open_pdf(source) -> Tuple[Any, Optional[str], int]:
+    """
+    Open a PDF from a path or from memory
+    
+    bytes are opened without a copy; bytearray, memoryview, mmap and other
+    buffers are copied into bytes once, since PyMuPDF only keeps bytes.
+    Large files on disk are best passed by path: PyMuPDF then reads them as
+    needed instead of holding the whole file in memory.
+    
+    Args:
+        source: Path, bytes-like object (bytes, bytearray, memoryview, mmap) or binary file object
+            (read from its current position)
+        
+    Returns:
+        Tuple of (document, path or None if opened from memory, size in bytes)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        return fitz.open(path), path, os.path.getsize(path)
+    
+    if isinstance(source, bytes):
+        data = source
+    elif isinstance(source, io.BytesIO):
+        data = source.getvalue()
+    elif isinstance(source, (bytearray, memoryview, mmap.mmap)):
+        data = bytes(memoryview(source))
+    else:
+        data = source.read()
+    return fitz.open(stream=data, filetype="pdf"), None, len(data)
+
+
+def save_pdf(doc, output, **options) -> int:
+    """
+    Save a document to a path or a seekable binary file object (e.g. io.BytesIO)
+    
+    Returns:
+        Number of bytes written
+    """
+    if isinstance(output, (str, os.PathLike)):
+        doc.save(os.fspath(output), **options)
+        return os.path.getsize(output)
+    
+    start = output.tell()
+    doc.save(output, **options)
+    return output.tell() - start
 
 
 class PDFCompressor:
     """PDF compression utility using PyMuPDF (fitz)"""
     
-    def __init__(self, compression_level: str = "medium"):
+    # Bump whenever the output for a given input and level changes
+    version = f"3-pymupdf{fitz.VersionBind}"
+    
+    # Options of the final doc.save; callers saving a document themselves
+    # (e.g. together with encryption) should pass these as well
+    save_options = {
+        "garbage": 4,  # Maximum garbage collection
+        "clean": True,  # Clean unused entries
+        "deflate": True,  # Compress streams
+        "linear": True  # Optimize for web
+    }
+    
+    def __init__(self, compression_level: str = "medium", max_workers: int = 1):
         """
         Initialize the compressor with the desired compression level
         
         Args:
             compression_level: low, medium, high, or extreme
+            max_workers: Number of processes used to re-encode images (1 = serial)
         """
+        # jpeg_bpp: bits per pixel of a typical photo at the level's quality;
+        # JPEGs already stored at or below it are not re-encoded
         self.compression_levels = {
-            "low": {"dpi": 150, "quality": 85},
-            "medium": {"dpi": 120, "quality": 75},
-            "high": {"dpi": 96, "quality": 65},
-            "extreme": {"dpi": 72, "quality": 50}
+            "low": {"dpi": 150, "quality": 85, "jpeg_bpp": 1.6},
+            "medium": {"dpi": 120, "quality": 75, "jpeg_bpp": 1.2},
+            "high": {"dpi": 96, "quality": 65, "jpeg_bpp": 1.0},
+            "extreme": {"dpi": 72, "quality": 50, "jpeg_bpp": 0.8}
         }
         self.compression_level = compression_level
+        self.max_workers = max(1, max_workers or 1)
+        
+    def _collect_image_xrefs(self, doc) -> Tuple[List[int], Dict[int, Tuple[int, int]], int]:
+        """
+        Collect the unique image xrefs of a document
+        
+        Logos and watermarks are usually a single xref referenced from every
+        page, so they only need to be recompressed once.
+        
+        Args:
+            doc: Open fitz document
+            
+        Returns:
+            Tuple of (xrefs in first-use order, {xref: (page_num, img_index)} of first use,
+            number of duplicate references skipped)
+        """
+        xrefs = []
+        locations = {}
+        duplicate_refs = 0
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            
+            # Get the images on the page
+            image_list = page.get_images(full=True)
+            
+            for img_index, img in enumerate(image_list):
+                xref = img[0]
+                if xref in locations:
+                    duplicate_refs += 1
+                    continue
+                locations[xref] = (page_num, img_index)
+                xrefs.append(xref)
+        
+        return xrefs, locations, duplicate_refs
+        
+    def compress_document(self, doc, source_path: str = None,
+                          progress_callback: Callable[[float], None] = None) -> Dict[str, Any]:
+        """
+        Re-encode the images of an open document in place, without saving it
+        
+        Lets callers apply other changes (e.g. encryption) in the same save;
+        save with save_options to get the same result as compress_pdf.
+        
+        Args:
+            doc: Open fitz.Document
+            source_path: Path the document was opened from; the process pool
+                (max_workers > 1) is only used when it is given
+            progress_callback: Optional callable receiving the fraction of images done (0-1)
+            
+        Returns:
+            Dict with image_count, duplicate_image_refs, recompressed_images,
+            skipped_images (left as is without re-encoding) and
+            kept_original_images (re-encoded larger, so kept)
+        """
+        # Get settings from compression level
+        settings = self.compression_levels[self.compression_level]
+        
+        # Collect each unique image once, however many pages reference it
+        xrefs, locations, duplicate_refs = self._collect_image_xrefs(doc)
+        
+        # Leave out images re-encoding can't shrink, judged from their dictionaries
+        analysis = self._analyze_images(doc, xrefs, locations, settings)
+        to_encode = [xref for xref in xrefs if analysis[xref]["skip"] is None]
+        skipped = len(xrefs) - len(to_encode)
+        
+        images_done = None
+        if progress_callback and to_encode:
+            images_done = lambda done: progress_callback(done / len(to_encode))
         
-    def compress_pdf(self, input_path: str, output_path: str = None) -> Tuple[str, Dict[str, Any]]:
+        # Re-encode the images, across a process pool if configured
+        results = self._map_images(source_path, doc, _recompress_image,
+                                   [(xref, settings) for xref in to_encode], locations, images_done)
+        
+        # Replace the old images with the compressed ones in one pass
+        # (images that failed are left as they are)
+        recompressed = kept_original = 0
+        for xref, encoded in results.items():
+            if encoded is None:
+                skipped += 1
+            elif len(encoded[0]) >= analysis[xref]["stored_size"]:
+                # Re-encoding made it larger (e.g. generation loss on a JPEG)
+                kept_original += 1
+            else:
+                _replace_image(doc, xref, *encoded)
+                recompressed += 1
+        
+        return {
+            "image_count": len(xrefs),
+            "duplicate_image_refs": duplicate_refs,
+            "recompressed_images": recompressed,
+            "skipped_images": skipped,
+            "kept_original_images": kept_original
+        }
+    
+    def _analyze_images(self, doc, xrefs: List[int], locations: Dict[int, Tuple[int, int]],
+                        settings: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """
+        Decide which images to re-encode without decoding any (see _analyze_image)
+        
+        JPEGs that look already optimal are still re-encoded when displayed
+        above the level's dpi on the page they are first used on. Only their
+        pages are scanned for placements, as that means running the page's content.
+        
+        Returns:
+            {xref: analysis} with an effective_dpi entry (None if not known) for such JPEGs
+        """
+        analysis = {xref: _analyze_image(doc, xref, settings) for xref in xrefs}
+        
+        page_dpis = {}
+        for xref in xrefs:
+            info = analysis[xref]
+            if info["skip"] != "already-optimal":
+                continue
+            page_num = locations[xref][0]
+            if page_num not in page_dpis:
+                page_dpis[page_num] = _placement_dpis(doc[page_num])
+            info["effective_dpi"] = page_dpis[page_num].get((info["width"], info["height"]))
+            if info["effective_dpi"] is not None and info["effective_dpi"] > settings["dpi"]:
+                info["skip"] = None
+        return analysis
+    
+    def _map_images(self, source_path: Optional[str], doc, func: Callable, items: List[tuple],
+                    locations: Dict[int, Tuple[int, int]],
+                    progress_callback: Callable[[int], None] = None) -> Dict[int, Any]:
+        """
+        Call func(doc, *item) for each item, across a process pool when possible
+        
+        The pool is used when max_workers > 1 and the document has a
+        source_path: each worker opens its own copy of the input PDF and
+        processes contiguous chunks of items, so only the results cross
+        process boundaries. Failures are reported and left out.
+        
+        Args:
+            source_path: Path the document was opened from, or None
+            doc: Open fitz document
+            func: Module-level image function taking (doc, xref, ...)
+            items: Arguments after doc for each call, starting with the image xref
+            locations: {xref: (page_num, img_index)} from _collect_image_xrefs, for error messages
+            progress_callback: Called with the number of items done
+            
+        Returns:
+            {xref: result} of the items that succeeded
+        """
+        if self.max_workers > 1 and len(items) > 1 and source_path is not None:
+            workers = min(self.max_workers, len(items))
+            chunk_size = -(-len(items) // (workers * 4))  # ~4 chunks per worker for balance
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            results = []
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_worker,
+                                     initargs=(source_path,)) as executor:
+                for chunk_results in executor.map(_apply_worker, [func] * len(chunks), chunks):
+                    results.extend(chunk_results)
+                    if progress_callback:
+                        progress_callback(len(results))
+        else:
+            results = _apply_images(doc, func, items, progress_callback)
+        
+        succeeded = {}
+        for item, (result, error) in zip(items, results):
+            xref = item[0]
+            if error is not None:
+                page_num, img_index = locations[xref]
+                print(f"Error processing image {img_index} on page {page_num}: {error}")
+                continue
+            succeeded[xref] = result
+        return succeeded
+    
+    def compress_document_to_size(self, doc, target_size: int, original_size: int, source_path: str = None,
+                                  progress_callback: Callable[[float], None] = None) -> Dict[str, Any]:
+        """
+        Re-encode the images of an open document so the saved file fits in target_size
+        
+        Each image is decoded once to estimate its JPEG size at every
+        TARGET_QUALITIES x TARGET_SCALE_STEPS candidate (see _sample_image). Starting from the best
+        candidate (or the original stream, when that is smaller), the image
+        whose next smaller candidate saves the most bytes steps down until the
+        estimate fits. The chosen images are then encoded once more and
+        replaced. The rest of the file is estimated as original_size with
+        its streams counted at their size after the save's deflate, so the
+        document is only saved once, by the caller (with save_options).
+        
+        Args:
+            doc: Open fitz.Document
+            target_size: Size in bytes the saved PDF should not exceed
+            original_size: Size of the input file in bytes
+            source_path: Path the document was opened from; the process pool
+                (max_workers > 1) is only used when it is given
+            progress_callback: Optional callable receiving the fraction of work done (0-1)
+            
+        Returns:
+            Dict with image_count, duplicate_image_refs, estimated_size,
+            recompressed_images, kept_original_images and sampled_encodes
+        """
+        xrefs, locations, duplicate_refs = self._collect_image_xrefs(doc)
+        # Sizes as saved: unencoded streams (content, fonts, soft masks and the
+        # images themselves in an uncompressed input) are deflated by the save
+        stored = {xref: _saved_stream_length(doc, xref) for xref in xrefs}
+        streams = [xref for xref in range(1, doc.xref_length()) if doc.xref_is_stream(xref)]
+        other_bytes = max(0, original_size - sum(_stream_length(doc, xref) for xref in streams)
+                          + sum(_saved_stream_length(doc, xref) for xref in streams if xref not in stored))
+        
+        # Sample every image's size curve (about two thirds of the work);
+        # masked images keep their stored stream (see _analyze_image)
+        to_sample = [(xref,) for xref in xrefs if not _has_mask(doc, xref)]
+        sampled = self._map_images(
+            source_path, doc, _sample_image, to_sample, locations,
+            (lambda done: progress_callback(0.6 * done / len(to_sample)))
+            if progress_callback and to_sample else None)
+        
+        # Per image, the options from largest to smallest: keeping the stored
+        # stream (None), then the candidates that are smaller than it
+        ladders = {}
+        sampled_encodes = 0
+        for xref in xrefs:
+            candidates = sampled.get(xref) or []
+            if candidates:
+                sampled_encodes += len(TARGET_QUALITIES) + len({factor for factor, _, _ in candidates}) - 1
+            ladder = [(None, stored[xref])]
+            for factor, quality, size in sorted(candidates, key=lambda candidate: -candidate[2]):
+                if size < ladder[-1][1]:
+                    ladder.append(((factor, quality), size))
+            ladders[xref] = ladder
+        
+        chosen = {xref: 0 for xref in xrefs}
+        encoded = {}  # xref -> (ladder index, (jpeg_data, width, height))
+        estimate = lambda: other_bytes + sum(ladders[xref][index][1] for xref, index in chosen.items())
+        estimated_size = estimate()
+        
+        # The sampled sizes are estimates, so after encoding the chosen settings the
+        # real sizes replace them and images step down further if still needed
+        for encode_round in range(3):
+            # Step down the image whose next option saves the most until the estimate fits
+            # (heap of the size change of each image's next step, which is negative)
+            steps = []
+            for xref, index in chosen.items():
+                ladder = ladders[xref]
+                if index + 1 < len(ladder) and ladder[index + 1][1] < ladder[index][1]:
+                    steps.append((ladder[index + 1][1] - ladder[index][1], xref))
+            heapq.heapify(steps)
+            while estimated_size > target_size and steps:
+                change, xref = heapq.heappop(steps)
+                estimated_size += change
+                chosen[xref] += 1
+                index, ladder = chosen[xref], ladders[xref]
+                if index + 1 < len(ladder) and ladder[index + 1][1] < ladder[index][1]:
+                    heapq.heappush(steps, (ladder[index + 1][1] - ladder[index][1], xref))
+            
+            # Encode the settings chosen since the last round
+            to_encode = [(xref, *ladders[xref][index][0]) for xref, index in chosen.items()
+                         if index > 0 and encoded.get(xref, (0,))[0] != index]
+            if not to_encode:
+                break
+            results = self._map_images(
+                source_path, doc, _encode_image, to_encode, locations,
+                (lambda done: progress_callback(0.6 + 0.3 * done / len(to_encode)))
+                if progress_callback and encode_round == 0 else None)
+            for xref, _, _ in to_encode:
+                result = results.get(xref)
+                if result is None:
+                    # Keep the stored image
+                    chosen[xref] = 0
+                    ladders[xref] = ladders[xref][:1]
+                    continue
+                # Scale this image's estimates by how far off the encoded one was
+                index, ladder = chosen[xref], ladders[xref]
+                correction = len(result[0]) / ladder[index][1]
+                ladders[xref] = ladder[:1] + [(option, round(size * correction)) for option, size in ladder[1:]]
+                ladders[xref][index] = (ladder[index][0], len(result[0]))
+                encoded[xref] = (index, result)
+            
+            estimated_size = estimate()
+            if estimated_size <= target_size:
+                break
+        
+        # Replace the images in one pass, keeping the stored stream of any image
+        # whose encode didn't come out smaller (e.g. generation loss on a JPEG)
+        recompressed = kept_original = 0
+        for xref, index in chosen.items():
+            if index == 0 or xref not in encoded:
+                continue
+            if len(encoded[xref][1][0]) >= stored[xref]:
+                chosen[xref] = 0
+                kept_original += 1
+                continue
+            _replace_image(doc, xref, *encoded[xref][1])
+            recompressed += 1
+        if kept_original:
+            estimated_size = estimate()
+        
+        return {
+            "image_count": len(xrefs),
+            "duplicate_image_refs": duplicate_refs,
+            "estimated_size": estimated_size,
+            "recompressed_images": recompressed,
+            "kept_original_images": kept_original,
+            "sampled_encodes": sampled_encodes
+        }
+    
+    def compress_pdf(self, input_path: str, output_path: str = None,
+                     progress_callback: Callable[[float], None] = None,
+                     target_size: int = None) -> Tuple[str, Dict[str, Any]]:
         """
         Compress a PDF file
         
         Args:
             input_path: Path to the input PDF file
             output_path: Path to save the compressed PDF file. If None, will use input_path with _compressed suffix
+            progress_callback: Optional callable receiving the fraction of work done (0-1)
+            target_size: Size in bytes to fit the PDF in, choosing image settings per image
+                instead of the compression level's (see compress_document_to_size)
             
         Returns:
             Tuple of (output_path, stats)
@@ -36,81 +682,59 @@ class PDFCompressor:
         if output_path is None:
             filename, ext = os.path.splitext(input_path)
             output_path = f"{filename}_compressed{ext}"
-            
-        # Get original file size
-        original_size = os.path.getsize(input_path)
         
-        # Get settings from compression level
-        settings = self.compression_levels[self.compression_level]
-            
-        # Open the PDF
-        doc = fitz.open(input_path)
+        stats = self._compress(input_path, output_path, progress_callback, target_size)
+        return output_path, stats
+    
+    def compress_pdf_data(self, source, output=None,
+                          progress_callback: Callable[[float], None] = None,
+                          target_size: int = None) -> Tuple[Optional[bytes], Dict[str, Any]]:
+        """
+        Compress a PDF held in memory (or at a path), without temporary files
         
-        # Process each page
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Get the images on the page
-            image_list = page.get_images(full=True)
+        Images are re-encoded in this process, whatever max_workers is, since
+        the pool workers open the input by path.
+        
+        Args:
+            source: PDF as a path, bytes-like object (bytes, bytearray, memoryview, mmap) or binary file object
+            output: Seekable binary file object (or path) to write to; if None the PDF is returned as bytes
+            progress_callback: Optional callable receiving the fraction of work done (0-1)
+            target_size: Size in bytes to fit the PDF in (see compress_pdf)
             
-            # Process each image
-            for img_index, img in enumerate(image_list):
-                # Get the image data
-                xref = img[0]
-                
-                try:
-                    # Get the image pixmap
-                    pix = fitz.Pixmap(doc, xref)
-                    
-                    # Only process images that need compression
-                    if pix.n >= 3:  # RGB or CMYK
-                        # Downsample the image if it's large
-                        if pix.w > settings["dpi"] * 10 or pix.h > settings["dpi"] * 10:
-                            factor = max(1, min(pix.w, pix.h) // (settings["dpi"] * 5))
-                            pix = fitz.Pixmap(pix, factor)
-
-                        # Handle alpha channel (transparency)
-                        # JPEG doesn't support alpha, so we need to remove it or use PNG
-                        has_alpha = pix.alpha
-                        if has_alpha:
-                            # For images with alpha, use PNG with reduced colors
-                            if pix.n == 4:  # RGBA
-                                # Remove alpha for JPEG compression
-                                bg = fitz.Pixmap(fitz.csRGB, pix.w, pix.h, 0)
-                                bg.set_rect(bg.irect, (255, 255, 255))  # white background
-                                pix = fitz.Pixmap(bg, pix)  # overlay pixmap on background
-                            
-                            # Set DPI for the image
-                            pix.set_dpi(settings["dpi"], settings["dpi"])
-                            imgdata = pix.tobytes("png")  # Use PNG for alpha images
-                        else:
-                            # Convert CMYK to RGB if needed
-                            if pix.n > 4:  # CMYK
-                                pix = fitz.Pixmap(fitz.csRGB, pix)
-                            
-                            # Set DPI for the image
-                            pix.set_dpi(settings["dpi"], settings["dpi"])
-                            imgdata = pix.tobytes("jpeg", settings["quality"])
-                        
-                        # Replace the old image with the compressed one
-                        doc.delete_object(xref)
-                        doc.update_object(xref, imgdata)
-                    
-                    pix = None  # Free the memory
-                except Exception as e:
-                    print(f"Error processing image {img_index} on page {page_num}: {e}")
-                    # Continue with the next image
+        Returns:
+            Tuple of (compressed PDF bytes, or None when written to output, stats)
+        """
+        if output is None:
+            buffer = io.BytesIO()
+            stats = self._compress(source, buffer, progress_callback, target_size)
+            return buffer.getvalue(), stats
+        
+        return None, self._compress(source, output, progress_callback, target_size)
+    
+    def _compress(self, source, output, progress_callback: Callable[[float], None] = None,
+                  target_size: int = None) -> Dict[str, Any]:
+        """Open, recompress and save a PDF, returning its stats"""
+        # Open the PDF and re-encode its images
+        # (image encoding is most of the work; the final save accounts for the rest)
+        doc, source_path, original_size = open_pdf(source)
+        try:
+            if target_size:
+                image_stats = self.compress_document_to_size(
+                    doc, target_size, original_size, source_path=source_path,
+                    progress_callback=progress_callback)
+            else:
+                image_stats = self.compress_document(
+                    doc, source_path=source_path,
+                    progress_callback=(lambda done: progress_callback(0.9 * done)) if progress_callback else None)
             
-        # Save the compressed PDF
-        doc.save(output_path, 
-                 garbage=4,  # Maximum garbage collection
-                 clean=True,  # Clean unused entries
-                 deflate=True,  # Compress streams
-                 linear=True)  # Optimize for web
-        doc.close()
+            # Save the compressed PDF
+            compressed_size = save_pdf(doc, output, **self.save_options)
+        finally:
+            doc.close()
+        if progress_callback:
+            progress_callback(1.0)
         
         # Calculate compression stats
-        compressed_size = os.path.getsize(output_path)
         saved_bytes = original_size - compressed_size
         saved_percent = (saved_bytes / original_size) * 100 if original_size > 0 else 0
         
@@ -119,10 +743,13 @@ class PDFCompressor:
             "compressed_size": compressed_size,
             "saved_bytes": saved_bytes,
             "saved_percent": saved_percent,
-            "compression_level": self.compression_level
+            "compression_level": self.compression_level,
+            **image_stats
         }
-        
-        return output_path, stats
+        if target_size:
+            stats["target_size"] = target_size
+            stats["met_target"] = compressed_size <= target_size
+        return stats
     
     
 def format_size(size_bytes):
@@ -139,10 +766,12 @@ if __name__ == "__main__":
     parser.add_argument("-o", "--output", help="Output PDF file path")
     parser.add_argument("-l", "--level", choices=["low", "medium", "high", "extreme"],
                         default="medium", help="Compression level")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Number of processes used to re-encode images")
     
     args = parser.parse_args()
     
-    compressor = PDFCompressor(compression_level=args.level)
+    compressor = PDFCompressor(compression_level=args.level, max_workers=args.workers)
     output_path, stats = compressor.compress_pdf(args.input, args.output)
     
     print(f"PDF compressed successfully!")
@@ -0,0 +1,293 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Callable, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Format step timings in seconds for a Server-Timing header (milliseconds)"""
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+class Stage:
+    """A tool that can run on one file, alone or chained with other stages"""
+
+    def __init__(self, name: str, factory: Callable, run: Callable, output_dir: str,
+                 parse_options: Callable = None, extensions: List[str] = None, output_ext: str = None,
+                 pool_key: Callable = None, errors: Dict[str, Tuple[str, int]] = None):
+        """
+        Define a stage
+
+        Args:
+            name: Name the stage is registered and requested under
+            factory: Callable(options) building the processor
+            run: Callable(processor, input_path, output_path, options) returning (output_path, stats)
+            output_dir: Directory the output is written to when this is the last stage
+            parse_options: Callable(form) returning the options dict, raising ValueError for invalid input
+            extensions: Lower-case input extensions accepted (None accepts any file)
+            output_ext: Extension of the output (None keeps the input's)
+            pool_key: Callable(options) returning what makes processors interchangeable;
+                processors built for the same key are reused across requests
+            errors: Error message fragment -> (message, HTTP status) for expected failures
+        """
+        self.name = name
+        self.factory = factory
+        self.run = run
+        self.output_dir = output_dir
+        self.parse_options = parse_options or (lambda form: {})
+        self.extensions = extensions
+        self.output_ext = output_ext
+        self.pool_key = pool_key or (lambda options: None)
+        self.errors = errors or {}
+
+    def accepts(self, path: str) -> bool:
+        """Whether the stage can process the file at path"""
+        return self.extensions is None or os.path.splitext(path)[1].lower() in self.extensions
+
+
+class ProcessorPool:
+    """Reuses processor instances across requests
+
+    A processor is handed to one request at a time and returned to the pool
+    afterwards, so processors only need to be reusable, not thread-safe.
+    """
+
+    def __init__(self, max_idle: int = 4):
+        """
+        Initialize the pool
+
+        Args:
+            max_idle: Most idle processors kept per stage and pool key
+        """
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, stage: Stage, options: Dict[str, Any]):
+        """Borrow a processor for a stage, building one if none is idle"""
+        key = (stage.name, stage.pool_key(options))
+        with self._lock:
+            idle = self._idle.get(key)
+            processor = idle.pop() if idle else None
+            if processor is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if processor is None:
+            processor = stage.factory(options)
+
+        yield processor
+
+        # Only processors that finished cleanly go back to the pool
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(processor)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return how many processors were built and reused"""
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": sum(len(idle) for idle in self._idle.values())
+            }
+
+
+class PipelineResult:
+    """Output of a pipeline run"""
+
+    def __init__(self, output_path: str, stage_stats: Dict[str, Dict[str, Any]], timings: Dict[str, float]):
+        self.output_path = output_path
+        # Stats of each stage, in run order
+        self.stage_stats = stage_stats
+        # Seconds spent in each stage, in run order
+        self.timings = timings
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Stats of the last stage"""
+        return list(self.stage_stats.values())[-1]
+
+    def server_timing(self) -> str:
+        """Timings formatted for a Server-Timing header"""
+        return format_server_timing(self.timings)
+
+
+class Pipeline:
+    """Runs registered stages on uploaded files
+
+    Takes care of what every tool route needs: storing the upload at a work
+    path, borrowing a pooled processor, timing each stage, handing each
+    stage's output to the next one and removing intermediate files.
+    """
+
+    def __init__(self, work_dir: str, pool: ProcessorPool = None):
+        """
+        Initialize the pipeline
+
+        Args:
+            work_dir: Directory for uploads and intermediate outputs
+            pool: Processor pool, a new one if not provided
+        """
+        self.work_dir = work_dir
+        self.pool = pool or ProcessorPool()
+        self._stages = {}
+        self._fusions = []
+
+    def register(self, stage: Stage):
+        """Make a stage available by name"""
+        self._stages[stage.name] = stage
+
+    def get(self, name: str) -> Optional[Stage]:
+        """Return a registered stage, or None"""
+        return self._stages.get(name)
+
+    def fuse(self, stage_names: List[str], fused_name: str):
+        """
+        Run a registered stage in place of a sequence of stages
+
+        The fused stage does the work of the sequence in one pass (e.g. one
+        open and one save of a PDF) and takes the merged options of the
+        stages it replaces.
+
+        Args:
+            stage_names: Stages replaced when they are requested one after the other
+            fused_name: Registered stage run instead
+        """
+        self._fusions.append((list(stage_names), fused_name))
+
+    def plan(self, stage_names: List[str], options: Dict[str, Dict[str, Any]]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """Return the stages and options actually run, with fused stages substituted"""
+        planned, planned_options = [], dict(options)
+        index = 0
+        while index < len(stage_names):
+            for sequence, fused_name in self._fusions:
+                if stage_names[index:index + len(sequence)] == sequence:
+                    merged = {}
+                    for name in sequence:
+                        merged.update(options.get(name, {}))
+                    planned.append(fused_name)
+                    planned_options[fused_name] = merged
+                    index += len(sequence)
+                    break
+            else:
+                planned.append(stage_names[index])
+                index += 1
+        return planned, planned_options
+
+    def ingest(self, save: Callable[[str], Any], filename: str, timings: Dict[str, float] = None) -> str:
+        """
+        Store an input file at a new work path
+
+        Args:
+            save: Callable(path) writing the input to path (e.g. partial(save_upload, file))
+            filename: Original filename, for its extension
+            timings: Optional dict receiving the time spent under 'ingest'
+
+        Returns:
+            The work path
+        """
+        start = time.perf_counter()
+        path = os.path.join(self.work_dir, f"{uuid.uuid4()}_input{os.path.splitext(filename)[1].lower()}")
+        save(path)
+        if timings is not None:
+            timings['ingest'] = time.perf_counter() - start
+        logger.info(f"Stored input {filename} at {path} ({os.path.getsize(path)} bytes)")
+        return path
+
+    def validate(self, stage_names: List[str], filename: str):
+        """
+        Check that the stages exist and that each one accepts its input
+
+        Raises:
+            ValueError: If a stage is unknown or cannot take the previous output
+        """
+        if not stage_names:
+            raise ValueError("No stages requested")
+        current = filename
+        for name in stage_names:
+            stage = self._stages.get(name)
+            if stage is None:
+                raise ValueError(f"Unknown stage: {name}")
+            if not stage.accepts(current):
+                raise ValueError(f"{name} does not accept {os.path.splitext(current)[1] or 'this file'}")
+            current = f"output{stage.output_ext or os.path.splitext(current)[1]}"
+
+    def run(self, stage_names: List[str], input_path: str, options: Dict[str, Dict[str, Any]],
+            timings: Dict[str, float] = None) -> PipelineResult:
+        """
+        Run stages one after the other, each on the previous stage's output
+
+        Sequences registered with fuse run as their fused stage. The input
+        file is left for the caller to remove; intermediate outputs are removed
+        here, and the final output is written to the last stage's output_dir.
+
+        Args:
+            stage_names: Stages to run, in order
+            input_path: Work path of the input
+            options: Stage name -> options from the stage's parse_options
+            timings: Timings recorded so far (e.g. by ingest), extended in place with each stage
+
+        Returns:
+            PipelineResult
+        """
+        self.validate(stage_names, input_path)
+        stage_names, options = self.plan(stage_names, options)
+        timings = timings if timings is not None else {}
+        stage_stats = {}
+        run_id = uuid.uuid4()
+        current = input_path
+        try:
+            for index, name in enumerate(stage_names):
+                stage = self._stages[name]
+                stage_options = options.get(name, {})
+                last = index == len(stage_names) - 1
+                ext = stage.output_ext or os.path.splitext(current)[1]
+                output_dir = stage.output_dir if last else self.work_dir
+                output_path = os.path.join(output_dir, f"{run_id}_{name}{ext}")
+
+                start = time.perf_counter()
+                with self.pool.acquire(stage, stage_options) as processor:
+                    output_path, stats = stage.run(processor, current, output_path, stage_options)
+                timings[name] = time.perf_counter() - start
+                stage_stats[name] = stats
+                logger.info(f"Stage {name} finished in {timings[name]:.3f} s")
+
+                if current != input_path:
+                    self.remove(current)
+                current = output_path
+        except Exception:
+            if current != input_path:
+                self.remove(current)
+            raise
+
+        return PipelineResult(current, stage_stats, timings)
+
+    def error_response(self, stage_names: List[str], error: Exception) -> Optional[Tuple[str, int]]:
+        """Return the (message, HTTP status) the stages declare for an expected failure, or None"""
+        for name in stage_names:
+            stage = self._stages.get(name)
+            for fragment, response in (stage.errors.items() if stage else ()):
+                if fragment in str(error):
+                    return response
+        return None
+
+    @staticmethod
+    def remove(*paths: str):
+        """Remove work files, ignoring ones that are already gone"""
+        for path in paths:
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Cleaned up file: {path}")
+            except OSError as e:
+                logger.warning(f"Failed to clean up file {path}: {str(e)}")
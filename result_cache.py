@@ -0,0 +1,165 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Disk-backed, size-bounded LRU cache of processed output files
+
+    Entries are keyed by (content hash, tool, compression level, tool version).
+    Each entry is stored as ``<key><ext>`` next to a ``<key>.json`` file holding
+    the stats returned by the processor, so the index can be rebuilt on startup.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024, max_entries: int = 1000):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory to store cached outputs in
+            max_bytes: Maximum total size of the cached outputs
+            max_entries: Maximum number of cached outputs
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        # key -> (output_path, size, stats), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._load_index()
+
+    @staticmethod
+    def make_key(content_hash: str, tool: str, compression_level: Any, version: str) -> str:
+        """Build the cache key for a processing request"""
+        raw = f"{content_hash}:{tool}:{compression_level}:{version}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _load_index(self):
+        """Rebuild the in-memory index from the files in cache_dir"""
+        loaded = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                output_path = os.path.join(self.cache_dir, meta['output'])
+                size = os.path.getsize(output_path)
+                loaded.append((os.path.getmtime(meta_path), meta['key'], output_path, size, meta['stats']))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable cache entry {meta_path}: {e}")
+                self._remove_files(meta_path)
+
+        # Oldest access first
+        for _, key, output_path, size, stats in sorted(loaded, key=lambda entry: entry[0]):
+            self._entries[key] = (output_path, size, stats)
+            self.total_bytes += size
+        self._evict()
+
+    def _remove_files(self, *paths: str):
+        """Remove the files belonging to an entry"""
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove cache file {path}: {e}")
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is within its bounds"""
+        while self._entries and (self.total_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            key, (output_path, size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            self._remove_files(output_path, os.path.join(self.cache_dir, f"{key}.json"))
+            logger.info(f"Evicted cache entry {key} ({size} bytes)")
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up a cached output
+
+        Returns:
+            Tuple of (output_path, stats), or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    # File vanished underneath us
+                    del self._entries[key]
+                    self.total_bytes -= entry[1]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Touch the metadata so the LRU order survives a restart
+            try:
+                os.utime(os.path.join(self.cache_dir, f"{key}.json"))
+            except OSError:
+                pass
+            return entry[0], dict(entry[2])
+
+    def put(self, key: str, output_path: str, stats: Dict[str, Any]) -> str:
+        """
+        Move a freshly produced output into the cache
+
+        Args:
+            key: Cache key from make_key
+            output_path: Path of the processed output; the file is moved into the cache
+            stats: Stats returned by the processor
+
+        Returns:
+            Path of the cached output, or output_path if it is too large to cache
+        """
+        if os.path.getsize(output_path) > self.max_bytes:
+            logger.info(f"Not caching {output_path}: larger than the cache")
+            return output_path
+
+        ext = os.path.splitext(output_path)[1]
+        cached_path = os.path.join(self.cache_dir, f"{key}{ext}")
+        shutil.move(output_path, cached_path)
+        size = os.path.getsize(cached_path)
+
+        with open(os.path.join(self.cache_dir, f"{key}.json"), 'w') as f:
+            json.dump({'key': key, 'output': os.path.basename(cached_path), 'stats': stats}, f)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (cached_path, size, dict(stats))
+            self.total_bytes += size
+            self._evict()
+
+        return cached_path
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups > 0 else 0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries
+            }
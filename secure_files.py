@@ -1,54 +1,304 @@
 import os
+import hmac
+import time
 import uuid
 import hashlib
 import logging
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 import zipfile
 import json
-from io import BytesIO
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class DerivedKeyCache:
+    """Short-lived, bounded in-memory cache of PBKDF2-derived keys
+    
+    Entries are keyed by (HMAC of the password, salt, iterations). The HMAC uses
+    a per-process random secret, so the cache never holds the password or an
+    unkeyed hash of it. Keys are kept in bytearrays and zeroed when they expire
+    or are evicted.
+    """
+    
+    def __init__(self, max_entries=32, ttl_seconds=300):
+        """
+        Initialize the cache
+        
+        Args:
+            max_entries (int): Maximum number of keys held at once
+            ttl_seconds (int): How long a key may be reused after derivation
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._secret = os.urandom(32)
+        # cache key -> (bytearray key, expires_at), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def password_digest(self, password):
+        """Keyed digest identifying a password without storing it"""
+        return hmac.new(self._secret, password.encode('utf-8'), hashlib.sha256).digest()
+    
+    @staticmethod
+    def _wipe(key):
+        """Overwrite a key buffer in place"""
+        key[:] = bytes(len(key))
+    
+    def _expire(self, now):
+        """Drop expired entries and entries beyond max_entries; call with the lock held"""
+        for cache_key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            self._wipe(self._entries.pop(cache_key)[0])
+        while len(self._entries) > self.max_entries:
+            self._wipe(self._entries.popitem(last=False)[1][0])
+    
+    def get(self, password, salt, iterations):
+        """
+        Look up a derived key
+        
+        Returns:
+            bytes: The raw key, or None on a miss
+        """
+        cache_key = (self.password_digest(password), bytes(salt), iterations)
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return bytes(entry[0])
+    
+    def put(self, password, salt, iterations, key):
+        """Store a raw derived key"""
+        cache_key = (self.password_digest(password), bytes(salt), iterations)
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._wipe(previous[0])
+            self._entries[cache_key] = (bytearray(key), time.time() + self.ttl_seconds)
+            self._expire(time.time())
+    
+    def clear(self):
+        """Wipe and drop every key"""
+        with self._lock:
+            for key, _ in self._entries.values():
+                self._wipe(key)
+            self._entries.clear()
+
+# Shared by all handlers so repeated requests with the same password and salt skip PBKDF2
+default_key_cache = DerivedKeyCache()
+
 class SecureFileHandler:
     """Class to handle secure file operations with password protection"""
     
-    def __init__(self):
-        """Initialize with default values"""
+    def __init__(self, key_cache=default_key_cache):
+        """
+        Initialize with default values
+        
+        Args:
+            key_cache (DerivedKeyCache, optional): Cache for derived keys, None to always run PBKDF2
+        """
         self.salt_size = 16
         self.iterations = 100000
+        # Upper bound for iterations read from file metadata
+        self.max_iterations = 1000000
+        # SECFILE v2: plaintext bytes per AES-GCM segment
+        self.chunk_size = 64 * 1024
+        self.nonce_prefix_size = 7
+        self.tag_size = 16
+        self.key_cache = key_cache
+        # (secret, password HMAC, salt, raw key) while a key session is active
+        self._session = None
         
-    def _generate_key_from_password(self, password, salt=None):
+    def _generate_key_from_password(self, password, salt=None, iterations=None):
         """
         Generate an encryption key from a password using PBKDF2
         
         Args:
             password (str): User-provided password
             salt (bytes, optional): Salt for key derivation, generated if not provided
+            iterations (int, optional): PBKDF2 iterations, defaults to self.iterations
             
         Returns:
             tuple: (key, salt)
         """
         if salt is None:
             salt = os.urandom(self.salt_size)
-            
-        password_bytes = password.encode('utf-8')
+        iterations = iterations or self.iterations
+        if iterations > self.max_iterations:
+            raise ValueError("Unsupported key derivation parameters")
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=self.iterations,
-        )
+        raw_key = self.key_cache.get(password, salt, iterations) if self.key_cache else None
+        if raw_key is None:
+            password_bytes = password.encode('utf-8')
+            
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=iterations,
+            )
+            
+            raw_key = kdf.derive(password_bytes)
+            if self.key_cache:
+                self.key_cache.put(password, salt, iterations, raw_key)
         
-        key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
+        key = base64.urlsafe_b64encode(raw_key)
         return key, salt
     
+    def _new_key(self, password):
+        """
+        Key and salt for encrypting new data
+        
+        Uses the session key when a key session for this password is active,
+        otherwise derives a key from a fresh salt.
+        
+        Returns:
+            tuple: (key, salt)
+        """
+        if self._session is not None:
+            secret, digest, salt, raw_key = self._session
+            if hmac.compare_digest(digest, hmac.new(secret, password.encode('utf-8'), hashlib.sha256).digest()):
+                return base64.urlsafe_b64encode(bytes(raw_key)), salt
+        return self._generate_key_from_password(password)
+    
+    @contextmanager
+    def key_session(self, password):
+        """
+        Derive one key and reuse it for everything encrypted in the block
+        
+        Files encrypted in a session share a salt, so a batch costs a single
+        PBKDF2 derivation to encrypt, and (through the key cache) to decrypt.
+        Every file still gets its own nonces. The key is wiped when the block exits.
+        
+        Args:
+            password (str): Password for the session
+        """
+        key, salt = self._generate_key_from_password(password)
+        raw_key = bytearray(base64.urlsafe_b64decode(key))
+        secret = os.urandom(32)
+        digest = hmac.new(secret, password.encode('utf-8'), hashlib.sha256).digest()
+        self._session = (secret, digest, salt, raw_key)
+        try:
+            yield self
+        finally:
+            self._session = None
+            DerivedKeyCache._wipe(raw_key)
+    
+    def _chunk_nonce(self, nonce_prefix, index, last):
+        """
+        Build the 12-byte nonce of a segment: prefix, 4-byte counter, last-segment flag
+        
+        Binding the position and the final flag into the nonce makes reordered,
+        dropped or truncated segments fail authentication.
+        """
+        return nonce_prefix + index.to_bytes(4, byteorder='big') + (b'\x01' if last else b'\x00')
+    
+    def _encrypt_stream(self, key, nonce_prefix, aad, src, dst):
+        """
+        Encrypt src into dst as fixed-size AES-GCM segments
+        
+        Args:
+            key (bytes): 32-byte raw key
+            nonce_prefix (bytes): Random per-stream nonce prefix
+            aad (bytes): Associated data authenticated with every segment
+            src: Readable binary file object
+            dst: Writable binary file object
+            
+        Returns:
+            tuple: (plaintext_size, ciphertext_size)
+        """
+        aead = AESGCM(key)
+        plaintext_size = 0
+        ciphertext_size = 0
+        index = 0
+        chunk = src.read(self.chunk_size)
+        while True:
+            # Read ahead to know whether this is the final segment
+            next_chunk = src.read(self.chunk_size) if len(chunk) == self.chunk_size else b''
+            last = not next_chunk
+            segment = aead.encrypt(self._chunk_nonce(nonce_prefix, index, last), chunk, aad)
+            dst.write(segment)
+            plaintext_size += len(chunk)
+            ciphertext_size += len(segment)
+            if last:
+                return plaintext_size, ciphertext_size
+            chunk = next_chunk
+            index += 1
+    
+    def _decrypt_stream(self, key, nonce_prefix, aad, src, dst, chunk_size=None):
+        """
+        Decrypt AES-GCM segments written by _encrypt_stream
+        
+        Args:
+            key (bytes): 32-byte raw key
+            nonce_prefix (bytes): Nonce prefix of the stream
+            aad (bytes): Associated data used during encryption
+            src: Readable binary file object positioned at the first segment
+            dst: Writable binary file object
+            chunk_size (int, optional): Plaintext segment size used during encryption
+            
+        Returns:
+            int: Plaintext size
+        """
+        aead = AESGCM(key)
+        segment_size = (chunk_size or self.chunk_size) + self.tag_size
+        plaintext_size = 0
+        index = 0
+        segment = src.read(segment_size)
+        while True:
+            next_segment = src.read(segment_size) if len(segment) == segment_size else b''
+            last = not next_segment
+            try:
+                chunk = aead.decrypt(self._chunk_nonce(nonce_prefix, index, last), segment, aad)
+            except InvalidTag:
+                raise ValueError("Invalid password or corrupted file")
+            dst.write(chunk)
+            plaintext_size += len(chunk)
+            if last:
+                return plaintext_size
+            segment = next_segment
+            index += 1
+    
+    def _encrypted_size(self, plaintext_size):
+        """Size of the AES-GCM segments _encrypt_stream writes for a plaintext size"""
+        segments = max(1, -(-plaintext_size // self.chunk_size))
+        return plaintext_size + segments * self.tag_size
+    
+    def _decrypt_member(self, zipf, file_info, key, chunk_size, output_path):
+        """
+        Stream-decrypt one version 2.0 SECPACK member to a file
+        
+        Returns:
+            int: Decrypted size
+        """
+        try:
+            with zipf.open(file_info) as member, open(output_path, 'wb') as out:
+                nonce_prefix = member.read(self.nonce_prefix_size)
+                return self._decrypt_stream(base64.urlsafe_b64decode(key), nonce_prefix,
+                                            file_info.filename.encode('utf-8'), member, out, chunk_size)
+        except Exception as e:
+            logger.error(f"Failed to decrypt file {file_info.filename}: {str(e)}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+    
     def encrypt_file(self, file_path, password, output_path=None):
         """
         Encrypt a file with a password
@@ -72,43 +322,32 @@ class SecureFileHandler:
             output_path = os.path.join(file_dir, f"{name}_secured{ext}")
         
         try:
-            # Read the original file
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-                
-            original_size = len(file_data)
-            logger.info(f"Original file size: {original_size} bytes")
-            
             # Generate key from password with a new salt
-            salt = os.urandom(self.salt_size)
-            key, _ = self._generate_key_from_password(password, salt)
-            
-            # Create a Fernet cipher with the key
-            cipher = Fernet(key)
-            
-            # Encrypt the file data
-            encrypted_data = cipher.encrypt(file_data)
+            key, salt = self._new_key(password)
+            nonce_prefix = os.urandom(self.nonce_prefix_size)
             
             # Create a metadata structure (including salt)
             metadata = {
+                "version": "2.0",
                 "salt": base64.b64encode(salt).decode('utf-8'),
                 "iterations": self.iterations,
+                "nonce": base64.b64encode(nonce_prefix).decode('utf-8'),
+                "chunk_size": self.chunk_size,
                 "filename": os.path.basename(file_path)
             }
             
             metadata_json = json.dumps(metadata).encode('utf-8')
             metadata_length = len(metadata_json).to_bytes(4, byteorder='big')
+            header = b'SECFILE' + metadata_length + metadata_json
             
-            # Write the encrypted file with metadata
-            with open(output_path, 'wb') as f:
-                # Write format identifier
-                f.write(b'SECFILE')
-                # Write metadata length (4 bytes)
-                f.write(metadata_length)
-                # Write metadata JSON
-                f.write(metadata_json)
-                # Write encrypted data
-                f.write(encrypted_data)
+            # Stream the encrypted segments after the header; the header is
+            # authenticated as associated data of every segment
+            with open(file_path, 'rb') as src, open(output_path, 'wb') as dst:
+                dst.write(header)
+                original_size, _ = self._encrypt_stream(
+                    base64.urlsafe_b64decode(key), nonce_prefix, header, src, dst)
+            
+            logger.info(f"Original file size: {original_size} bytes")
                 
             encrypted_size = os.path.getsize(output_path)
             logger.info(f"Encrypted file size: {encrypted_size} bytes")
@@ -117,7 +356,8 @@ class SecureFileHandler:
             stats = {
                 "original_size": original_size,
                 "encrypted_size": encrypted_size,
-                "original_filename": os.path.basename(file_path)
+                "original_filename": os.path.basename(file_path),
+                "format_version": 2
             }
             
             return output_path, stats
@@ -160,32 +400,44 @@ class SecureFileHandler:
                 # Get salt and iterations from metadata
                 salt = base64.b64decode(metadata['salt'])
                 iterations = metadata.get('iterations', self.iterations)
-                original_filename = metadata.get('filename', 'decrypted_file')
+                original_filename = os.path.basename(metadata.get('filename', 'decrypted_file'))
                 
-                # Read encrypted data
-                encrypted_data = f.read()
-            
-            # Generate key from password and salt
-            key, _ = self._generate_key_from_password(password, salt)
-            
-            # Create a Fernet cipher with the key
-            cipher = Fernet(key)
-            
-            # Try to decrypt the data
-            try:
-                decrypted_data = cipher.decrypt(encrypted_data)
-            except Exception as e:
-                logger.error(f"Decryption failed: {str(e)}")
-                raise ValueError("Invalid password or corrupted file")
-            
-            # Generate output path if not provided
-            if not output_path:
-                file_dir = os.path.dirname(encrypted_file_path)
-                output_path = os.path.join(file_dir, f"decrypted_{original_filename}")
-            
-            # Write the decrypted file
-            with open(output_path, 'wb') as f:
-                f.write(decrypted_data)
+                # Generate output path if not provided
+                if not output_path:
+                    file_dir = os.path.dirname(encrypted_file_path)
+                    output_path = os.path.join(file_dir, f"decrypted_{original_filename}")
+                
+                # Generate key from password and salt
+                key, _ = self._generate_key_from_password(password, salt, iterations)
+                
+                if metadata.get('version') == "2.0":
+                    # Chunked AES-GCM: decrypt segment by segment straight to the output
+                    header = identifier + metadata_length_bytes + metadata_json
+                    try:
+                        with open(output_path, 'wb') as out:
+                            self._decrypt_stream(base64.urlsafe_b64decode(key),
+                                                 base64.b64decode(metadata['nonce']),
+                                                 header, f, out, metadata['chunk_size'])
+                    except Exception:
+                        # Don't leave partially decrypted data behind
+                        if os.path.exists(output_path):
+                            os.remove(output_path)
+                        raise
+                else:
+                    # Version 1: a single Fernet token
+                    encrypted_data = f.read()
+                    cipher = Fernet(key)
+                    
+                    # Try to decrypt the data
+                    try:
+                        decrypted_data = cipher.decrypt(encrypted_data)
+                    except Exception as e:
+                        logger.error(f"Decryption failed: {str(e)}")
+                        raise ValueError("Invalid password or corrupted file")
+                    
+                    # Write the decrypted file
+                    with open(output_path, 'wb') as out:
+                        out.write(decrypted_data)
                 
             encrypted_size = os.path.getsize(encrypted_file_path)
             decrypted_size = os.path.getsize(output_path)
@@ -203,7 +455,67 @@ class SecureFileHandler:
             logger.error(f"Error decrypting file: {str(e)}")
             raise
     
-    def secure_multiple_files(self, file_paths, password, output_dir=None, output_filename=None):
+    def _encrypt_member(self, raw_key, file_path, dst):
+        """
+        Write one SECPACK member: a fresh nonce prefix, then AES-GCM segments
+        bound to the member name
+        
+        Returns:
+            int: Original size of the file
+        """
+        nonce_prefix = os.urandom(self.nonce_prefix_size)
+        with open(file_path, 'rb') as src:
+            dst.write(nonce_prefix)
+            original_size, _ = self._encrypt_stream(
+                raw_key, nonce_prefix, os.path.basename(file_path).encode('utf-8'), src, dst)
+        return original_size
+    
+    def _encrypt_member_to_spool(self, raw_key, file_path, spool_dir):
+        """Encrypt a member into a temporary file, for the parallel path"""
+        spool = tempfile.TemporaryFile(dir=spool_dir)
+        try:
+            original_size = self._encrypt_member(raw_key, file_path, spool)
+            spool.seek(0)
+            return spool, original_size
+        except Exception:
+            spool.close()
+            raise
+    
+    def _encrypt_members_parallel(self, raw_key, file_paths, spool_dir, max_workers):
+        """
+        Encrypt members on a thread pool (cryptography releases the GIL)
+        
+        Yields (file_path, (spool, original_size)) in input order. At most
+        2 * max_workers members are encrypted ahead of the writer, which bounds
+        the temporary disk space used.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            remaining = iter(file_paths)
+            try:
+                for file_path in remaining:
+                    pending.append((file_path, executor.submit(
+                        self._encrypt_member_to_spool, raw_key, file_path, spool_dir)))
+                    if len(pending) >= 2 * max_workers:
+                        break
+                
+                while pending:
+                    file_path, future = pending.popleft()
+                    result = future.result()
+                    next_path = next(remaining, None)
+                    if next_path is not None:
+                        pending.append((next_path, executor.submit(
+                            self._encrypt_member_to_spool, raw_key, next_path, spool_dir)))
+                    yield file_path, result
+            finally:
+                # Close spools of members that were never written (error or early exit)
+                for _, future in pending:
+                    future.cancel()
+                    if not future.cancelled() and future.exception() is None:
+                        future.result()[0].close()
+    
+    def secure_multiple_files(self, file_paths, password, output_dir=None, output_filename=None,
+                              progress_callback=None, max_workers=1):
         """
         Encrypt and package multiple files with password protection
         
@@ -212,6 +524,10 @@ class SecureFileHandler:
             password (str): Password for encryption
             output_dir (str, optional): Directory to save the secured package
             output_filename (str, optional): Name for the output file
+            progress_callback (callable, optional): Receives the fraction of files done (0-1)
+            max_workers (int, optional): Number of members encrypted concurrently. Above 1,
+                members are encrypted by a thread pool into temporary files in output_dir and
+                appended to the package in input order
             
         Returns:
             tuple: (output_path, stats)
@@ -228,56 +544,34 @@ class SecureFileHandler:
             
         output_path = os.path.join(output_dir, output_filename)
         
-        # Create a zip file in memory
-        zip_buffer = BytesIO()
         total_original_size = 0
         file_count = 0
         
         try:
             # Generate key from password with a new salt
-            salt = os.urandom(self.salt_size)
-            key, _ = self._generate_key_from_password(password, salt)
-            
-            # Create a Fernet cipher with the key
-            cipher = Fernet(key)
-            
-            # Create a temporary zip file
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in file_paths:
-                    if not os.path.exists(file_path):
-                        logger.warning(f"File not found, skipping: {file_path}")
-                        continue
-                        
-                    # Read file data
-                    with open(file_path, 'rb') as f:
-                        file_data = f.read()
-                    
-                    file_size = len(file_data)
-                    total_original_size += file_size
-                    
-                    # Encrypt the file data
-                    encrypted_data = cipher.encrypt(file_data)
-                    
-                    # Add to zip with original filename
-                    filename = os.path.basename(file_path)
-                    zipf.writestr(filename, encrypted_data)
-                    file_count += 1
+            key, salt = self._new_key(password)
+            raw_key = base64.urlsafe_b64decode(key)
             
-            # Get the zip data
-            zip_data = zip_buffer.getvalue()
+            existing_paths = [path for path in file_paths if os.path.exists(path)]
+            for file_path in file_paths:
+                if file_path not in existing_paths:
+                    logger.warning(f"File not found, skipping: {file_path}")
             
-            # Create metadata
+            # Create metadata, with a manifest so members can be listed from the header alone
             metadata = {
                 "salt": base64.b64encode(salt).decode('utf-8'),
                 "iterations": self.iterations,
-                "file_count": file_count,
-                "version": "1.0"
+                "file_count": len(existing_paths),
+                "chunk_size": self.chunk_size,
+                "members": [{"name": os.path.basename(path), "size": os.path.getsize(path)}
+                            for path in existing_paths],
+                "version": "2.0"
             }
             
             metadata_json = json.dumps(metadata).encode('utf-8')
             metadata_length = len(metadata_json).to_bytes(4, byteorder='big')
             
-            # Write the final secured package file
+            # Write the header, then stream the zip straight into the same file
             with open(output_path, 'wb') as f:
                 # Write format identifier
                 f.write(b'SECPACK')
@@ -285,8 +579,37 @@ class SecureFileHandler:
                 f.write(metadata_length)
                 # Write metadata JSON
                 f.write(metadata_json)
-                # Write encrypted zip data
-                f.write(zip_data)
+                
+                # Members are already encrypted, so store them without deflate
+                with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED) as zipf:
+                    if max_workers > 1 and len(existing_paths) > 1:
+                        members = self._encrypt_members_parallel(raw_key, existing_paths, output_dir, max_workers)
+                    else:
+                        members = ((path, None) for path in existing_paths)
+                    
+                    for index, (file_path, encrypted) in enumerate(members):
+                        if progress_callback:
+                            progress_callback(index / len(existing_paths))
+                        
+                        # Add to zip with original filename
+                        filename = os.path.basename(file_path)
+                        file_size = os.path.getsize(file_path)
+                        
+                        # Declaring the final size up front lets zipfile pick zip64 when needed
+                        member_info = zipfile.ZipInfo(filename, date_time=time.localtime(os.path.getmtime(file_path))[:6])
+                        member_info.compress_type = zipfile.ZIP_STORED
+                        member_info.file_size = self.nonce_prefix_size + self._encrypted_size(file_size)
+                        
+                        with zipf.open(member_info, 'w') as member:
+                            if encrypted is None:
+                                original_size = self._encrypt_member(raw_key, file_path, member)
+                            else:
+                                spool, original_size = encrypted
+                                with spool:
+                                    shutil.copyfileobj(spool, member, self.chunk_size)
+                        
+                        total_original_size += original_size
+                        file_count += 1
             
             # Get final file size
             secured_size = os.path.getsize(output_path)
@@ -303,10 +626,126 @@ class SecureFileHandler:
         except Exception as e:
             logger.error(f"Error creating secure file package: {str(e)}")
             raise
-        finally:
-            zip_buffer.close()
     
-    def extract_secure_package(self, package_path, password, output_dir=None):
+    def _read_package_header(self, f):
+        """
+        Read and validate the header of a secure package
+        
+        Args:
+            f: Binary file object positioned at the start of the package
+            
+        Returns:
+            dict: Package metadata; f is left positioned after the header
+        """
+        # Check format identifier
+        identifier = f.read(7)
+        if identifier != b'SECPACK':
+            raise ValueError("Not a valid secure package format")
+        
+        # Read metadata length
+        metadata_length_bytes = f.read(4)
+        metadata_length = int.from_bytes(metadata_length_bytes, byteorder='big')
+        
+        # Read metadata
+        metadata_json = f.read(metadata_length)
+        return json.loads(metadata_json.decode('utf-8'))
+    
+    def list_secure_package(self, package_path):
+        """
+        List the files in a secured package without decrypting anything
+        
+        Version 2.0 packages are listed from the header manifest alone; older
+        packages fall back to the zip central directory.
+        
+        Args:
+            package_path (str): Path to the secured package file
+            
+        Returns:
+            list: Dicts with 'name' and 'size' (the original size, or None if unknown)
+        """
+        if not os.path.exists(package_path):
+            raise FileNotFoundError(f"Secure package not found: {package_path}")
+        
+        with open(package_path, 'rb') as f:
+            metadata = self._read_package_header(f)
+            if 'members' in metadata:
+                return [{'name': member['name'], 'size': member['size']} for member in metadata['members']]
+            
+            with zipfile.ZipFile(f, 'r') as zipf:
+                return [{'name': os.path.basename(info.filename), 'size': None} for info in zipf.infolist()]
+    
+    def extract_secure_member(self, package_path, password, member_name, output_dir=None):
+        """
+        Extract a single file from a secured package
+        
+        Only the header, the zip central directory and the requested member are
+        read; zipfile seeks straight to the member's data.
+        
+        Args:
+            package_path (str): Path to the secured package file
+            password (str): Password for decryption
+            member_name (str): Name of the file to extract
+            output_dir (str, optional): Directory to extract the file to
+            
+        Returns:
+            tuple: (output_path, stats)
+        """
+        if not os.path.exists(package_path):
+            raise FileNotFoundError(f"Secure package not found: {package_path}")
+        
+        if not output_dir:
+            output_dir = os.path.dirname(package_path)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        
+        try:
+            with open(package_path, 'rb') as f:
+                metadata = self._read_package_header(f)
+                
+                with zipfile.ZipFile(f, 'r') as zipf:
+                    try:
+                        file_info = zipf.getinfo(member_name)
+                    except KeyError:
+                        raise FileNotFoundError(f"File not found in secure package: {member_name}")
+                    
+                    salt = base64.b64decode(metadata['salt'])
+                    iterations = metadata.get('iterations', self.iterations)
+                    key, _ = self._generate_key_from_password(password, salt, iterations)
+                    
+                    # Never write outside output_dir
+                    output_path = os.path.join(output_dir, os.path.basename(member_name))
+                    
+                    if metadata.get('version') == "2.0":
+                        file_size = self._decrypt_member(zipf, file_info, key, metadata['chunk_size'], output_path)
+                    else:
+                        # Version 1: the member is a single Fernet token
+                        try:
+                            decrypted_data = Fernet(key).decrypt(zipf.read(file_info))
+                        except Exception as e:
+                            logger.error(f"Failed to decrypt file {member_name}: {str(e)}")
+                            raise ValueError("Invalid password or corrupted file")
+                        with open(output_path, 'wb') as out:
+                            out.write(decrypted_data)
+                        file_size = len(decrypted_data)
+            
+            stats = {
+                "package_size": os.path.getsize(package_path),
+                "total_extracted_size": file_size,
+                "file_count": 1,
+                "extracted_files": [{
+                    'path': output_path,
+                    'name': os.path.basename(member_name),
+                    'size': file_size
+                }]
+            }
+            
+            return output_path, stats
+            
+        except Exception as e:
+            logger.error(f"Error extracting {member_name} from secure package: {str(e)}")
+            raise
+    
+    def extract_secure_package(self, package_path, password, output_dir=None, progress_callback=None):
         """
         Extract files from a secured package
         
@@ -314,6 +753,7 @@ class SecureFileHandler:
             package_path (str): Path to the secured package file
             password (str): Password for decryption
             output_dir (str, optional): Directory to extract files to
+            progress_callback (callable, optional): Receives the fraction of files done (0-1)
             
         Returns:
             tuple: (output_dir, stats)
@@ -334,69 +774,56 @@ class SecureFileHandler:
         try:
             # Read the secure package
             with open(package_path, 'rb') as f:
-                # Check format identifier
-                identifier = f.read(7)
-                if identifier != b'SECPACK':
-                    raise ValueError("Not a valid secure package format")
-                
-                # Read metadata length
-                metadata_length_bytes = f.read(4)
-                metadata_length = int.from_bytes(metadata_length_bytes, byteorder='big')
-                
-                # Read metadata
-                metadata_json = f.read(metadata_length)
-                metadata = json.loads(metadata_json.decode('utf-8'))
+                metadata = self._read_package_header(f)
                 
                 # Get salt and iterations from metadata
                 salt = base64.b64decode(metadata['salt'])
                 iterations = metadata.get('iterations', self.iterations)
                 file_count = metadata.get('file_count', 0)
                 
-                # Read the encrypted zip data
-                encrypted_zip_data = f.read()
-            
-            # Generate key from password and salt
-            key, _ = self._generate_key_from_password(password, salt)
-            
-            # Create a Fernet cipher with the key
-            cipher = Fernet(key)
-            
-            # Extract files from the encrypted zip
-            total_extracted_size = 0
-            extracted_files = []
-            
-            try:
-                # Load the zip data from memory
-                zip_buffer = BytesIO(encrypted_zip_data)
+                # Generate key from password and salt
+                key, _ = self._generate_key_from_password(password, salt, iterations)
+                
+                # Extract files from the encrypted zip; zipfile locates the
+                # archive after the header by itself
+                total_extracted_size = 0
+                extracted_files = []
                 
-                with zipfile.ZipFile(zip_buffer, 'r') as zipf:
-                    for file_info in zipf.infolist():
-                        # Get the encrypted data
-                        encrypted_data = zipf.read(file_info.filename)
+                with zipfile.ZipFile(f, 'r') as zipf:
+                    members = zipf.infolist()
+                    for index, file_info in enumerate(members):
+                        if progress_callback:
+                            progress_callback(index / len(members))
                         
-                        # Decrypt the data
-                        try:
-                            decrypted_data = cipher.decrypt(encrypted_data)
-                        except Exception as e:
-                            logger.error(f"Failed to decrypt file {file_info.filename}: {str(e)}")
-                            raise ValueError("Invalid password or corrupted file")
+                        # Never write outside output_dir
+                        member_name = os.path.basename(file_info.filename)
+                        output_file_path = os.path.join(output_dir, member_name)
                         
-                        # Save the decrypted file
-                        output_file_path = os.path.join(output_dir, file_info.filename)
-                        with open(output_file_path, 'wb') as f:
-                            f.write(decrypted_data)
+                        if metadata.get('version') == "2.0":
+                            file_size = self._decrypt_member(zipf, file_info, key, metadata['chunk_size'], output_file_path)
+                        else:
+                            # Version 1: each member is a single Fernet token
+                            encrypted_data = zipf.read(file_info.filename)
+                            
+                            # Decrypt the data
+                            try:
+                                decrypted_data = Fernet(key).decrypt(encrypted_data)
+                            except Exception as e:
+                                logger.error(f"Failed to decrypt file {file_info.filename}: {str(e)}")
+                                raise ValueError("Invalid password or corrupted file")
+                            
+                            # Save the decrypted file
+                            with open(output_file_path, 'wb') as out:
+                                out.write(decrypted_data)
+                            file_size = len(decrypted_data)
                         
-                        file_size = len(decrypted_data)
                         total_extracted_size += file_size
                         
                         extracted_files.append({
                             'path': output_file_path,
-                            'name': file_info.filename,
+                            'name': member_name,
                             'size': file_size
                         })
-                
-            finally:
-                zip_buffer.close()
             
             # Return statistics
             stats = {
@@ -0,0 +1,155 @@
+import os
+import io
+import shutil
+import hashlib
+import logging
+import tempfile
+from flask import Request, current_app
+from werkzeug.datastructures import FileStorage
+
+logger = logging.getLogger(__name__)
+
+
+class SpooledUpload:
+    """Writable/readable stream an uploaded file is parsed into
+
+    Small uploads stay in memory. Once an upload grows past memory_limit it
+    rolls over to a file in spool_dir, which save_upload later renames to the
+    route's work path, so the body is written to disk exactly once. The
+    SHA-256 of the content is computed while it is received.
+    """
+
+    def __init__(self, spool_dir: str, memory_limit: int = 512 * 1024):
+        """
+        Initialize the spool
+
+        Args:
+            spool_dir: Directory for uploads that outgrow memory (should be on the same
+                filesystem as the work paths, so claiming them is a rename)
+            memory_limit: Largest upload kept in memory
+        """
+        self.spool_dir = spool_dir
+        self.memory_limit = memory_limit
+        self.path = None
+        self.size = 0
+        self._file = io.BytesIO()
+        self._digest = hashlib.sha256()
+        self._claimed = False
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the content is held in memory rather than in a file"""
+        return isinstance(self._file, io.BytesIO)
+
+    def hexdigest(self) -> str:
+        """SHA-256 hex digest of everything written"""
+        return self._digest.hexdigest()
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        if self.in_memory and self.size > self.memory_limit:
+            self._roll_over()
+        return self._file.write(data)
+
+    def _roll_over(self):
+        """Move the content received so far from memory to a file in spool_dir"""
+        fd, path = tempfile.mkstemp(prefix='upload_', suffix='.part', dir=self.spool_dir)
+        spool = os.fdopen(fd, 'w+b')
+        spool.write(self._file.getbuffer())
+        self._file = spool
+        self.path = path
+
+    def claim(self, path: str):
+        """
+        Move the spooled content to path; the spool then reads from there
+
+        The caller owns (and removes) the file at path from then on.
+        """
+        if not self.in_memory:
+            self._file.flush()
+            os.replace(self.path, path)
+        else:
+            with open(path, 'wb') as f:
+                f.write(self._file.getbuffer())
+        self.path = path
+        self._claimed = True
+
+    def close(self):
+        self._file.close()
+        if self.path is not None and not self._claimed:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Failed to remove upload spool {self.path}: {e}")
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush, ... of the current buffer
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class SpoolingRequest(Request):
+    """Flask request class parsing uploaded files into SpooledUpload streams
+
+    Uses the app config keys UPLOAD_FOLDER (spool directory) and
+    UPLOAD_MEMORY_LIMIT (largest upload kept in memory, default 512 KB).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(current_app.config.get('UPLOAD_FOLDER') or tempfile.gettempdir(),
+                             current_app.config.get('UPLOAD_MEMORY_LIMIT', 512 * 1024))
+
+
+def save_upload(file: FileStorage, path: str) -> str:
+    """
+    Store an uploaded file at its work path
+
+    Spooled uploads are moved there (a rename when spooled to disk) instead
+    of being copied; other streams are copied.
+
+    Args:
+        file: Uploaded file from request.files
+        path: Work path the processors read from
+
+    Returns:
+        The path
+    """
+    if isinstance(file.stream, SpooledUpload):
+        file.stream.claim(path)
+    else:
+        file.stream.seek(0)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(file.stream, f, 1024 * 1024)
+    return path
+
+
+def upload_hash(file: FileStorage) -> str:
+    """SHA-256 hex digest of an uploaded file, computed while it was received when possible"""
+    if isinstance(file.stream, SpooledUpload):
+        return file.stream.hexdigest()
+
+    digest = hashlib.sha256()
+    file.stream.seek(0)
+    for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def upload_size(file: FileStorage) -> int:
+    """Size of an uploaded file in bytes"""
+    if isinstance(file.stream, SpooledUpload):
+        return file.stream.size
+
+    position = file.stream.tell()
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(position)
+    return size
@@ -1,30 +1,333 @@
 import os
+import zlib
+import struct
+import shutil
 import zipfile
 import uuid
 import logging
-from typing import Dict, Any, Tuple, List
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple, List, Callable, Iterator
 
 logger = logging.getLogger(__name__)
 
+# Leading bytes of formats that are already compressed; deflating them again is wasted CPU
+COMPRESSED_SIGNATURES = (
+    b'\xff\xd8\xff',             # JPEG
+    b'\x89PNG\r\n\x1a\n',        # PNG
+    b'GIF8',                     # GIF
+    b'PK\x03\x04',               # ZIP and ZIP-based formats (docx, xlsx, jar, ...)
+    b'\x1f\x8b',                 # gzip
+    b'BZh',                      # bzip2
+    b'\xfd7zXZ\x00',             # xz
+    b'7z\xbc\xaf\x27\x1c',       # 7-Zip
+    b'Rar!\x1a\x07',             # RAR
+    b'\x28\xb5\x2f\xfd',         # zstd
+    b'OggS',                     # Ogg
+    b'fLaC',                     # FLAC
+    b'ID3',                      # MP3
+)
+
+
+class ZipLimitError(ValueError):
+    """An archive exceeded one of the extraction limits of ZipHandler"""
+
+
+class _ChunkSink:
+    """Write-only, unseekable buffer that stream_zip writes the archive into"""
+    
+    def __init__(self):
+        self._chunks = []
+        self.pending = 0
+        self.size = 0
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        self.size += len(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+
 class ZipHandler:
     """Utility class for zipping and unzipping files"""
     
-    def __init__(self, compression_level: int = 6):
+    def __init__(self, compression_level: int = 6, max_workers: int = 1, adaptive: bool = True,
+                 max_extracted_size: int = 1024 * 1024 * 1024, max_members: int = 10000,
+                 max_ratio: float = 200, max_seconds: float = 60):
         """
         Initialize the ZipHandler with compression level
         
         Args:
             compression_level: Integer from 0-9, where 9 is maximum compression
+            max_workers: Number of members deflated concurrently when zipping (1 = serial)
+            adaptive: Store members that would not shrink (already compressed data) instead of deflating them
+            max_extracted_size: Most bytes one extraction may decompress, over all members
+            max_members: Most members an archive to extract may have
+            max_ratio: Highest uncompressed/compressed ratio allowed for a member
+                (only enforced past ratio_min_size, so tiny members of repeated data pass)
+            max_seconds: Longest wall time one extraction may take
         """
         self.compression_level = min(9, max(0, compression_level))  # Ensure it's between 0-9
+        self.max_workers = max(1, max_workers or 1)
+        self.adaptive = adaptive
+        self.chunk_size = 1024 * 1024
+        # Sampling reads sample_count blocks of sample_size bytes spread over the file
+        self.sample_size = 64 * 1024
+        self.sample_count = 3
+        # Members whose samples deflate to more than this fraction of their size are stored
+        self.store_threshold = 0.95
+        # Limits applied while decompressing (protection against zip bombs)
+        self.max_extracted_size = max_extracted_size
+        self.max_members = max_members
+        self.max_ratio = max_ratio
+        self.max_seconds = max_seconds
+        self.ratio_min_size = 1024 * 1024
+    
+    def _choose_method(self, file_path: str) -> Tuple[int, float, float]:
+        """
+        Decide whether a member is worth deflating
+        
+        Recognizes already compressed formats by their signature, otherwise
+        deflates a few samples from the start, middle and end of the file at
+        the requested level and stores the member if they barely shrink.
+        
+        Returns:
+            Tuple of (compress_type, sampling_seconds, estimated_deflate_seconds); the
+            estimate extrapolates the sample deflate time to the whole file (0 when the
+            format was recognized by its signature and no sample was deflated)
+        """
+        if self.compression_level == 0:
+            return zipfile.ZIP_STORED, 0.0, 0.0
+        if not self.adaptive:
+            return zipfile.ZIP_DEFLATED, 0.0, 0.0
+        
+        start = time.perf_counter()
+        with open(file_path, 'rb') as f:
+            return self._sample_method(f, os.path.getsize(file_path), start)
+    
+    def _sample_method(self, f, file_size: int, start: float) -> Tuple[int, float, float]:
+        """
+        _choose_method for an open, seekable file; leaves f positioned at the start
+        
+        Args:
+            f: Binary file object positioned at the start of the member data
+            file_size: Size of the member in bytes
+            start: perf_counter() value the sampling time is measured from
+        """
+        head = f.read(self.sample_size)
+        if head.startswith(COMPRESSED_SIGNATURES):
+            f.seek(0)
+            return zipfile.ZIP_STORED, time.perf_counter() - start, 0.0
+        
+        samples = [head]
+        if file_size > self.sample_size * self.sample_count:
+            step = (file_size - self.sample_size) // (self.sample_count - 1)
+            for index in range(1, self.sample_count):
+                f.seek(step * index)
+                samples.append(f.read(self.sample_size))
+        f.seek(0)
+        
+        sample_bytes = sum(len(sample) for sample in samples)
+        deflate_start = time.perf_counter()
+        compressed_bytes = sum(len(zlib.compress(sample, self.compression_level)) for sample in samples)
+        deflate_seconds = time.perf_counter() - deflate_start
+        
+        estimated = deflate_seconds * file_size / sample_bytes if sample_bytes else 0.0
+        if sample_bytes and compressed_bytes > sample_bytes * self.store_threshold:
+            return zipfile.ZIP_STORED, time.perf_counter() - start, estimated
+        return zipfile.ZIP_DEFLATED, time.perf_counter() - start, estimated
+    
+    @staticmethod
+    def _archive_name(file_path: str) -> str:
+        """Name of a file inside the archive, without the UUID prefix added on upload"""
+        # Get the original filename without the UUID prefix
+        basename = os.path.basename(file_path)
+        # Check if the filename has a UUID prefix (from our upload handling)
+        # Format is typically: "uuid_originalfilename.ext"
+        parts = basename.split('_', 1)
+        if len(parts) > 1 and len(parts[0]) == 36:  # Standard UUID length
+            try:
+                # Validate it's a UUID
+                uuid.UUID(parts[0])
+                # If valid, use only the original part
+                return parts[1]
+            except ValueError:
+                # If not a valid UUID, use the full basename
+                return basename
+        return basename
+    
+    def _deflate_to_spool(self, file_path: str, spool_dir: str) -> Tuple[Any, int, int, int]:
+        """
+        Raw-deflate a file into a temporary file (zlib releases the GIL while compressing)
+        
+        Returns:
+            Tuple of (spool, crc, file_size, compress_size); spool is positioned at the start
+        """
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, -15)
+        spool = tempfile.TemporaryFile(dir=spool_dir)
+        crc = 0
+        file_size = 0
+        try:
+            with open(file_path, 'rb') as src:
+                for chunk in iter(lambda: src.read(self.chunk_size), b''):
+                    crc = zlib.crc32(chunk, crc)
+                    file_size += len(chunk)
+                    spool.write(compressor.compress(chunk))
+            spool.write(compressor.flush())
+            compress_size = spool.tell()
+            spool.seek(0)
+            return spool, crc, file_size, compress_size
+        except Exception:
+            spool.close()
+            raise
+    
+    def _prepare_member(self, file_path: str, spool_dir: str) -> Tuple[Tuple[int, float, float], Any]:
+        """
+        Choose the compression of a member and deflate it if needed
+        
+        Returns:
+            Tuple of (_choose_method result, _deflate_to_spool result or None for stored members)
+        """
+        choice = self._choose_method(file_path)
+        if choice[0] == zipfile.ZIP_STORED:
+            return choice, None
+        return choice, self._deflate_to_spool(file_path, spool_dir)
+    
+    def _deflate_parallel(self, file_paths: List[str], spool_dir: str) -> Iterator[Tuple[str, Tuple[Tuple[int, float, float], Any]]]:
+        """
+        Prepare members on a thread pool, yielding (file_path, _prepare_member result) in input order
+        
+        At most 2 * max_workers members are compressed ahead of the writer, which
+        bounds the temporary disk space used.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            remaining = iter(file_paths)
+            try:
+                for file_path in remaining:
+                    pending.append((file_path, executor.submit(self._prepare_member, file_path, spool_dir)))
+                    if len(pending) >= 2 * self.max_workers:
+                        break
+                
+                while pending:
+                    file_path, future = pending.popleft()
+                    result = future.result()
+                    next_path = next(remaining, None)
+                    if next_path is not None:
+                        pending.append((next_path, executor.submit(self._prepare_member, next_path, spool_dir)))
+                    yield file_path, result
+            finally:
+                # Close spools of members that were never written (error or early exit)
+                for _, future in pending:
+                    future.cancel()
+                    if not future.cancelled() and future.exception() is None and future.result()[1]:
+                        future.result()[1][0].close()
+    
+    @staticmethod
+    def _begin_raw_member(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo):
+        """
+        Write the local header of a member whose compressed data is appended by the caller
+        
+        zinfo must already carry the final compress_type, CRC and sizes. The
+        caller writes exactly compress_size bytes to zipf.fp and then calls
+        _end_raw_member, the same bookkeeping zipfile does for members it
+        compresses itself.
+        """
+        zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+        zipf._writecheck(zinfo)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf.fp.write(zinfo.FileHeader(zip64))
+    
+    @staticmethod
+    def _end_raw_member(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo):
+        """Register a member written with _begin_raw_member for the central directory"""
+        zipf.start_dir = zipf.fp.tell()
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+    
+    @classmethod
+    def _write_deflated_member(cls, zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, spool, crc: int,
+                               file_size: int, compress_size: int):
+        """Append an already deflated member to an archive being written"""
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.CRC = crc
+        zinfo.file_size = file_size
+        zinfo.compress_size = compress_size
+        
+        with zipf._lock:
+            cls._begin_raw_member(zipf, zinfo)
+            shutil.copyfileobj(spool, zipf.fp, 1024 * 1024)
+            cls._end_raw_member(zipf, zinfo)
+    
+    @staticmethod
+    def _member_stats(zipf: zipfile.ZipFile, choices: Dict[str, Tuple[int, float, float]]) -> List[Dict[str, Any]]:
+        """Per-member stats of a written archive, from the _choose_method result of each member"""
+        member_stats = []
+        for zinfo in zipf.infolist():
+            method, sampling_seconds, estimated_seconds = choices[zinfo.filename]
+            member_stats.append({
+                "name": zinfo.filename,
+                "method": "stored" if method == zipfile.ZIP_STORED else "deflated",
+                "original_size": zinfo.file_size,
+                "compressed_size": zinfo.compress_size,
+                "sampling_seconds": sampling_seconds,
+                # Deflate time avoided by storing the member
+                "cpu_seconds_saved": estimated_seconds if method == zipfile.ZIP_STORED else 0.0
+            })
+        return member_stats
+    
+    def _archive_stats(self, total_input_size: int, zip_size: int, file_count: int,
+                       member_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stats returned for a created archive"""
+        # Calculate compression stats with safety checks
+        if total_input_size > 0:
+            saved_bytes = total_input_size - zip_size
+            saved_percent = (saved_bytes / total_input_size) * 100
+            
+            # Limit to reasonable values
+            if saved_percent < -1000:
+                saved_percent = -1000
+            elif saved_percent > 99.9:
+                saved_percent = 99.9
+        else:
+            saved_bytes = 0
+            saved_percent = 0
+            
+        return {
+            "original_size": total_input_size,
+            "compressed_size": zip_size,
+            "saved_bytes": saved_bytes,
+            "saved_percent": saved_percent,
+            "compression_level": self.compression_level,
+            "file_count": file_count,
+            "stored_count": sum(1 for member in member_stats if member["method"] == "stored"),
+            "deflated_count": sum(1 for member in member_stats if member["method"] == "deflated"),
+            "sampling_seconds": sum(member["sampling_seconds"] for member in member_stats),
+            "cpu_seconds_saved": sum(member["cpu_seconds_saved"] for member in member_stats),
+            "members": member_stats
+        }
     
-    def zip_files(self, file_paths: List[str], output_path: str = None) -> Tuple[str, Dict[str, Any]]:
+    def zip_files(self, file_paths: List[str], output_path: str = None,
+                  progress_callback: Callable[[float], None] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Create a zip file from multiple files
         
         Args:
             file_paths: List of paths to files to include in the zip
             output_path: Path to save the zip file. If None, will create a filename
+            progress_callback: Optional callable receiving the fraction of files done (0-1)
             
         Returns:
             Tuple of (output_path, stats)
@@ -56,71 +359,287 @@ class ZipHandler:
                 "saved_bytes": 0,
                 "saved_percent": 0,
                 "compression_level": self.compression_level,
-                "file_count": 0
+                "file_count": 0,
+                "stored_count": 0,
+                "deflated_count": 0,
+                "sampling_seconds": 0.0,
+                "cpu_seconds_saved": 0.0,
+                "members": []
             }
         
         # Create the zip file
+        members = [path for path in file_paths if os.path.exists(path) and os.path.getsize(path) > 0]
+        choices = {}
         with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.compression_level) as zipf:
-            for file_path in file_paths:
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                    # Get the original filename without the UUID prefix
-                    basename = os.path.basename(file_path)
-                    # Check if the filename has a UUID prefix (from our upload handling)
-                    # Format is typically: "uuid_originalfilename.ext"
-                    parts = basename.split('_', 1)
-                    if len(parts) > 1 and len(parts[0]) == 36:  # Standard UUID length
-                        try:
-                            # Validate it's a UUID
-                            uuid_obj = uuid.UUID(parts[0])
-                            # If valid, use only the original part
-                            original_name = parts[1]
-                        except ValueError:
-                            # If not a valid UUID, use the full basename
-                            original_name = basename
-                    else:
-                        original_name = basename
-                    
+            if self.max_workers > 1 and len(members) > 1:
+                # Deflate members concurrently, then append them in input order
+                spool_dir = os.path.dirname(os.path.abspath(output_path))
+                for index, (file_path, (choice, deflated)) in enumerate(self._deflate_parallel(members, spool_dir)):
+                    if progress_callback:
+                        progress_callback(index / len(members))
+                    arcname = self._archive_name(file_path)
+                    choices[arcname] = choice
+                    if deflated is None:
+                        zipf.write(file_path, arcname=arcname, compress_type=zipfile.ZIP_STORED)
+                        continue
+                    with deflated[0]:
+                        zinfo = zipfile.ZipInfo.from_file(file_path, arcname=arcname)
+                        self._write_deflated_member(zipf, zinfo, *deflated)
+            else:
+                for index, file_path in enumerate(members):
+                    if progress_callback:
+                        progress_callback(index / len(members))
                     # Add the file to the zip with the original filename
-                    zipf.write(file_path, arcname=original_name)
+                    arcname = self._archive_name(file_path)
+                    choices[arcname] = self._choose_method(file_path)
+                    zipf.write(file_path, arcname=arcname, compress_type=choices[arcname][0])
+            
+            member_stats = self._member_stats(zipf, choices)
         
-        # Get the output zip size
-        zip_size = os.path.getsize(output_path)
+        stats = self._archive_stats(total_input_size, os.path.getsize(output_path), valid_file_count, member_stats)
+        return output_path, stats
+    
+    def stream_zip(self, members: List[Tuple[str, Any]], stats: Dict[str, Any] = None,
+                   chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Generate a zip archive piece by piece, without writing it to disk
         
-        # Calculate compression stats with safety checks
-        if total_input_size > 0:
-            saved_bytes = total_input_size - zip_size
-            saved_percent = (saved_bytes / total_input_size) * 100
+        Members are read and compressed while the archive is being consumed,
+        so the first bytes are available as soon as the first member starts.
+        Since sizes and CRCs are only known after a member has been written,
+        each one is followed by a data descriptor. Empty members are skipped,
+        as in zip_files.
+        
+        Args:
+            members: List of (arcname, file object) pairs; file objects must be seekable
+            stats: Optional dict filled with the zip_files stats once the archive is complete
+            chunk_size: Approximate size of the generated pieces
             
-            # Limit to reasonable values
-            if saved_percent < -1000:
-                saved_percent = -1000
-            elif saved_percent > 99.9:
-                saved_percent = 99.9
-        else:
-            saved_bytes = 0
-            saved_percent = 0
+        Yields:
+            Consecutive pieces of the archive
+        """
+        sink = _ChunkSink()
+        choices = {}
+        total_input_size = 0
+        file_count = 0
+        
+        # The sink has no tell(), so zipfile writes data descriptors instead of seeking back
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.compression_level) as zipf:
+            for arcname, fileobj in members:
+                fileobj.seek(0, os.SEEK_END)
+                file_size = fileobj.tell()
+                fileobj.seek(0)
+                total_input_size += file_size
+                if file_size == 0:
+                    continue
+                file_count += 1
+                
+                arcname = os.path.basename(arcname)
+                choices[arcname] = self._sample_method(fileobj, file_size, time.perf_counter())
+                zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+                zinfo.external_attr = 0o644 << 16
+                zinfo.compress_type = choices[arcname][0]
+                zinfo.file_size = file_size
+                
+                with zipf.open(zinfo, 'w') as dst:
+                    for chunk in iter(lambda: fileobj.read(self.chunk_size), b''):
+                        dst.write(chunk)
+                        if sink.pending >= chunk_size:
+                            yield sink.drain()
+                if sink.pending >= chunk_size:
+                    yield sink.drain()
             
-        stats = {
-            "original_size": total_input_size,
-            "compressed_size": zip_size,
-            "saved_bytes": saved_bytes,
-            "saved_percent": saved_percent,
-            "compression_level": self.compression_level,
-            "file_count": valid_file_count
-        }
+            member_stats = self._member_stats(zipf, choices)
         
-        return output_path, stats
+        yield sink.drain()
+        
+        if stats is not None:
+            stats.update(self._archive_stats(total_input_size, sink.size, file_count, member_stats))
+    
+    def check_members(self, members: List[zipfile.ZipInfo]):
+        """
+        Reject an archive from its central directory alone, before decompressing anything
+        
+        The declared sizes can lie, so the same limits are enforced on the
+        actual output while decompressing.
+        
+        Args:
+            members: ZipInfo of the members that will be decompressed
+            
+        Raises:
+            ZipLimitError: If the declared member count or sizes exceed the limits
+        """
+        if len(members) > self.max_members:
+            raise ZipLimitError(f"Archive has {len(members)} members, more than the limit of {self.max_members}")
+        
+        declared_size = sum(zinfo.file_size for zinfo in members)
+        if declared_size > self.max_extracted_size:
+            raise ZipLimitError(f"Archive expands to {declared_size} bytes, more than the limit of "
+                                f"{self.max_extracted_size}")
+        
+        for zinfo in members:
+            self._check_ratio(zinfo, zinfo.file_size)
+    
+    def _check_ratio(self, zinfo: zipfile.ZipInfo, size: int):
+        """Raise ZipLimitError if size bytes out of a member's compressed data is a suspicious expansion"""
+        if size > self.ratio_min_size and size > max(1, zinfo.compress_size) * self.max_ratio:
+            raise ZipLimitError(f"{zinfo.filename} expands more than {self.max_ratio:g} times")
+    
+    def _read_limited(self, zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, total_before: int,
+                      start: float) -> Iterator[bytes]:
+        """
+        Decompress a member in chunks, aborting as soon as a limit is exceeded
+        
+        Args:
+            zipf: Open archive
+            zinfo: Member to read
+            total_before: Bytes already decompressed from other members in this extraction
+            start: time.monotonic() value when the extraction started
+            
+        Yields:
+            Consecutive chunks of the member's content
+        """
+        size = 0
+        with zipf.open(zinfo) as src:
+            for chunk in iter(lambda: src.read(self.chunk_size), b''):
+                size += len(chunk)
+                if total_before + size > self.max_extracted_size:
+                    raise ZipLimitError(f"Archive expands to more than the limit of {self.max_extracted_size} bytes")
+                self._check_ratio(zinfo, size)
+                if time.monotonic() - start > self.max_seconds:
+                    raise ZipLimitError(f"Extraction took longer than the limit of {self.max_seconds:g} seconds")
+                yield chunk
+    
+    def list_members(self, zip_file) -> List[zipfile.ZipInfo]:
+        """
+        List the files (not directories) in a zip archive without extracting anything
+        
+        Args:
+            zip_file: Path or seekable binary file object of the archive
+            
+        Returns:
+            ZipInfo of each file, in archive order
+            
+        Raises:
+            ValueError: If the archive is invalid or has encrypted members
+        """
+        try:
+            with zipfile.ZipFile(zip_file, 'r') as zipf:
+                members = [zinfo for zinfo in zipf.infolist() if not zinfo.is_dir()]
+        except zipfile.BadZipFile:
+            raise ValueError("Invalid ZIP file")
+        
+        if any(zinfo.flag_bits & 0x1 for zinfo in members):
+            raise ValueError("Password-protected ZIP files are not supported")
+        return members
+    
+    def stream_member(self, zip_file, member_name: str) -> Iterator[bytes]:
+        """
+        Decompress a single member piece by piece, without writing it to disk
+        
+        Args:
+            zip_file: Path or seekable binary file object of the archive
+            member_name: Name of the member inside the archive
+            
+        Yields:
+            Consecutive pieces of the member's content (the CRC is checked at the end)
+            
+        Raises:
+            ZipLimitError: If the member exceeds the extraction limits
+        """
+        start = time.monotonic()
+        with zipfile.ZipFile(zip_file, 'r') as zipf:
+            zinfo = zipf.getinfo(member_name)
+            self.check_members([zinfo])
+            yield from self._read_limited(zipf, zinfo, 0, start)
+    
+    def repack_raw(self, zip_file, members: List[zipfile.ZipInfo] = None,
+                   chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Generate a new zip archive holding members of an existing one, without recompressing
+        
+        The compressed bytes of each member are copied as they are, behind a
+        fresh local header carrying the member's known CRC and sizes (so no data
+        descriptor is needed), followed by a new central directory. Neither side
+        is decompressed; clients check the CRCs when they extract. Extra fields
+        (timestamps, Unicode paths) are kept, except the zip64 record, which is
+        written again when needed.
+        
+        Args:
+            zip_file: Path or seekable binary file object of the source archive
+            members: ZipInfo of the members to copy (from list_members); all files if None
+            chunk_size: Approximate size of the generated pieces
+            
+        Yields:
+            Consecutive pieces of the new archive
+            
+        Raises:
+            ValueError: If a member is encrypted (its header check byte depends
+                on the data descriptor flag, which is cleared here)
+        """
+        sink = _ChunkSink()
+        with zipfile.ZipFile(zip_file, 'r') as source:
+            if members is None:
+                members = [zinfo for zinfo in source.infolist() if not zinfo.is_dir()]
+            source_fp = source.fp
+            
+            with zipfile.ZipFile(sink, 'w') as zipf:
+                for member in members:
+                    if member.flag_bits & 0x1:
+                        raise ValueError(f"{member.filename} is encrypted and can't be repacked")
+                    
+                    # Find where the compressed data starts, after the source local header
+                    source_fp.seek(member.header_offset)
+                    header = source_fp.read(zipfile.sizeFileHeader)
+                    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+                        raise ValueError(f"Invalid ZIP file: bad local header for {member.filename}")
+                    fields = struct.unpack(zipfile.structFileHeader, header)
+                    source_fp.seek(fields[zipfile._FH_FILENAME_LENGTH] + fields[zipfile._FH_EXTRA_FIELD_LENGTH],
+                                   os.SEEK_CUR)
+                    
+                    zinfo = zipfile.ZipInfo(member.filename, date_time=member.date_time)
+                    zinfo.compress_type = member.compress_type
+                    zinfo.flag_bits = member.flag_bits & ~0x08
+                    zinfo.external_attr = member.external_attr
+                    zinfo.create_system = member.create_system
+                    zinfo.comment = member.comment
+                    zinfo.extra = zipfile._strip_extra(member.extra, (1,))
+                    zinfo.CRC = member.CRC
+                    zinfo.file_size = member.file_size
+                    zinfo.compress_size = member.compress_size
+                    
+                    self._begin_raw_member(zipf, zinfo)
+                    remaining = member.compress_size
+                    while remaining > 0:
+                        chunk = source_fp.read(min(self.chunk_size, remaining))
+                        if not chunk:
+                            raise ValueError(f"Invalid ZIP file: {member.filename} is truncated")
+                        zipf.fp.write(chunk)
+                        remaining -= len(chunk)
+                        if sink.pending >= chunk_size:
+                            yield sink.drain()
+                    self._end_raw_member(zipf, zinfo)
+        
+        yield sink.drain()
     
     def unzip_file(self, zip_path: str, extract_dir: str = None) -> Tuple[str, Dict[str, Any]]:
         """
         Extract a zip file
         
+        Members are decompressed in chunks while the limits set on the handler
+        (total size, member count, per-member ratio, wall time) are enforced.
+        The extraction stops at the first violation and the files written so
+        far are removed.
+        
         Args:
             zip_path: Path to the zip file to extract
             extract_dir: Directory to extract files to. If None, will create a directory
             
         Returns:
             Tuple of (extract_dir, stats)
+            
+        Raises:
+            ZipLimitError: If the archive exceeds the extraction limits
         """
         # Check if the file exists and is a zip file
         if not os.path.exists(zip_path):
@@ -138,30 +657,51 @@ class ZipHandler:
         zip_size = max(1, os.path.getsize(zip_path))
         
         # Extract the zip file
+        start = time.monotonic()
         extracted_files = []
+        written_paths = []
+        total_written = 0
+        peak_memory = 0
         try:
             with zipfile.ZipFile(zip_path, 'r') as zipf:
-                # Get list of files in the zip
-                file_list = zipf.namelist()
-                
-                # Extract all files
-                zipf.extractall(path=extract_dir)
+                members = zipf.infolist()
+                self.check_members(members)
                 
-                # Get info for each file
-                for file_name in file_list:
-                    try:
-                        file_info = zipf.getinfo(file_name)
-                        extracted_files.append({
-                            "name": file_name,
-                            "size": file_info.file_size,
-                            "compressed_size": file_info.compress_size,
-                            "path": os.path.join(extract_dir, file_name)
-                        })
-                    except Exception as e:
-                        logger.warning(f"Error getting info for file {file_name}: {e}")
+                for zinfo in members:
+                    member_path = self._safe_member_path(zinfo.filename)
+                    if not member_path:
+                        logger.warning(f"Skipping member with unusable name: {zinfo.filename!r}")
+                        continue
+                    target_path = os.path.join(extract_dir, member_path)
+                    if zinfo.is_dir():
+                        os.makedirs(target_path, exist_ok=True)
+                        continue
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    
+                    written_paths.append(target_path)
+                    with open(target_path, 'wb') as dst:
+                        for chunk in self._read_limited(zipf, zinfo, total_written, start):
+                            dst.write(chunk)
+                            total_written += len(chunk)
+                            peak_memory = max(peak_memory, len(chunk))
+                    
+                    extracted_files.append({
+                        "name": zinfo.filename,
+                        "size": os.path.getsize(target_path),
+                        "compressed_size": zinfo.compress_size,
+                        "path": target_path
+                    })
         except zipfile.BadZipFile:
             logger.error(f"Bad zip file: {zip_path}")
+            self._remove_extracted(written_paths)
             raise ValueError(f"Invalid ZIP file: {zip_path}")
+        except ZipLimitError as e:
+            logger.warning(f"Aborted extraction of {zip_path} after {total_written} bytes: {e}")
+            self._remove_extracted(written_paths)
+            raise
+        except Exception:
+            self._remove_extracted(written_paths)
+            raise
         
         # Calculate total extracted size
         total_extracted_size = sum(file["size"] for file in extracted_files)
@@ -180,10 +720,35 @@ class ZipHandler:
             "total_extracted_size": total_extracted_size,
             "expansion_ratio": expansion_ratio,
             "file_count": len(extracted_files),
-            "extracted_files": extracted_files
+            "extracted_files": extracted_files,
+            "elapsed_seconds": time.monotonic() - start,
+            # Files are only ever added, so the disk used peaks at the end
+            "peak_disk_bytes": total_written,
+            # Largest decompressed chunk held at once; zlib's own window adds a constant ~300 KB
+            "peak_memory_bytes": peak_memory
         }
         
         return extract_dir, stats
+    
+    @staticmethod
+    def _safe_member_path(member_name: str) -> str:
+        """Relative path to extract a member to, without drive, absolute or parent components"""
+        path = member_name.replace('/', os.path.sep)
+        if os.path.altsep:
+            path = path.replace(os.path.altsep, os.path.sep)
+        path = os.path.splitdrive(path)[1]
+        return os.path.sep.join(part for part in path.split(os.path.sep)
+                                if part not in ('', os.path.curdir, os.path.pardir))
+    
+    @staticmethod
+    def _remove_extracted(paths: List[str]):
+        """Remove files written by an aborted extraction"""
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove partially extracted file {path}: {e}")
 
 def format_size(size_bytes):
     """Format size in human-readable format"""